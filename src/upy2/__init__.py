@@ -1,7 +1,19 @@
 # Developed since: Jan 2010
 
-from upy2.id_generator import IDGenerator
+from upy2.id_generator import IDGenerator, SharedIDGenerator
 from upy2.core import *  # The core module provides *__all__*.
+from upy2.lazy import Lazy, lazyundarray
+from upy2.adjoint import Reverse, adjointundarray
+from upy2.parallel import Parallel
+from upy2.threads import Threads
+from upy2.outofcore import OutOfCore
+from upy2.montecarlo import MonteCarlo, mcundarray
+from upy2.secondorder import SecondOrder, curvedundarray
+from upy2.tracing import compile, Plan
+from upy2.linalg import ueinsum, udot, umatmul
+from upy2.covariance import ucovariance, ucorrelation
+from upy2.storage import save, load, savez, loadz
+from upy2.shared import SharedHandle, shared_undarray
 from upy2.typesetting.scientific import ScientificTypesetter
 from upy2.typesetting.engineering import EngineeringTypesetter
 from upy2.typesetting.fixedpoint import FixedpointTypesetter
@@ -0,0 +1,290 @@
+# Developed since: Oct 2026
+
+""" Implements reverse-mode propagation of uncertainties.  Within a
+:class:`Reverse` Session manager, uufuncs compute their nominal values
+and their elementwise derivatives immediately, but they do not
+propagate Dependencies; instead, they record the operations on a
+*tape* of :class:`adjointundarray` nodes.  When the Dependencies of a
+node are requested, *adjoints* are back-propagated from the node to
+the undarrays the node has been computed from. """
+
+import numpy
+import upy2.core
+import upy2.dependency
+
+__all__ = ['Reverse', 'adjointundarray']
+
+
+class Reverse(upy2.core.Engine):
+    """ An :class:`Engine` recording operations for reverse-mode
+    propagation::
+
+        with Reverse():
+            utotal = ((a * x + b) / ulog(c)).sum()
+
+        utotal.variance
+
+    In forward mode, the cost of each operation grows with the number
+    of Dependency layers carried along, i.e., with the number of
+    independent sources of uncertainty.  In reverse mode, the cost of
+    back-propagation grows with the number of *elements* of the output
+    instead, since one adjoint is propagated per output element.
+    Reverse mode is beneficial when few outputs, e.g. sums, depend on
+    many sources.
+
+    The Dependencies obtained, i.e., the sensitivities of each output
+    element with respect to the sources of uncertainty, are identical
+    to those obtained in forward mode.
+
+    Besides uufuncs, :meth:`~adjointundarray.sum`, :meth:`mean`,
+    :meth:`scaled` and indexing are recorded.  *blocksize* bounds the
+    number of output elements back-propagated at once. """
+
+    def __init__(self, blocksize=256):
+        upy2.core.Engine.__init__(self)
+        self.blocksize = blocksize
+
+    def unary(self, uufunc, x):
+        if not isinstance(x, upy2.core.undarray):
+            return uufunc.evaluate(x)
+        return adjointundarray.record(uufunc, (x,), self.blocksize)
+
+    def binary(self, uufunc, x1, x2):
+        if not isinstance(x1, upy2.core.undarray) and \
+                not isinstance(x2, upy2.core.undarray):
+            return uufunc.evaluate(x1, x2)
+        return adjointundarray.record(uufunc, (x1, x2), self.blocksize)
+
+
+class adjointundarray(upy2.core.undarray):
+    """ A node of the tape recorded by :class:`Reverse`.  The nominal
+    value is available immediately; the Dependencies are computed by
+    back-propagation when :attr:`stack` is accessed, e.g. when
+    requesting the :attr:`variance`, and retained afterwards.
+
+    Each node holds its *pullbacks*, a list of ``(operand, pullback)``
+    tuples, where *pullback* maps the adjoints with respect to the
+    node to the adjoints with respect to *operand*.  Adjoints are
+    stacked along a leading axis, one per output element. """
+
+    def __init__(self, nominal, pullbacks, blocksize=256):
+        """ *nominal* is the nominal value of the node, *pullbacks* the
+        list of ``(operand, pullback)`` tuples.  *blocksize* is the
+        maximum number of output elements back-propagated at once. """
+
+        self.nominal = numpy.asarray(nominal)
+        self.shape = self.nominal.shape
+        self.dtype = self.nominal.dtype
+        self.ndim = self.nominal.ndim
+        self.pullbacks = pullbacks
+        self.blocksize = blocksize
+        self.result = None
+
+    @classmethod
+    def record(cls, uufunc, operands, blocksize=256):
+        """ Returns the node resulting from applying *uufunc* to
+        *operands*. """
+
+        nominals = [operand.nominal
+                if isinstance(operand, upy2.core.undarray)
+                else numpy.asarray(operand) for operand in operands]
+        yout = uufunc.ufunc(*nominals)
+
+        try:
+            if len(operands) == 1:
+                factors = [uufunc._derivative(nominals[0], yout)]
+            else:
+                factors = uufunc._derivatives(
+                        nominals[0], nominals[1], yout)
+        except NotImplementedError:
+            # The operation cannot be expressed by elementwise
+            # derivatives; the result is computed in forward mode:
+            return uufunc.evaluate(*operands)
+
+        pullbacks = [(operand, elementwise(factor, numpy.shape(operand)))
+                for (operand, factor) in zip(operands, factors)
+                if isinstance(operand, upy2.core.undarray)]
+        return cls(yout, pullbacks, blocksize)
+
+    #
+    # Recorded operations besides uufuncs ...
+    #
+
+    def scaled(self, factor):
+        return adjointundarray(self.nominal * factor,
+                [(self, elementwise(factor, self.shape))], self.blocksize)
+
+    def sum(self, axis=None, dtype=None, out=None, keepdims=False):
+        """ Records the sum along *axis*, see :meth:`undarray.sum`.
+        *dtype* and *out* are not supported. """
+
+        if dtype is not None or out is not None:
+            raise ValueError(
+                    'The dtype and out arguments are not supported in '
+                    'reverse mode')
+        axes = upy2.core.reduction_axes(axis, self.ndim)
+        shape = self.shape
+
+        def pullback(adjoint):
+            if not keepdims:
+                adjoint = adjoint.reshape(adjoint.shape[:1] + tuple(
+                    1 if index in axes else length
+                    for (index, length) in enumerate(shape)))
+            return numpy.broadcast_to(adjoint, adjoint.shape[:1] + shape)
+
+        return adjointundarray(
+                self.nominal.sum(axis=axes, keepdims=keepdims),
+                [(self, pullback)], self.blocksize)
+
+    def __getitem__(self, key):
+        shape = self.shape
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        def pullback(adjoint):
+            result = numpy.zeros(adjoint.shape[:1] + shape, adjoint.dtype)
+            numpy.add.at(numpy.moveaxis(result, 0, -1),
+                    key + (slice(None),), numpy.moveaxis(adjoint, 0, -1))
+            return result
+
+        return adjointundarray(self.nominal[key].copy(),
+                [(self, pullback)], self.blocksize)
+
+    def augment(self, uufunc, other):
+        # Nodes are immutable, since their nominal values might be
+        # referenced by other nodes.
+        return NotImplemented
+
+    #
+    # Back-propagation ...
+    #
+
+    def graph(self):
+        """ Returns the nodes of the tape leading to *self* in an order
+        where all operands precede their consumers. """
+
+        nodes = []
+        visited = set()
+        pending = [(self, False)]
+        while pending:
+            (node, expanded) = pending.pop()
+            if expanded:
+                nodes.append(node)
+                continue
+            if id(node) in visited:
+                continue
+            visited.add(id(node))
+            pending.append((node, True))
+            for (operand, pullback) in node.pullbacks:
+                if isinstance(operand, adjointundarray):
+                    pending.append((operand, False))
+        return nodes
+
+    def backward(self, seed):
+        """ Back-propagates the adjoints *seed*, of shape ``(n,) +
+        self.shape``, through the tape.  Returns the adjoints with
+        respect to the *leaves*, i.e., the undarrays not recorded, as
+        a list of ``(leaf, adjoint)`` tuples. """
+
+        nodes = self.graph()
+        adjoints = {id(self): seed}
+        leaves = {}
+        for node in reversed(nodes):
+            adjoint = adjoints.pop(id(node), None)
+            if adjoint is None:
+                continue
+            for (operand, pullback) in node.pullbacks:
+                contribution = pullback(adjoint)
+                if isinstance(operand, adjointundarray):
+                    if id(operand) in adjoints:
+                        contribution = adjoints[id(operand)] + contribution
+                    adjoints[id(operand)] = contribution
+                else:
+                    if id(operand) in leaves:
+                        contribution = leaves[id(operand)][1] + contribution
+                    leaves[id(operand)] = (operand, contribution)
+        return list(leaves.values())
+
+    def evaluate(self):
+        """ Computes the Dependencies of *self* by back-propagation and
+        returns the resulting :class:`undarray`. """
+
+        if self.result is not None:
+            return self.result
+
+        size = self.nominal.size
+        packer = upy2.dependency.DependencyStack(shape=(size,),
+                dtype=self.dtype)
+        blocks = []
+        for start in range(0, size, self.blocksize):
+            stop = min(start + self.blocksize, size)
+            # One adjoint per output element, seeded by a unit vector:
+            seed = numpy.zeros((stop - start, size), dtype=self.dtype)
+            seed[:, start:stop] = numpy.eye(stop - start)
+
+            names = []
+            derivatives = []
+            for (leaf, adjoint) in self.backward(
+                    seed.reshape((stop - start,) + self.shape)):
+                stack = leaf.stack
+                adjoint = adjoint.reshape((len(adjoint), 1, -1))
+                leaf_names = stack.names.reshape((1, len(stack), -1))
+                leaf_derivatives = adjoint * \
+                        stack.derivatives.reshape((1, len(stack), -1))
+                names.append(numpy.broadcast_to(leaf_names,
+                    leaf_derivatives.shape).reshape((stop - start, -1)))
+                derivatives.append(leaf_derivatives.reshape(
+                    (stop - start, -1)))
+
+            if len(names) == 0:
+                blocks.append((numpy.zeros((stop - start, 0), dtype=int),
+                    numpy.zeros((stop - start, 0), dtype=self.dtype)))
+                continue
+            blocks.append(packer.repack(
+                    names=numpy.concatenate(names, axis=-1),
+                    derivatives=numpy.concatenate(derivatives, axis=-1)))
+
+        nlayers = max([block_names.shape[-1]
+            for (block_names, block_derivatives) in blocks] + [0])
+        names = numpy.zeros((nlayers, size), dtype=int)
+        derivatives = numpy.zeros((nlayers, size), dtype=self.dtype)
+        start = 0
+        for (block_names, block_derivatives) in blocks:
+            (count, width) = block_names.shape
+            names[:width, start:start + count] = block_names.T
+            derivatives[:width, start:start + count] = block_derivatives.T
+            start += count
+
+        self.result = upy2.core.undarray(nominal=self.nominal)
+        self.result.adopt(upy2.dependency.DependencyStack(
+                shape=self.shape,
+                names=names.reshape((nlayers,) + self.shape),
+                derivatives=derivatives.reshape((nlayers,) + self.shape)))
+        return self.result
+
+    @property
+    def stack(self):
+        return self.evaluate().stack
+
+    @stack.setter
+    def stack(self, stack):
+        self.evaluate().stack = stack
+
+
+def elementwise(factor, shape):
+    """ Returns the pullback of an elementwise operation with
+    derivative *factor* with respect to an operand of shape *shape*.
+    Adjoints broadcast in the operation are summed up. """
+
+    def pullback(adjoint):
+        adjoint = adjoint * factor
+        # Sum over the axes along which the operand has been broadcast:
+        extra = adjoint.ndim - 1 - len(shape)
+        axes = tuple(range(1, 1 + extra)) + tuple(
+                1 + extra + index for (index, length) in enumerate(shape)
+                if length == 1 and adjoint.shape[1 + extra + index] != 1)
+        if axes:
+            adjoint = adjoint.sum(axis=axes)
+        return adjoint.reshape(adjoint.shape[:1] + tuple(shape))
+
+    return pullback
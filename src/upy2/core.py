@@ -3,13 +3,17 @@
 """ The central upy2 module, implementing the uncertain ndarray:
 :class:`undarray`. """
 
+import operator
 import numpy
 import upy2
 import upy2.dependency
 import upy2.typesetting.protocol
 import upy2.sessions
+import upy2.linalg
+import upy2.shared
 
 __all__ = ['undarray', 'uzeros', 'asuarray', 'ucopy', 'U', 'u',
+    'Compaction', 'Precision', 'Engine',
     'upositive', 'unegative', 'uabsolute', 'usqrt', 'usquare',
     'usin', 'ucos', 'utan', 'uarcsin', 'uarccos', 'uarctan',
     'usinh', 'ucosh', 'utanh', 'uarcsinh', 'uarccosh', 'uarctanh',
@@ -107,6 +111,130 @@ def u(uncertainty):
     return U_session.current().provide(uncertainty)
 
 
+#
+# Automatic compaction ...
+#
+
+
+class Compaction(upy2.sessions.Protocol):
+    def __init__(self, threshold):
+        """ "Compaction" Session managers compact the Dependencies of
+        undarrays automatically.  Whenever Dependencies are
+        incorporated into an undarray, the undarray will be compacted
+        by :meth:`undarray.compact` when the fill factor of its
+        Dependencies has dropped below *threshold*.
+
+        Without a Compaction Session manager in effect, undarrays
+        will be compacted only on request. """
+
+        upy2.sessions.Protocol.__init__(self)
+
+        self.threshold = threshold
+
+    def apply(self, uarray):
+        """ Compacts *uarray* if the fill factor of its Dependencies
+        is below the threshold. """
+
+        if uarray.stack.fill < self.threshold:
+            uarray.compact()
+
+upy2.sessions.define(Compaction)
+
+compaction_session = upy2.sessions.byprotocol(Compaction)
+
+
+#
+# Storage precision ...
+#
+
+
+class Precision(upy2.sessions.Protocol):
+    def __init__(self, dtype=numpy.float32, names_dtype=numpy.int32):
+        """ "Precision" Session managers determine the dtypes used to
+        store the Dependencies of undarrays created while in effect.
+        Floating-point derivatives are stored with the precision of
+        *dtype*, while the nominal values retain their dtype; e.g., the
+        derivatives of a ``float64`` undarray are stored as ``float32``
+        with the default *dtype*, and those of a ``complex128``
+        undarray as ``complex64``.  Derivatives are never widened, and
+        the derivatives of integer undarrays are not affected.  The
+        names are stored with the integer dtype *names_dtype*.
+
+        Arithmetics retain the precision of the derivatives, see
+        :func:`upy2.dependency.promote`; variances are accumulated in
+        the precision of the nominal value.
+
+        Without a Precision Session manager in effect, derivatives are
+        stored with the dtype of the nominal value, and names with
+        dtype ``int``. """
+
+        upy2.sessions.Protocol.__init__(self)
+
+        self.dtype = numpy.dtype(dtype)
+        self.names_dtype = numpy.dtype(names_dtype)
+
+    def storage(self, dtype):
+        """ Returns the dtypes ``(names_dtype, derivatives_dtype)``
+        used to store the Dependencies of an undarray of dtype
+        *dtype*. """
+
+        dtype = numpy.dtype(dtype)
+        if dtype.kind not in 'fc':
+            return (self.names_dtype, dtype)
+        narrow = upy2.dependency.promote(self.dtype, dtype)
+        if narrow.itemsize < dtype.itemsize:
+            return (self.names_dtype, narrow)
+        return (self.names_dtype, dtype)
+
+upy2.sessions.define(Precision)
+
+precision_session = upy2.sessions.byprotocol(Precision)
+
+
+#
+# Evaluation engines ...
+#
+
+
+class Engine(upy2.sessions.Protocol):
+    """ Engines carry out the evaluation of uufuncs.  Without an
+    Engine Session manager in effect, uufuncs are evaluated
+    immediately by :meth:`Unary.evaluate` and :meth:`Binary.evaluate`.
+    Engines might defer, record or distribute the evaluation. """
+
+    def unary(self, uufunc, x):
+        """ Evaluate the unary uufunc *uufunc* with operand *x*. """
+
+        raise NotImplementedError('Virtual method called')
+
+    def binary(self, uufunc, x1, x2):
+        """ Evaluate the binary uufunc *uufunc* with operands *x1* and
+        *x2*. """
+
+        raise NotImplementedError('Virtual method called')
+
+    def sum(self, x, axes, dtype, keepdims):
+        """ Sum the undarray *x* along the nonnegative axes *axes*,
+        see :meth:`undarray.sum`.  Engines which do not carry out
+        reductions return ``NotImplemented``; then the sum is computed
+        immediately. """
+
+        return NotImplemented
+
+    def stack(self, shape, dtype, names_dtype):
+        """ Return the empty :class:`DependencyStack` of a new undarray
+        of shape *shape*, storing derivatives of dtype *dtype* and
+        names of dtype *names_dtype*.  Engines which do not manage the
+        storage of undarrays return ``NotImplemented``; then the stack
+        is held in memory. """
+
+        return NotImplemented
+
+upy2.sessions.define(Engine)
+
+engine_session = upy2.sessions.byprotocol(Engine)
+
+
 #
 # The central undarray class ...
 #
@@ -121,6 +249,49 @@ def withoptout(fn):
     return augmented
 
 
+def reduction_axes(axis, ndim):
+    """ Returns the axes specified by *axis* for a reduction of an
+    array with *ndim* dimensions as a tuple of nonnegative indices.
+    *axis* might be ``None``, designating all axes, an integer or a
+    tuple of integers. """
+
+    if axis is None:
+        return tuple(range(ndim))
+    if not isinstance(axis, tuple):
+        axis = (axis,)
+
+    axes = []
+    for index in axis:
+        index = operator.index(index)
+        if not -ndim <= index < ndim:
+            raise ValueError(
+                    'axis {0} is out of bounds for array of dimension '
+                    '{1}'.format(index, ndim))
+        axes.append(index % ndim)
+    if len(set(axes)) != len(axes):
+        raise ValueError('duplicate value in \'axis\'')
+    return tuple(axes)
+
+
+def memory_order(order, array):
+    """ Returns the *order* of numpy's reshaping methods resolved to
+    ``'C'`` or ``'F'``.  ``'A'`` and ``'K'`` refer to the memory layout
+    of the ndarray *array*; they resolve to ``'F'`` for Fortran
+    contiguous *array*, and to ``'C'`` otherwise.  The stacked layers
+    are laid out independently of *array*, so the nominal value and
+    the layers need to use the same resolved order. """
+
+    if order in ('A', 'K', 'a', 'k'):
+        return 'F' if numpy.isfortran(array) else 'C'
+    return order
+
+
+def unpickle_undarray(nominal, stack):
+    result = undarray(nominal=nominal)
+    result.stack = stack
+    return result
+
+
 class undarray(object):
     """Implements uncertain ndarrays.  The name is derived from
     :class:`numpy.ndarray`. """
@@ -157,12 +328,28 @@ class undarray(object):
         if nominal is None:
             raise ValueError("Missing nominal value specification")
 
-        self.dependencies = []
         self.nominal = numpy.asarray(nominal, dtype=dtype)
         self.shape = self.nominal.shape
         self.dtype = self.nominal.dtype
         self.ndim = self.nominal.ndim
 
+        try:
+            precision = precision_session.current()
+        except LookupError:
+            (names_dtype, storage) = (numpy.dtype(int), self.dtype)
+        else:
+            (names_dtype, storage) = precision.storage(self.dtype)
+        try:
+            engine = engine_session.current()
+        except LookupError:
+            self.stack = NotImplemented
+        else:
+            self.stack = engine.stack(self.shape, storage, names_dtype)
+        if self.stack is NotImplemented:
+            self.stack = upy2.dependency.DependencyStack(
+                    shape=self.shape, dtype=storage,
+                    names_dtype=names_dtype)
+
         if stddev is not None:
             # Create a Dependendy instance from scratch.
             dependency = upy2.dependency.Dependency(
@@ -174,11 +361,23 @@ class undarray(object):
                 # the data given.
             self.append(dependency)
 
+    @property
+    def dependencies(self):
+        """ The list of Dependencies of this :class:`undarray`.  The
+        Dependencies are stored in :attr:`stack`; the Dependencies
+        returned are views into the stacked layers, such that
+        modifications of their names and derivatives apply to *self*.
+        """
+
+        return self.stack.layers()
+
     def append(self, dependency):
-        """ Append an instance of :class:`Dependency` to the list of
+        """ Append an instance of :class:`Dependency` to the
         Dependencies in this :class:`undarray`.  Both the shape as
         well as the dtype of *dependency* need to match the shape and
-        the dtype of *self* *accurately*. """
+        the dtype of *self* *accurately*.  The derivatives are stored
+        with the precision of :attr:`stack`, see :class:`Precision`.
+        """
 
         if not self.shape == dependency.shape:
             raise ValueError(
@@ -190,32 +389,52 @@ class undarray(object):
                     ('Cannot append a Dependency of dtype {0} '
                      'to a {1}-dtyped undarray').format(
                     dependency.dtype, self.dtype))
-        self.dependencies.append(dependency)
+        self.stack.append(dependency)
+
+    def adopt(self, stack):
+        """ Use the :class:`DependencyStack` *stack* as the stack of
+        Dependencies of *self*, replacing all Dependencies present.
+        Like in :meth:`append`, the shape of *stack* needs to match the
+        shape of *self*; its dtype needs to be safely castable to the
+        dtype of *self*.  When the dtypes of *stack* differ from those
+        used for storing the Dependencies of *self*, see
+        :class:`Precision`, a cast copy of *stack* is adopted. """
+
+        if not self.shape == stack.shape:
+            raise ValueError(
+                    ('Cannot adopt a DependencyStack of shape {0} '
+                     'in a {1}-shaped undarray').format(
+                    stack.shape, self.shape))
+        if not numpy.can_cast(stack.dtype, self.dtype):
+            raise ValueError(
+                    ('Cannot adopt a DependencyStack of dtype {0} '
+                     'in a {1}-dtyped undarray').format(
+                    stack.dtype, self.dtype))
+        self.stack = stack.astype(self.stack.dtype,
+                self.stack.names_dtype, casting='same_kind')
 
     def clear(self, key):
         """ Abandon all uncertainty information in the subset of
         *self* specified by *key*. """
 
-        for dependency in self.dependencies:
-            dependency.clear(key)
+        self.stack.clear(key)
 
     def scaled(self, factor):
         """ This method implements the operation ``ua * factor``,
         where *factor* isn't another undarray.  This is used to
-        implement multiplication within :class:`Multiply`. """
+        implement multiplication within :class:`Multiply`.  All
+        layers are scaled at once. """
 
         result = undarray(nominal=(self.nominal * factor))
-
-        for dependency in self.dependencies:
-            result.append(dependency * factor)
-
+        result.adopt(self.stack * factor)
         return result
 
     def copy_dependencies(self, source, key=None):
         """ *source* is an ``undarray`` whose ``Dependencies`` will be
         incorporated into *self*.  *key* indexes *self* and determines
         the location where the ``Dependencies`` of *source* will be
-        added. """
+        added.  Derivatives with respect to the same name are summed;
+        see :meth:`DependencyStack.join`. """
 
         # Check dtype compatibility ...
 
@@ -227,27 +446,89 @@ class undarray(object):
 
         # Incorporate the Dependecies of *source* ...
 
-        for dependency in source.dependencies:
-            # First, everything is left:
-            remnant = dependency
-
-            for target in self.dependencies:
-                if remnant.is_empty():
-                    # This source has been exhausted.
-                    break
-                # Attempt to add on same name or to fill empty space:
-                remnant = target.add(remnant, key)
-
-            if remnant.is_nonempty():
-                # Append the *remnant* to a new empty Dependency of
-                # self's shape.
-                broadcasted_remnant = \
-                    upy2.dependency.Dependency(
-                        shape=self.shape,
-                        dtype=self.dtype,
-                    )
-                broadcasted_remnant.add(remnant, key)
-                self.append(broadcasted_remnant)
+        self.stack.join(source.stack, key)
+
+        # Apply the Compaction policy, if any ...
+
+        try:
+            compaction = compaction_session.current()
+        except LookupError:
+            return
+        compaction.apply(self)
+
+    def assign(self, nominal, sources, where=True):
+        """ Overwrites *self* with the nominal value *nominal* and
+        with the Dependencies of the undarrays in *sources*.  This
+        implements the ``out=`` argument of uufuncs.  The buffers of
+        *self* are reused; they grow only when more layers are needed.
+        *sources* might contain *self*.
+
+        *where* restricts the assignment to the elements where it is
+        true, see the ``where=`` argument of numpy ufuncs.  The other
+        elements of *self* are left unchanged. """
+
+        if numpy.broadcast_shapes(numpy.shape(nominal), self.shape) != \
+                self.shape:
+            raise ValueError(
+                    "non-broadcastable output operand with shape {0} "
+                    "doesn't match the broadcast shape {1}".format(
+                        upy2.dependency.format_shape(self.shape),
+                        upy2.dependency.format_shape(
+                            numpy.broadcast_shapes(
+                                numpy.shape(nominal), self.shape))))
+        if not numpy.can_cast(numpy.result_type(nominal), self.dtype):
+            raise ValueError(
+                    ('Cannot assign an {0}-dtype result to an '
+                     '{1}-dtype undarray').format(
+                         numpy.result_type(nominal), self.dtype))
+
+        if where is True:
+            # If *self* is among the sources, its layers are kept:
+            keep = False
+            joined = []
+            for source in sources:
+                if source is self and not keep:
+                    keep = True
+                elif source is self:
+                    joined.append(self.copy())
+                else:
+                    joined.append(source)
+
+            if not keep:
+                self.stack.truncate(0)
+            self.nominal[...] = nominal
+            for source in joined:
+                self.copy_dependencies(source)
+
+        else:
+            where = numpy.broadcast_to(where, self.shape)
+            selection = numpy.nonzero(where)
+
+            # The selected elements of the sources are extracted before
+            # *self* is modified:
+            joined = []
+            for source in sources:
+                offset = self.ndim - source.ndim
+                joined.append(source[tuple(
+                    numpy.zeros_like(selection[offset + axis])
+                        if source.shape[axis] == 1
+                        else selection[offset + axis]
+                    for axis in range(source.ndim))])
+
+            self.clear(where)
+            self.nominal[where] = \
+                    numpy.broadcast_to(nominal, self.shape)[where]
+            for source in joined:
+                self.copy_dependencies(source, key=where)
+
+    def compact(self):
+        """ Repacks the Dependencies of *self* into the minimal number
+        of Dependencies.  The elements of the Dependencies which are
+        not used, i.e., which have zero name, are squeezed out; see
+        :meth:`DependencyStack.compact`.  The uncertainty information
+        is retained. """
+
+        self.stack.compact()
 
     #
     # Complex numbers ...
@@ -260,8 +541,7 @@ class undarray(object):
 
         result = undarray(self.nominal.real.copy())
             # ``.real`` returns a View.
-        for dependency in self.dependencies:
-            result.append(dependency.real)
+        result.adopt(self.stack.real)
         return result
 
     @property
@@ -271,8 +551,7 @@ class undarray(object):
 
         result = undarray(self.nominal.imag.copy())
             # ``.imag`` returns a View.
-        for dependency in self.dependencies:
-            result.append(dependency.imag)
+        result.adopt(self.stack.imag)
         return result
 
     def conjugate(self):
@@ -280,8 +559,7 @@ class undarray(object):
 
         result = undarray(self.nominal.conj())
             # ``.conj`` returns a copy of the real component.
-        for dependency in self.dependencies:
-            result.append(dependency.conj())
+        result.adopt(self.stack.conj())
         return result
 
     def conj(self):
@@ -302,10 +580,7 @@ class undarray(object):
                     'Refusing to calculate the variance of a '
                     'non-real undarray')
 
-        result = numpy.zeros(shape=self.shape, dtype=self.dtype)
-        for dependency in self.dependencies:
-            result += dependency.variance
-        return result
+        return self.stack.induced_variance(self.dtype)
     
     @property
     def stddev(self):
@@ -314,15 +589,71 @@ class undarray(object):
         return numpy.sqrt(self.variance)
             # Obtaining the variance for non-real undarrays will fail.
 
+    def sample(self, n, rng=None, out=None, chunksize=2 ** 22):
+        """ Returns *n* realisations of *self*, drawn from the linear
+        model ``nominal + sum(derivatives * z[name])``, where ``z``
+        assigns one independent standard normal variate to each name
+        per realisation.  Elements sharing names are thus correlated as
+        described by the Dependencies.  *rng* is a
+        ``numpy.random.Generator`` or a seed for one.
+
+        The realisations are returned in an ndarray of shape ``(n,) +
+        shape``.  When given, they are written to *out* instead, which
+        might be a ``numpy.memmap`` for large *n*.  The realisations
+        are drawn in chunks, such that the temporary ndarrays hold at
+        most *chunksize* entries, i.e. realisations times layers times
+        elements. """
+
+        stack = self.stack
+        if not numpy.isrealobj(self.nominal) or \
+                not numpy.isrealobj(stack.derivatives):
+            raise ValueError('Refusing to sample a non-real undarray')
+
+        rng = numpy.random.default_rng(rng)
+        if out is None:
+            # The realisations are floating point even when the nominal
+            # value and the derivatives are integers:
+            out = numpy.empty((n,) + self.shape,
+                    dtype=numpy.result_type(self.dtype, stack.dtype, float))
+
+        # Each entry of the layers gathers the variate of its name:
+        (names, indices) = numpy.unique(stack.names, return_inverse=True)
+        indices = indices.reshape(stack.names.shape)
+        derivatives = numpy.where(stack.names != 0, stack.derivatives, 0)
+
+        step = max(chunksize // max(stack.names.size, 1), 1)
+        for start in range(0, n, step):
+            stop = min(start + step, n)
+            variates = rng.standard_normal((stop - start, len(names)))
+            out[start:stop] = self.nominal + numpy.einsum(
+                    'i...,ji...->j...', derivatives, variates[:, indices])
+        return out
+
     #
     # numpy :meth:`__array_ufunc__` protocol ...
     #
 
     def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method in ('reduce', 'accumulate'):
+            return self.reduction(ufunc, method, *inputs, **kwargs)
         if method != '__call__':
             return NotImplemented
+
+        # Only the *out* and *where* arguments are supported:
+        out = kwargs.pop('out', None)
+        where = kwargs.pop('where', True)
         if len(kwargs) > 0:
             return NotImplemented
+        if out is not None:
+            if len(out) != 1 or not isinstance(out[0], undarray):
+                return NotImplemented
+            options = {'out': out[0], 'where': where}
+        elif where is not True:
+            # Without *out*, the elements not selected would be left
+            # uninitialised.
+            return NotImplemented
+        else:
+            options = {}
 
         if len(inputs) == 1:
             (A,) = inputs
@@ -331,67 +662,111 @@ class undarray(object):
             (A, B) = inputs
 
         if ufunc is numpy.positive:
-            return self
+            if not options:
+                return self
+            return upositive(A, **options)
         elif ufunc is numpy.negative:
-            return unegative(A)
+            return unegative(A, **options)
         elif ufunc is numpy.absolute:
-            return uabsolute(A)
+            return uabsolute(A, **options)
 
         elif ufunc is numpy.add:
-            return uadd(A, B)
+            return uadd(A, B, **options)
         elif ufunc is numpy.subtract:
-            return usubtract(A, B)
+            return usubtract(A, B, **options)
         elif ufunc is numpy.multiply:
-            return umultiply(A, B)
+            return umultiply(A, B, **options)
         elif ufunc is numpy.divide:
-            return udivide(A, B)
+            return udivide(A, B, **options)
         elif ufunc is numpy.power:
-            return upower(A, B)
+            return upower(A, B, **options)
         
         elif ufunc is numpy.sqrt:
-            return usqrt(A)
+            return usqrt(A, **options)
         elif ufunc is numpy.square:
-            return usquare(A)
+            return usquare(A, **options)
 
         elif ufunc is numpy.sin:
-            return usin(A)
+            return usin(A, **options)
         elif ufunc is numpy.cos:
-            return ucos(A)
+            return ucos(A, **options)
         elif ufunc is numpy.tan:
-            return utan(A)
+            return utan(A, **options)
 
         elif ufunc is numpy.arcsin:
-            return uarcsin(A)
+            return uarcsin(A, **options)
         elif ufunc is numpy.arccos:
-            return uarccos(A)
+            return uarccos(A, **options)
         elif ufunc is numpy.arctan:
-            return uarctan(A)
+            return uarctan(A, **options)
 
         elif ufunc is numpy.sinh:
-            return usinh(A)
+            return usinh(A, **options)
         elif ufunc is numpy.cosh:
-            return ucosh(A)
+            return ucosh(A, **options)
         elif ufunc is numpy.tanh:
-            return utanh(A)
+            return utanh(A, **options)
 
         elif ufunc is numpy.arcsinh:
-            return uarcsinh(A)
+            return uarcsinh(A, **options)
         elif ufunc is numpy.arccosh:
-            return uarccosh(A)
+            return uarccosh(A, **options)
         elif ufunc is numpy.arctanh:
-            return uarctanh(A)
+            return uarctanh(A, **options)
 
         elif ufunc is numpy.exp:
-            return uexp(A)
+            return uexp(A, **options)
         elif ufunc is numpy.exp2:
-            return uexp2(A)
+            return uexp2(A, **options)
 
         elif ufunc is numpy.log:
-            return ulog(A)
+            return ulog(A, **options)
         elif ufunc is numpy.log2:
-            return ulog2(A)
+            return ulog2(A, **options)
         elif ufunc is numpy.log10:
-            return ulog10(A)
+            return ulog10(A, **options)
+
+        elif ufunc is numpy.matmul:
+            result = upy2.linalg.umatmul(A, B)
+            if options:
+                options['out'].assign(
+                        result.nominal, (result,), where=options['where'])
+                return options['out']
+            return result
+
+    def reduction(self, ufunc, method, A, axis=0, dtype=None, out=None,
+            keepdims=False, **kwargs):
+        """ Implements the ``reduce`` and ``accumulate`` methods of the
+        ufuncs ``numpy.add`` and, for ``reduce``, ``numpy.multiply``.
+        """
+
+        if len(kwargs) > 0 or A is not self:
+            return NotImplemented
+        if out is not None:
+            if len(out) != 1 or not isinstance(out[0], undarray):
+                return NotImplemented
+            (out,) = out
+
+        if method == 'reduce':
+            if ufunc is numpy.add:
+                return self.sum(axis=axis, dtype=dtype, out=out,
+                        keepdims=keepdims)
+            elif ufunc is numpy.multiply:
+                return self.prod(axis=axis, dtype=dtype, out=out,
+                        keepdims=keepdims)
+
+        elif method == 'accumulate' and ufunc is numpy.add and \
+                not keepdims:
+            (axis,) = reduction_axes(axis, self.ndim)
+            result = undarray(nominal=numpy.add.accumulate(
+                self.nominal, axis=axis, dtype=dtype))
+            result.adopt(self.stack.accumulate(axis))
+            if out is not None:
+                out.assign(result.nominal, (result,))
+                return out
+            return result
+
+        return NotImplemented
 
     #
     # Binary arithmetics ...
@@ -421,6 +796,10 @@ class undarray(object):
     def __pow__(self, other):
         return numpy.power(self, other)
 
+    @withoptout
+    def __matmul__(self, other):
+        return numpy.matmul(self, other)
+
     #
     # Reflected binary arithmetics ...
     #
@@ -449,10 +828,81 @@ class undarray(object):
     def __rpow__(self, other):
         return numpy.power(other, self)
 
+    @withoptout
+    def __rmatmul__(self, other):
+        return numpy.matmul(other, self)
+
     #
-    # Augmented arithmetics will be emulated ...
+    # Augmented arithmetics ...
     #
 
+    def augment(self, uufunc, other):
+        """ Applies the binary uufunc *uufunc* to *self* and *other*
+        *in place*.  The nominal value of *self* is overwritten, the
+        Dependencies of *self* are scaled in place and the
+        Dependencies of *other* are joined into the existing layers.
+        Returns ``NotImplemented``, such that Python falls back to the
+        binary operation, when the result cannot be stored in *self*
+        because of its shape or dtype, or when an :class:`Engine`
+        Session manager is in effect. """
+
+        if hasattr(other, '__array_ufunc__') and \
+                other.__array_ufunc__ is None:
+            return NotImplemented
+        try:
+            engine_session.current()
+        except LookupError:
+            pass
+        else:
+            return NotImplemented
+
+        y1 = self.nominal
+        if isinstance(other, undarray):
+            y2 = other.nominal
+        else:
+            y2 = numpy.asarray(other)
+
+        yout = uufunc.ufunc(y1, y2)
+        if yout.shape != self.shape or \
+                not numpy.can_cast(yout.dtype, self.dtype):
+            return NotImplemented
+
+        # Both the derivative with respect to *self* and the source
+        # from *other* are obtained before *self* is modified, since
+        # they might refer to the nominal value of *self*:
+        try:
+            derivative1 = uufunc._derivative1(y1, y2, yout)
+        except NotImplementedError:
+            return NotImplemented
+        if isinstance(other, undarray):
+            source = uufunc._source2(y1, other, yout)
+            if source is self:
+                source = self.copy()
+        else:
+            source = None
+
+        if not (numpy.isscalar(derivative1) and derivative1 == 1):
+            self.stack.derivatives[...] *= derivative1
+        y1[...] = yout
+        if source is not None:
+            self.copy_dependencies(source)
+        return self
+
+    def __iadd__(self, other):
+        return self.augment(uadd, other)
+
+    def __isub__(self, other):
+        return self.augment(usubtract, other)
+
+    def __imul__(self, other):
+        return self.augment(umultiply, other)
+
+    def __idiv__(self, other):
+        return self.augment(udivide, other)
+
+    def __itruediv__(self, other):
+        return self.augment(udivide, other)
+
     #
     # Unary operators ...
     #
@@ -556,9 +1006,7 @@ class undarray(object):
         Dependencies. """
 
         result = undarray(nominal=self.nominal[key].copy())
-        for dependency in self.dependencies:
-            result.append(dependency[key])
-
+        result.adopt(self.stack[key])
         return result
 
     def __setitem__(self, key, value):
@@ -589,18 +1037,18 @@ class undarray(object):
     # ndarray methods, alphabetically sorted ...
     #
 
-    def compress(self, *compress_args, **compress_kwargs):
+    def compress(self, condition, axis=None, out=None):
         """ Returns a copy with compressed nominal value and
-        Dependencies, see ``numpy.compress``. """
+        Dependencies, see ``numpy.compress``.  All layers are
+        compressed at once by :meth:`DependencyStack.compress`.  When
+        given, the result is written to the undarray *out*. """
 
         result = undarray(
-            nominal=self.nominal.compress(
-                *compress_args, **compress_kwargs
-            ))
-        for dependency in self.dependencies:
-            result.append(dependency.compress(
-                *compress_args, **compress_kwargs
-            ))
+            nominal=self.nominal.compress(condition, axis=axis))
+        result.adopt(self.stack.compress(condition, axis=axis))
+        if out is not None:
+            out.assign(result.nominal, (result,))
+            return out
         return result
 
     def copy(self):
@@ -610,69 +1058,156 @@ class undarray(object):
         the original, except for that it has its own memory. """
 
         result = undarray(nominal=self.nominal.copy())
-        for dependency in self.dependencies:
-            result.append(dependency.copy())
+        result.adopt(self.stack.copy())
         return result
 
-    def flatten(self, *flatten_args, **flatten_kwargs):
+    def flatten(self, order='C'):
         """ Returns a copy with *flattened* nominal value and
-        Dependencies, see ``numpy.ndarray.flatten``. """
+        Dependencies, see ``numpy.ndarray.flatten``.  All layers are
+        flattened at once, see :func:`memory_order` for *order*. """
 
-        result = undarray(
-            nominal=self.nominal.flatten(
-                *flatten_args, **flatten_kwargs
-            ))
-        for dependency in self.dependencies:
-            result.append(dependency.flatten(
-                *flatten_args, **flatten_kwargs
-            ))
+        order = memory_order(order, self.nominal)
+        result = undarray(nominal=self.nominal.flatten(order))
+        result.adopt(self.stack.flatten(order))
         return result
 
     # Notice also the comment beneath the definition of
     # :meth:`Dependency.flatten`.
 
-    def repeat(self, *repeat_args, **repeat_kwargs):
+    def mean(self, axis=None, dtype=None, out=None, keepdims=False):
+        """ Returns the mean along the axes *axis*, see
+        ``numpy.mean``.  The Dependencies are combined as in
+        :meth:`sum`. """
+
+        axes = reduction_axes(axis, self.ndim)
+        count = int(numpy.prod([self.shape[index] for index in axes],
+            dtype=int))
+        result = self.sum(axis=axes, dtype=dtype, keepdims=keepdims)\
+                .scaled(1.0 / count)
+        if out is not None:
+            out.assign(result.nominal, (result,))
+            return out
+        return result
+
+    def prod(self, axis=None, dtype=None, out=None, keepdims=False):
+        """ Returns the product along the axes *axis*, see
+        ``numpy.prod``.  The derivative with respect to each element is
+        the product of all *other* elements reduced with it; it is
+        obtained from exclusive cumulative products from both sides,
+        such that zero elements are treated correctly.  The scaled
+        Dependencies are combined as in :meth:`sum`. """
+
+        axes = reduction_axes(axis, self.ndim)
+        kept = [index for index in range(self.ndim) if index not in axes]
+        order = kept + list(axes)
+        shape = tuple(self.shape[index] for index in order)
+
+        # The reduced axes are flattened into the last axis:
+        nominal = self.nominal.transpose(order).reshape(
+                shape[:len(kept)] + (-1,))
+        ones = numpy.ones_like(nominal[..., :1])
+        before = numpy.cumprod(numpy.concatenate(
+            (ones, nominal[..., :-1]), axis=-1), axis=-1)
+        after = numpy.cumprod(numpy.concatenate(
+            (ones, nominal[..., :0:-1]), axis=-1), axis=-1)[..., ::-1]
+        derivative = (before * after).reshape(shape).transpose(
+                numpy.argsort(order))
+
+        result = undarray(nominal=self.nominal.prod(
+            axis=axes, dtype=dtype, keepdims=keepdims))
+        result.adopt((self.stack * derivative).sum(
+            axes, keepdims=keepdims))
+        if out is not None:
+            out.assign(result.nominal, (result,))
+            return out
+        return result
+
+    def repeat(self, repeats, axis=None):
         """ Returns a copy with *repeated* nominal value and
-        Dependencies, see ``numpy.repeat``. """
+        Dependencies, see ``numpy.repeat``.  All layers are repeated at
+        once. """
 
         result = undarray(
-            nominal=self.nominal.repeat(
-                *repeat_args, **repeat_kwargs
-            ))
-        for dependency in self.dependencies:
-            result.append(dependency.repeat(
-                *repeat_args, **repeat_kwargs
-            ))
+            nominal=self.nominal.repeat(repeats, axis=axis))
+        result.adopt(self.stack.repeat(repeats, axis=axis))
         return result
 
-    def reshape(self, *reshape_args, **reshape_kwargs):
+    def reshape(self, *shape, **kwargs):
         """ Returns a copy with *reshaped* nominal value and
-        Dependencies, see ``numpy.repeat``. """
+        Dependencies, see ``numpy.reshape``.  The shape might be given
+        as a tuple or by separate arguments.  All layers are reshaped
+        at once, see :func:`memory_order` for the *order* keyword
+        argument. """
+
+        order = kwargs.pop('order', 'C')
+        nominal = self.nominal.reshape(*shape, order=order, **kwargs)
+        result = undarray(nominal=nominal.copy())
+        result.adopt(self.stack.reshape(nominal.shape,
+            order=memory_order(order, self.nominal)))
+        return result
 
-        result = undarray(
-            nominal=self.nominal.reshape(
-                *reshape_args, **reshape_kwargs
-            ).copy())
-        for dependency in self.dependencies:
-            result.append(dependency.reshape(
-                *reshape_args, **reshape_kwargs
-            ))
+    def sum(self, axis=None, dtype=None, out=None, keepdims=False):
+        """ Returns the sum along the axes *axis*, see ``numpy.sum``.
+        For each element of the result, the Dependencies of all
+        elements summed up are merged at once by
+        :meth:`DependencyStack.sum`.  The current :class:`Engine` might
+        carry out the sum, see :meth:`Engine.sum`.  When given, the
+        result is written to the undarray *out*. """
+
+        axes = reduction_axes(axis, self.ndim)
+        try:
+            engine = engine_session.current()
+        except LookupError:
+            result = NotImplemented
+        else:
+            result = engine.sum(self, axes, dtype, keepdims)
+        if result is NotImplemented:
+            result = undarray(nominal=self.nominal.sum(
+                axis=axes, dtype=dtype, keepdims=keepdims))
+            result.adopt(self.stack.sum(axes, keepdims=keepdims))
+        if out is not None:
+            out.assign(result.nominal, (result,))
+            return out
         return result
 
-    def transpose(self, *transpose_args, **transpose_kwargs):
+    def transpose(self, *axes):
         """ Returns a copy with *transposed* nominal value and
-        Dependencies, see ``numpy.transpose``. """
-
+        Dependencies, see ``numpy.transpose``.  The axes might be given
+        as a tuple or by separate arguments.  All layers are transposed
+        at once. """
+
+        if len(axes) == 0:
+            axes = None
+        elif len(axes) == 1 and (axes[0] is None or
+                numpy.ndim(axes[0]) > 0):
+            (axes,) = axes
         result = undarray(
-            nominal=self.nominal.transpose(
-                *transpose_args, **transpose_kwargs
-            ).copy())
-        for dependency in self.dependencies:
-            result.append(dependency.transpose(
-                *transpose_args, **transpose_kwargs
-            ))
+            nominal=self.nominal.transpose(axes).copy())
+        result.adopt(self.stack.transpose(axes))
         return result
 
+    #
+    # Pickling and sharing ...
+    #
+
+    def to_shared(self):
+        """ Copies *self* into a new block of shared memory and returns
+        the :class:`~upy2.shared.SharedHandle` owning the block.  Other
+        processes attach to the block by
+        :func:`~upy2.shared.shared_undarray`.  Only the layers in use
+        are copied. """
+
+        return upy2.shared.share(self)
+
+    def __reduce_ex__(self, protocol):
+        """ Pickles *self* as :class:`undarray` by its nominal value and
+        its :class:`DependencyStack`, trimmed to the layers in use.
+        With pickle protocol 5, the nominal value, the names and the
+        derivatives are passed as out-of-band buffers, one each. """
+
+        return (unpickle_undarray,
+                (upy2.dependency.exported(self.nominal), self.stack))
+
     #
     # String conversion ...
     #
@@ -716,18 +1251,42 @@ class uufunc(object):
 
 class Unary(uufunc):
     """ The base class for unary uufuncs.  Derive unary uufunc classes
-    from this class and define :meth:`_source`.
+    from this class and define :meth:`_derivative`, or, for operations
+    whose uncertainty source cannot be expressed by an elementwise
+    derivative, :meth:`_source`.  Define :meth:`_second_derivative` in
+    addition to support second-order propagation.
 
     Upon calling the derived unary uufunc, :meth:`_source` will only
     be called when the operand is an ``undarray`.
 
-    The result of calling an unary uufunc is *always* an ``undarray``.
+    The result of calling an unary uufunc is *always* an ``undarray``,
+    unless an :class:`Engine` Session manager is in effect, which
+    determines the result then.
     """
 
-    def __call__(self, x):
+    def __call__(self, x, out=None, where=True):
         """ Performs the operation on operand *x*.  If *x* is not an
         instance of :class:`undarray`, it will be passed through
-        :func:`numpy.asarray`. """
+        :func:`numpy.asarray`.  The evaluation is carried out by the
+        current :class:`Engine`, if there is one, and by
+        :meth:`evaluate` otherwise.
+
+        When the undarray *out* is given, the result is written into
+        *out* immediately, restricted to the elements where *where* is
+        true; see :meth:`undarray.assign`. """
+
+        if out is not None:
+            return self.evaluate(x, out=out, where=where)
+        try:
+            engine = engine_session.current()
+        except LookupError:
+            return self.evaluate(x)
+        return engine.unary(self, x)
+
+    def evaluate(self, x, out=None, where=True):
+        """ Performs the operation on operand *x* immediately,
+        returning an ``undarray`` with its Dependencies.  The result
+        is written into *out*, if given. """
 
         if isinstance(x, undarray):
             y = x.nominal
@@ -735,36 +1294,91 @@ class Unary(uufunc):
             y = numpy.asarray(x)
 
         yout = self.ufunc(y)
-        result = undarray(nominal=yout)
         if isinstance(x, undarray):
-            result.copy_dependencies(self._source(x))
+            sources = (self._source(x, yout),)
+        else:
+            sources = ()
+
+        if out is not None:
+            out.assign(yout, sources, where=where)
+            return out
+
+        result = undarray(nominal=yout)
+        for source in sources:
+            result.copy_dependencies(source)
         return result
 
-    def _source(self, x):
+    def _source(self, x, yout):
         """ Derive the source of uncertainties of the nominal value
         based on the operand *x* of the operation.  *x* is an
-        ``undarray``. """
+        ``undarray``, *yout* is the nominal value of the result.  By
+        default, the Dependencies of *x* are scaled by
+        :meth:`_derivative`. """
+
+        return x.scaled(self._derivative(x.nominal, yout))
+
+    def _derivative(self, y, yout):
+        """ Return the derivative of the operation with respect to its
+        operand, evaluated elementwise at the nominal value *y* of the
+        operand.  *yout* is the nominal value of the result, which can
+        be used to avoid recomputation.  *y* and *yout* are
+        ``ndarrays``. """
+
+        raise NotImplementedError('Virtual method called')
+
+    def _second_derivative(self, y, yout):
+        """ Return the second derivative of the operation with respect
+        to its operand, evaluated elementwise at the nominal value *y*
+        of the operand.  *yout* is the nominal value of the result.
+        This is used by second-order propagation, see
+        :class:`~upy2.secondorder.SecondOrder`. """
 
         raise NotImplementedError('Virtual method called')
 
 
 class Binary(uufunc):
     """ The base class for binary uufuncs.  Derive binary uufunc
-    classes from this class and define :meth:`_source1` and
-    :meth:`_source2`.
+    classes from this class and define :meth:`_derivative1` and
+    :meth:`_derivative2`, or, alternatively, :meth:`_source1` and
+    :meth:`_source2`.  Define :meth:`_derivatives` or :meth:`_sources`
+    in addition when both derivatives share intermediate results.
+    Second-order propagation uses :meth:`_second_derivative1`,
+    :meth:`_second_derivative2` and :meth:`_mixed_derivative`.
 
     Upon calling the derived binary uufunc, :meth:`_source1` will only
-    be called when the first operand is an ``undarray``, and likewise
-    :meth:`_source2` will only be used when the second operand is an
-    ``undarray``.
-
-    The result of calling a binary uufunc is *always* an ``undarray``.
+    be called when only the first operand is an ``undarray``, and
+    likewise :meth:`_source2` will only be used when only the second
+    operand is an ``undarray``.  When both operands are undarrays,
+    :meth:`_sources` is called.
+
+    The result of calling a binary uufunc is *always* an ``undarray``,
+    unless an :class:`Engine` Session manager is in effect, which
+    determines the result then.
     """
 
-    def __call__(self, x1, x2):
+    def __call__(self, x1, x2, out=None, where=True):
         """ Performs the operation on operands *x1* and *x2*.  If the
         operands are not instances of :class:`undarray`, they will be
-        passed through :func:`numpy.asarray`. """
+        passed through :func:`numpy.asarray`.  The evaluation is
+        carried out by the current :class:`Engine`, if there is one,
+        and by :meth:`evaluate` otherwise.
+
+        When the undarray *out* is given, the result is written into
+        *out* immediately, restricted to the elements where *where* is
+        true; see :meth:`undarray.assign`. """
+
+        if out is not None:
+            return self.evaluate(x1, x2, out=out, where=where)
+        try:
+            engine = engine_session.current()
+        except LookupError:
+            return self.evaluate(x1, x2)
+        return engine.binary(self, x1, x2)
+
+    def evaluate(self, x1, x2, out=None, where=True):
+        """ Performs the operation on operands *x1* and *x2*
+        immediately, returning an ``undarray`` with its Dependencies.
+        The result is written into *out*, if given. """
 
         if isinstance(x1, undarray):
             y1 = x1.nominal
@@ -777,26 +1391,108 @@ class Binary(uufunc):
             y2 = numpy.asarray(x2)
 
         yout = self.ufunc(y1, y2)
+        if isinstance(x1, undarray) and isinstance(x2, undarray):
+            sources = self._sources(x1, x2, yout)
+        elif isinstance(x1, undarray):
+            sources = (self._source1(x1, y2, yout),)
+        elif isinstance(x2, undarray):
+            sources = (self._source2(y1, x2, yout),)
+        else:
+            sources = ()
+
+        if out is not None:
+            out.assign(yout, sources, where=where)
+            return out
+
         result = undarray(nominal=yout)
-        if isinstance(x1, undarray):
-            result.copy_dependencies(self._source1(x1, y2))
-        if isinstance(x2, undarray):
-            result.copy_dependencies(self._source2(y1, x2))
+        for source in sources:
+            result.copy_dependencies(source)
         return result
 
-    def _source1(self, x1, y2):
+    def _sources(self, x1, x2, yout):
+        """ Return the uncertainty sources arising from both operands
+        *x1* and *x2*, which are both guaranteed to be undarrays.
+        *yout* is the nominal value of the result.  By default, the
+        Dependencies of *x1* and *x2* are scaled by the derivatives
+        returned by :meth:`_derivatives`. """
+
+        (derivative1, derivative2) = \
+                self._derivatives(x1.nominal, x2.nominal, yout)
+        return (x1.scaled(derivative1), x2.scaled(derivative2))
+
+    def _source1(self, x1, y2, yout):
         """ Return the uncertainty source arising from the first
         operand *x1* given the nominal value *y2* of the second
         operand.  *x1* is guaranteed to be an ``undarray``, *y2* is
-        guaranteed to be an ``ndarray``. """
+        guaranteed to be an ``ndarray``.  *yout* is the nominal value
+        of the result.  By default, the Dependencies of *x1* are
+        scaled by :meth:`_derivative1`. """
 
-        raise NotImplementedError('Virtual method called')
+        return x1.scaled(self._derivative1(x1.nominal, y2, yout))
 
-    def _source2(self, y1, x2):
+    def _source2(self, y1, x2, yout):
         """ Return the uncertainty source arising from the second
         operand *x2* given the nominal value *y1* of the first
         operand.  *x2* is guaranteed to be an ``undarray``, *y1* is
-        guaranteed to be an ``ndarray`. """
+        guaranteed to be an ``ndarray`.  *yout* is the nominal value
+        of the result.  By default, the Dependencies of *x2* are
+        scaled by :meth:`_derivative2`. """
+
+        return x2.scaled(self._derivative2(y1, x2.nominal, yout))
+
+    def _derivatives(self, y1, y2, yout):
+        """ Return both derivatives of the operation as a tuple, see
+        :meth:`_derivative1` and :meth:`_derivative2`.  Override this
+        method to share intermediate results among the two
+        derivatives. """
+
+        return (self._derivative1(y1, y2, yout),
+                self._derivative2(y1, y2, yout))
+
+    def _derivative1(self, y1, y2, yout):
+        """ Return the derivative of the operation with respect to the
+        first operand, evaluated elementwise at the nominal values *y1*
+        and *y2* of the operands.  *yout* is the nominal value of the
+        result.  *y1*, *y2* and *yout* are ``ndarrays``. """
+
+        raise NotImplementedError('Virtual method called')
+
+    def _derivative2(self, y1, y2, yout):
+        """ Return the derivative of the operation with respect to the
+        second operand, evaluated elementwise at the nominal values
+        *y1* and *y2* of the operands.  *yout* is the nominal value of
+        the result.  *y1*, *y2* and *yout* are ``ndarrays``. """
+
+        raise NotImplementedError('Virtual method called')
+
+    def _second_derivatives(self, y1, y2, yout):
+        """ Return the second derivatives of the operation as a tuple
+        ``(d11, d12, d22)``, see :meth:`_second_derivative1`,
+        :meth:`_mixed_derivative` and :meth:`_second_derivative2`.
+        Override this method to share intermediate results. """
+
+        return (self._second_derivative1(y1, y2, yout),
+                self._mixed_derivative(y1, y2, yout),
+                self._second_derivative2(y1, y2, yout))
+
+    def _second_derivative1(self, y1, y2, yout):
+        """ Return the second derivative of the operation with respect
+        to the first operand, evaluated elementwise at the nominal
+        values *y1* and *y2* of the operands.  This is used by
+        second-order propagation, see
+        :class:`~upy2.secondorder.SecondOrder`. """
+
+        raise NotImplementedError('Virtual method called')
+
+    def _second_derivative2(self, y1, y2, yout):
+        """ Return the second derivative of the operation with respect
+        to the second operand, see :meth:`_second_derivative1`. """
+
+        raise NotImplementedError('Virtual method called')
+
+    def _mixed_derivative(self, y1, y2, yout):
+        """ Return the mixed second derivative of the operation with
+        respect to both operands, see :meth:`_second_derivative1`. """
 
         raise NotImplementedError('Virtual method called')
 
@@ -808,70 +1504,94 @@ class Positive(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.positive)
 
-    def _source(self, x):
+    def _source(self, x, yout):
         return x
 
+    def _derivative(self, y, yout):
+        return 1
+
+    def _second_derivative(self, y, yout):
+        return 0
+
 
 class Negative(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.negative)
 
-    def _source(self, x):
-        return x.scaled(-1)
+    def _derivative(self, y, yout):
+        return -1
+
+    def _second_derivative(self, y, yout):
+        return 0
 
 
 class Absolute(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.abs)
 
-    def _source(self, x):
+    def _source(self, x, yout):
+        # For complex operands, the derivatives are *projected* onto
+        # the real axis; this cannot be expressed by an elementwise
+        # derivative.
         y = x.nominal
-        return (x * numpy.sqrt(y.conj() / y)).real
+        return x.scaled(numpy.sqrt(y.conj() / y)).real
 
 
 class Sqrt(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.sqrt)
 
-    def _source(self, x):
-        y = x.nominal
-        return x * (0.5 / numpy.sqrt(y))
+    def _derivative(self, y, yout):
+        return 0.5 / yout
+
+    def _second_derivative(self, y, yout):
+        # f = x ^ (1/2)
+        # d_x d_x f = -1/4 x ^ (-3/2) = -1 / (4 x f)
+        return -0.25 / (y * yout)
 
 
 class Square(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.square)
 
-    def _source(self, x):
-        y = x.nominal
-        return x * (2 * y)
+    def _derivative(self, y, yout):
+        return 2 * y
+
+    def _second_derivative(self, y, yout):
+        return 2
 
 
 class Sin(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.sin)
 
-    def _source(self, x):
-        y = x.nominal
-        return x * numpy.cos(y)
+    def _derivative(self, y, yout):
+        return numpy.cos(y)
+
+    def _second_derivative(self, y, yout):
+        return -yout
 
 
 class Cos(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.cos)
 
-    def _source(self, x):
-        y = x.nominal
-        return x * (-numpy.sin(y))
+    def _derivative(self, y, yout):
+        return -numpy.sin(y)
+
+    def _second_derivative(self, y, yout):
+        return -yout
 
 
 class Tan(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.tan)
 
-    def _source(self, x):
-        y = x.nominal
-        return x * (1 + numpy.tan(y) ** 2)
+    def _derivative(self, y, yout):
+        return 1 + yout ** 2
+
+    def _second_derivative(self, y, yout):
+        return 2 * yout * (1 + yout ** 2)
 
 
 # numpy does not support the cotangens ``cot``.
@@ -881,214 +1601,329 @@ class Arcsin(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.arcsin)
 
-    def _source(self, x):
-        y = x.nominal
-        return x / numpy.sqrt(1 - y ** 2)
+    def _derivative(self, y, yout):
+        return 1.0 / numpy.sqrt(1 - y ** 2)
+
+    def _second_derivative(self, y, yout):
+        return y / (1 - y ** 2) ** 1.5
 
 
 class Arccos(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.arccos)
 
-    def _source(self, x):
-        y = x.nominal
-        return x / (-numpy.sqrt(1 - y ** 2))
+    def _derivative(self, y, yout):
+        return 1.0 / (-numpy.sqrt(1 - y ** 2))
+
+    def _second_derivative(self, y, yout):
+        return -y / (1 - y ** 2) ** 1.5
 
 
 class Arctan(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.arctan)
 
-    def _source(self, x):
-        y = x.nominal
-        return x / (1 + y ** 2)
+    def _derivative(self, y, yout):
+        return 1.0 / (1 + y ** 2)
+
+    def _second_derivative(self, y, yout):
+        return -2 * y / (1 + y ** 2) ** 2
 
 
 class Arctan2(Binary):
     def __init__(self):
         Binary.__init__(self, numpy.arctan2)
 
-    def _source1(self, x1, y2):
-        y1 = x1.nominal
-        return x1 * (-y2 / (y1 ** 2 + y2 ** 2))
+    # f = arctan2(y1, y2) = arctan(y1 / y2) + const
+    #
+    # d_y1 f = y2 / (y1^2 + y2^2)
+    # d_y2 f = -y1 / (y1^2 + y2^2)
+
+    def _derivative1(self, y1, y2, yout):
+        return y2 / (y1 ** 2 + y2 ** 2)
 
-    def _source2(self, y1, x2):
-        y2 = x2.nominal
-        return x2 * (y1 / (y1 ** 2 + y2 ** 2))
+    def _derivative2(self, y1, y2, yout):
+        return -y1 / (y1 ** 2 + y2 ** 2)
+
+    def _derivatives(self, y1, y2, yout):
+        reciprocal = 1.0 / (y1 ** 2 + y2 ** 2)
+        return (y2 * reciprocal, -y1 * reciprocal)
+
+    # The second derivatives of f = arctan2(y1, y2), with
+    # r^2 = y1^2 + y2^2, are:
+    #
+    # d_y1 d_y1 f = -2 y1 y2 / r^4
+    # d_y1 d_y2 f = (y1^2 - y2^2) / r^4
+    # d_y2 d_y2 f = 2 y1 y2 / r^4
+
+    def _second_derivative1(self, y1, y2, yout):
+        return -2 * y1 * y2 / (y1 ** 2 + y2 ** 2) ** 2
+
+    def _second_derivative2(self, y1, y2, yout):
+        return 2 * y1 * y2 / (y1 ** 2 + y2 ** 2) ** 2
+
+    def _mixed_derivative(self, y1, y2, yout):
+        return (y1 ** 2 - y2 ** 2) / (y1 ** 2 + y2 ** 2) ** 2
+
+    def _second_derivatives(self, y1, y2, yout):
+        reciprocal = 1.0 / (y1 ** 2 + y2 ** 2) ** 2
+        product = 2 * y1 * y2 * reciprocal
+        return (-product, (y1 ** 2 - y2 ** 2) * reciprocal, product)
 
 
 class Sinh(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.sinh)
 
-    def _source(self, x):
-        y = x.nominal
-        return x * numpy.cosh(y)
+    def _derivative(self, y, yout):
+        return numpy.cosh(y)
+
+    def _second_derivative(self, y, yout):
+        return yout
 
 
 class Cosh(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.cosh)
 
-    def _source(self, x):
-        y = x.nominal
-        return x * (-numpy.sinh(y))
+    def _derivative(self, y, yout):
+        return numpy.sinh(y)
+
+    def _second_derivative(self, y, yout):
+        return yout
 
 
 class Tanh(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.tanh)
 
-    def _source(self, x):
-        y = x.nominal
-        return x * (1 - numpy.tanh(y) ** 2)
+    def _derivative(self, y, yout):
+        return 1 - yout ** 2
+
+    def _second_derivative(self, y, yout):
+        return -2 * yout * (1 - yout ** 2)
 
 
 class Arcsinh(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.arcsinh)
 
-    def _source(self, x):
-        y = x.nominal
-        return x / numpy.sqrt(y ** 2 + 1)
+    def _derivative(self, y, yout):
+        return 1.0 / numpy.sqrt(y ** 2 + 1)
+
+    def _second_derivative(self, y, yout):
+        return -y / (y ** 2 + 1) ** 1.5
 
 
 class Arccosh(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.arccosh)
 
-    def _source(self, x):
-        y = x.nominal
-        return x / (-numpy.sqrt(y ** 2 - 1))
+    def _derivative(self, y, yout):
+        return 1.0 / numpy.sqrt(y ** 2 - 1)
+
+    def _second_derivative(self, y, yout):
+        return -y / (y ** 2 - 1) ** 1.5
 
 
 class Arctanh(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.arctanh)
 
-    def _source(self, x):
-        y = x.nominal
-        return x / (1 - y ** 2)
+    def _derivative(self, y, yout):
+        return 1.0 / (1 - y ** 2)
+
+    def _second_derivative(self, y, yout):
+        return 2 * y / (1 - y ** 2) ** 2
 
 
 class Exp(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.exp)
 
-    def _source(self, x):
+    def _derivative(self, y, yout):
         # f = exp(x)
-        # d_x f = exp(x)
-        y = x.nominal
-        return x * numpy.exp(y)
+        # d_x f = exp(x) = f
+        return yout
+
+    def _second_derivative(self, y, yout):
+        return yout
 
 
 class Exp2(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.exp2)
 
-    def _source(self, x):
+    def _derivative(self, y, yout):
         # f = 2^x
         # d_x f = d_x exp(log(2) x)
         #   = log 2 2^x
         #   = log 2 f
-        y = x.nominal
-        return x * (numpy.log(2) * numpy.exp2(y))
+        return numpy.log(2) * yout
+
+    def _second_derivative(self, y, yout):
+        return numpy.log(2) ** 2 * yout
 
 
 class Log(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.log)
 
-    def _source(self, x):
+    def _derivative(self, y, yout):
         # f = ln x
         # d_x f = 1 / x
-        y = x.nominal
-        return x / y
+        return 1.0 / y
+
+    def _second_derivative(self, y, yout):
+        # d_x d_x f = -1 / x^2
+        return -1.0 / y ** 2
 
 
 class Log2(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.log2)
 
-    def _source(self, x):
+    def _derivative(self, y, yout):
         # f = ln_2 x = ln x / ln 2
         # d_x f = 1 / (x * ln 2)
-        y = x.nominal
-        return x / (y * numpy.log(2))
+        return 1.0 / (y * numpy.log(2))
+
+    def _second_derivative(self, y, yout):
+        return -1.0 / (y ** 2 * numpy.log(2))
 
 
 class Log10(Unary):
     def __init__(self):
         Unary.__init__(self, numpy.log10)
 
-    def _source(self, x):
+    def _derivative(self, y, yout):
         # f = ln_10 x = ln x / ln 10
         # d_x f = 1 / (x * ln 10)
-        y = x.nominal
-        return x / (y * numpy.log(10))
+        return 1.0 / (y * numpy.log(10))
+
+    def _second_derivative(self, y, yout):
+        return -1.0 / (y ** 2 * numpy.log(10))
 
 
 class Add(Binary):
     def __init__(self):
         Binary.__init__(self, numpy.add)
 
-    def _source1(self, x1, y2):
+    def _sources(self, x1, x2, yout):
+        return (x1, x2)
+
+    def _source1(self, x1, y2, yout):
         return x1
 
-    def _source2(self, y1, x2):
+    def _source2(self, y1, x2, yout):
         return x2
 
+    def _derivative1(self, y1, y2, yout):
+        return 1
+
+    def _derivative2(self, y1, y2, yout):
+        return 1
+
+    def _second_derivative1(self, y1, y2, yout):
+        return 0
+
+    def _second_derivative2(self, y1, y2, yout):
+        return 0
+
+    def _mixed_derivative(self, y1, y2, yout):
+        return 0
+
 
 class Subtract(Binary):
     def __init__(self):
         Binary.__init__(self, numpy.subtract)
 
-    def _source1(self, x1, y2):
+    def _sources(self, x1, x2, yout):
+        return (x1, self._source2(x1.nominal, x2, yout))
+
+    def _source1(self, x1, y2, yout):
         return x1
 
-    def _source2(self, y1, x2):
-        return -x2
+    def _derivative1(self, y1, y2, yout):
+        return 1
+
+    def _derivative2(self, y1, y2, yout):
+        return -1
+
+    def _second_derivative1(self, y1, y2, yout):
+        return 0
+
+    def _second_derivative2(self, y1, y2, yout):
+        return 0
+
+    def _mixed_derivative(self, y1, y2, yout):
+        return 0
 
 
 class Multiply(Binary):
     def __init__(self):
         Binary.__init__(self, numpy.multiply)
 
-    def _source1(self, x1, y2):
-        return x1.scaled(y2)
-            # Writing ``x1 * y2`` would lead to infinite recursion.
+    def _derivative1(self, y1, y2, yout):
+        return y2
+
+    def _derivative2(self, y1, y2, yout):
+        return y1
 
-    def _source2(self, y1, x2):
-        return x2.scaled(y1)
+    def _second_derivative1(self, y1, y2, yout):
+        return 0
+
+    def _second_derivative2(self, y1, y2, yout):
+        return 0
+
+    def _mixed_derivative(self, y1, y2, yout):
+        return 1
 
 
 class Divide(Binary):
     def __init__(self):
         Binary.__init__(self, numpy.true_divide)
 
-    def _source1(self, x1, y2):
+    def _derivative1(self, y1, y2, yout):
         # f = y1 / y2
         #
         # d_y1 f = 1 / y2
         #
-        return x1 * (1.0/y2)
-            # Writing ``x1 / y2`` would result in an infinite
-            # recursion.
+        return 1.0 / y2
 
-    def _source2(self, y1, x2):
+    def _derivative2(self, y1, y2, yout):
         # f = y1 / y2 = y1 . y2 ^ (-1)
         #
         # d_y2 f = y1 . (-1) y2 ^ (-2)
+        #        = -f / y2
         #
-        y2 = x2.nominal
-        return x2 * numpy.true_divide(-y1, y2 ** 2)
+        return numpy.true_divide(-yout, y2)
+
+    def _derivatives(self, y1, y2, yout):
+        reciprocal = 1.0 / y2
+        return (reciprocal, -yout * reciprocal)
+
+    def _second_derivative1(self, y1, y2, yout):
+        return 0
+
+    def _second_derivative2(self, y1, y2, yout):
+        # d_y2 d_y2 f = 2 y1 . y2 ^ (-3) = 2 f / y2^2
+        return 2 * yout / y2 ** 2
+
+    def _mixed_derivative(self, y1, y2, yout):
+        # d_y1 d_y2 f = -1 / y2^2
+        return -1.0 / y2 ** 2
+
+    def _second_derivatives(self, y1, y2, yout):
+        reciprocal = 1.0 / y2 ** 2
+        return (0, -reciprocal, 2 * yout * reciprocal)
 
 
 class Power(Binary):
     def __init__(self):
         Binary.__init__(self, numpy.power)
 
-    def _source1(self, x1, y2):
+    def _derivative1(self, y1, y2, yout):
         # f = b ^ x
         #
         # Return: d_b (b ^ x) = d_y1 (y1 ^ y2)
@@ -1105,10 +1940,9 @@ class Power(Binary):
         #
         #    =      b ^ (x - 1) . x
 
-        y1 = x1.nominal
-        return x1 * (y2 * (y1 ** (y2 - 1)))
+        return y2 * (y1 ** (y2 - 1))
 
-    def _source2(self, y1, x2):
+    def _derivative2(self, y1, y2, yout):
         # f = b ^ x
         #
         # Return: d_x (b ^ x) = d_y2 (y1 ^ y2)
@@ -1123,8 +1957,20 @@ class Power(Binary):
         #
         #    =      b ^ x . (ln b)
 
-        y2 = x2.nominal
-        return x2 * ((y1 ** y2) * numpy.log(y1))
+        return yout * numpy.log(y1)
+
+    def _second_derivative1(self, y1, y2, yout):
+        # d_b d_b (b ^ x) = x (x - 1) b ^ (x - 2)
+        return y2 * (y2 - 1) * y1 ** (y2 - 2)
+
+    def _second_derivative2(self, y1, y2, yout):
+        # d_x d_x (b ^ x) = b ^ x . (ln b) ^ 2
+        return yout * numpy.log(y1) ** 2
+
+    def _mixed_derivative(self, y1, y2, yout):
+        # d_x d_b (b ^ x) = d_x (b ^ (x - 1) . x)
+        #                 = b ^ (x - 1) . (x ln b + 1)
+        return y1 ** (y2 - 1) * (y2 * numpy.log(y1) + 1)
 
 
 # The actual uufuncs ...
@@ -0,0 +1,143 @@
+# Developed since: Oct 2026
+
+""" Implements the covariance and correlation matrices between the
+elements of undarrays, :func:`ucovariance` and :func:`ucorrelation`.
+"""
+
+import numpy
+import upy2.core
+
+__all__ = ['ucovariance', 'ucorrelation']
+
+
+def ucovariance(a, b=None, blocksize=None, out=None):
+    """ Returns the covariances between all elements of *a* and all
+    elements of *b*, in an ndarray of shape ``a.shape + b.shape``.
+    Without *b*, the covariance matrix of *a* with itself is returned.
+
+    The Dependency names of each element are independent sources of
+    uncertainty, so the covariance of two elements is the sum of the
+    products of their derivatives with respect to the names they have
+    in common.  For a block of elements of *a* and a block of elements
+    of *b*, the names occurring in both blocks are gathered, the
+    derivatives are scattered into dense Jacobians ``Ja`` and ``Jb``
+    over these names, and the block of the result is given by the
+    matrix product ``Ja @ Jb.T``.
+
+    With *blocksize*, the elements of *a* and of *b* are processed in
+    blocks of at most that many elements, bounding the size of the
+    Jacobians.  Without, all elements are processed as a single block.
+    The result is written into *out*, if given, which needs to be a
+    C-contiguous ndarray of the result's shape; it might be a
+    ``numpy.memmap`` for results too large to fit into memory. """
+
+    a = upy2.core.asuarray(a)
+    if b is None:
+        b = a
+    else:
+        b = upy2.core.asuarray(b)
+
+    if not numpy.isrealobj(a.nominal) or not numpy.isrealobj(b.nominal):
+        raise ValueError(
+                'Refusing to calculate the covariance of non-real '
+                'undarrays')
+
+    (size_a, size_b) = (a.nominal.size, b.nominal.size)
+    shape = a.shape + b.shape
+    dtype = numpy.result_type(a.dtype, b.dtype, float)
+    if out is None:
+        out = numpy.empty(shape, dtype=dtype)
+    elif out.shape != shape:
+        raise ValueError(
+                'The output array has shape {0}, but the covariance has '
+                'shape {1}'.format(out.shape, shape))
+    elif not out.flags['C_CONTIGUOUS']:
+        raise ValueError('The output array needs to be C-contiguous')
+    flat = out.reshape((size_a, size_b))
+
+    (names_a, derivatives_a) = entries(a)
+    (names_b, derivatives_b) = entries(b)
+    blocksize_a = blocksize or max(size_a, 1)
+    blocksize_b = blocksize or max(size_b, 1)
+
+    for start_a in range(0, size_a, blocksize_a):
+        block_a = slice(start_a, start_a + blocksize_a)
+        for start_b in range(0, size_b, blocksize_b):
+            block_b = slice(start_b, start_b + blocksize_b)
+            flat[block_a, block_b] = block(
+                    names_a[block_a], derivatives_a[block_a],
+                    names_b[block_b], derivatives_b[block_b])
+
+    return out
+
+
+def ucorrelation(a, b=None, blocksize=None, out=None):
+    """ Returns the correlation coefficients between all elements of
+    *a* and all elements of *b*, i.e., the covariances as returned by
+    :func:`ucovariance` divided by the standard deviations of the
+    elements involved.  Correlations with elements without uncertainty
+    are ``nan``.  *blocksize* and *out* are used as in
+    :func:`ucovariance`. """
+
+    a = upy2.core.asuarray(a)
+    if b is None:
+        b = a
+    else:
+        b = upy2.core.asuarray(b)
+
+    out = ucovariance(a, b, blocksize=blocksize, out=out)
+    stddev_a = a.stddev.reshape(-1)
+    stddev_b = b.stddev.reshape(-1)
+    flat = out.reshape((len(stddev_a), len(stddev_b)))
+
+    blocksize = blocksize or max(len(stddev_a), 1)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, len(stddev_a), blocksize):
+            rows = slice(start, start + blocksize)
+            flat[rows] /= stddev_a[rows, numpy.newaxis] * stddev_b
+    return out
+
+
+def entries(ua):
+    """ Returns the names and the derivatives of the undarray *ua* as
+    arrays of shape ``(ua.size, nlayers)``. """
+
+    (stack, size) = (ua.stack, ua.nominal.size)
+    return (numpy.moveaxis(stack.names, 0, -1).reshape(
+                (size, len(stack))),
+            numpy.moveaxis(stack.derivatives, 0, -1).reshape(
+                (size, len(stack))))
+
+
+def block(names_a, derivatives_a, names_b, derivatives_b):
+    """ Returns the covariances between the elements described by the
+    ``(elements, nlayers)``-shaped *names_a* and *derivatives_a* and
+    those described by *names_b* and *derivatives_b*. """
+
+    # Only names occurring on both sides contribute:
+    common = numpy.intersect1d(names_a[names_a != 0],
+            names_b[names_b != 0])
+    if len(common) == 0:
+        return 0
+
+    return numpy.dot(jacobian(names_a, derivatives_a, common),
+            jacobian(names_b, derivatives_b, common).T)
+
+
+def jacobian(names, derivatives, columns):
+    """ Returns the dense Jacobian of the elements described by *names*
+    and *derivatives* with respect to the sorted names *columns*.
+    Entries with names not in *columns* are ignored; entries with
+    equal names in the same element are summed up. """
+
+    (elements, positions) = numpy.nonzero(names)
+    entry_names = names[elements, positions]
+    indices = numpy.searchsorted(columns, entry_names)
+    indices[indices == len(columns)] = 0
+    selected = (columns[indices] == entry_names)
+
+    flat = elements[selected] * len(columns) + indices[selected]
+    weights = derivatives[elements, positions][selected]
+    return numpy.bincount(flat, weights=weights,
+            minlength=len(names) * len(columns)).reshape(
+                (len(names), len(columns)))
@@ -1,8 +1,108 @@
 # Developed since: Feb 2010
 
+import weakref
 import numpy
+import upy2.threads
 
-__all__ = ['Dependency']
+__all__ = ['Dependency', 'DependencyStack']
+
+
+def format_shape(shape):
+    """ Formats *shape* the way numpy does in its error messages, e.g.,
+    ``(2,)`` or ``(2,2)``. """
+
+    if len(shape) == 1:
+        return '({0},)'.format(shape[0])
+    return '(' + ','.join(str(dim) for dim in shape) + ')'
+
+
+def promote(dtype, other):
+    """ Returns the dtype of the derivatives resulting from combining
+    derivatives of dtype *dtype* with values of dtype *other*.  The
+    kind is promoted as by numpy, but floating-point derivatives retain
+    their precision: Derivatives stored with reduced precision, see
+    :class:`upy2.Precision`, are not widened by arithmetics. """
+
+    dtype = numpy.dtype(dtype)
+    result = numpy.result_type(dtype, other)
+    if dtype.kind not in 'fc' or result.kind not in 'fc':
+        return result
+    if result.kind == 'c':
+        return numpy.result_type(dtype, numpy.complex64)
+    return dtype
+
+
+def check_names(names, dtype):
+    """ Raises ``ValueError`` if the ndarray of names *names* cannot be
+    stored with the integer dtype *dtype* without overflow. """
+
+    if numpy.can_cast(names.dtype, dtype) or names.size == 0:
+        return
+    if names.max() > numpy.iinfo(dtype).max:
+        raise ValueError(
+                'Cannot store Dependency names up to {0} with dtype '
+                '{1}'.format(names.max(), dtype))
+
+
+#
+# Pickling ...
+#
+
+exported_names = weakref.WeakValueDictionary()
+    # Names arrays being pickled, by a key sampling their contents.
+imported_names = weakref.WeakValueDictionary()
+    # Names arrays unpickled, by their ids.
+
+
+def exported(array):
+    """ Returns *array* as C-contiguous ndarray, such that numpy
+    pickles it as a single buffer, which is passed out-of-band with
+    pickle protocol 5. """
+
+    array = numpy.asarray(array)
+    if not array.flags.c_contiguous:
+        array = array.copy()
+    return array
+
+
+def export_names(names):
+    """ Returns the names array *names* for pickling, see
+    :func:`exported`.  When a names array of identical contents is
+    being pickled at the same time, this array is returned instead, so
+    that the pickler stores the array only once. """
+
+    names = exported(names)
+    if names.size == 0:
+        return names
+    key = (names.dtype.str, names.shape,
+            int(names.flat[0]), int(names.flat[names.size // 2]),
+            int(names.flat[-1]))
+    candidate = exported_names.get(key)
+    if candidate is not None and numpy.array_equal(candidate, names):
+        return candidate
+    exported_names[key] = names
+    return names
+
+
+def import_names(names):
+    """ Returns the names array *names* obtained by unpickling for use
+    by a single Dependency or stack.  Names arrays pickled once but
+    used several times are copied for all but the first use, since
+    names are modified in-place. """
+
+    if imported_names.get(id(names)) is names:
+        return names.copy()
+    imported_names[id(names)] = names
+    return names
+
+
+def unpickle_dependency(names, derivatives):
+    return Dependency(names=import_names(names), derivatives=derivatives)
+
+
+def unpickle_stack(shape, names, derivatives):
+    return DependencyStack(shape, names=import_names(names),
+            derivatives=derivatives)
 
 
 class Dependency(object):
@@ -305,6 +405,14 @@ class Dependency(object):
                 names=self.names.copy(),
                 derivatives=self.derivatives.copy())
 
+    def __reduce_ex__(self, protocol):
+        """ Pickles the names and the derivatives as single buffers
+        each, see :func:`exported`.  Identical names arrays pickled
+        together are stored once. """
+
+        return (unpickle_dependency,
+                (export_names(self.names), exported(self.derivatives)))
+
     def compress(self, *compress_args, **compress_kwargs):
         """ Returns a Dependency constructed from the *compressed*
         names and derivatives of *self*. """
@@ -376,3 +484,704 @@ class Dependency(object):
     def __repr__(self):
         return "<{shape}-shaped {dtype}-typed Dependency>".format(
                 shape=self.shape, dtype=self.dtype)
+
+
+class DependencyStack(object):
+    """ A :class:`DependencyStack` stores an arbitrary number of
+    Dependencies of equal shape and dtype in *two* contiguous ndarrays:
+    :attr:`names` and :attr:`derivatives`, both of shape ``(nlayers,)
+    + shape``.  Each index along the leading axis is called a *layer*;
+    a layer corresponds to a single :class:`Dependency`.
+
+    Storing the layers stacked permits to operate on all layers at
+    once by means of a single numpy call, instead of looping over
+    the layers in Python.  The stack reserves room for more layers
+    than it currently holds, such that appending layers does not
+    reallocate the buffers each time. """
+
+    def __init__(self, shape, dtype=None, names=None, derivatives=None,
+            names_dtype=None):
+        """ Creates an empty stack for Dependencies of shape *shape*
+        and dtype *dtype*.  The names will be stored with the integer
+        dtype *names_dtype*, ``int`` by default.
+
+        When both *names* and *derivatives* are given, they need to be
+        ndarrays of shape ``(nlayers,) + shape``; they will be used as
+        the buffers of the stack *without copying*.  Their dtypes will
+        be retained. """
+
+        self.shape = tuple(shape)
+        self.ndim = len(self.shape)
+
+        if names is not None and derivatives is not None:
+            names = numpy.asarray(names)
+            derivatives = numpy.asarray(derivatives)
+            if names.shape != derivatives.shape or \
+                    names.shape[1:] != self.shape:
+                raise ValueError(
+                        'Shape mismatch in initialising a '
+                        'DependencyStack: shape = {0}, names.shape = {1}, '
+                        'derivatives.shape = {2}'.format(
+                            self.shape, names.shape, derivatives.shape))
+            self._names = names
+            self._derivatives = derivatives
+            self.nlayers = len(names)
+        else:
+            if names_dtype is None:
+                names_dtype = int
+            (self._names, self._derivatives) = self._allocate(0,
+                    numpy.dtype(names_dtype), numpy.dtype(dtype))
+            self.nlayers = 0
+
+        self.dtype = self._derivatives.dtype
+        self.names_dtype = self._names.dtype
+
+    def _allocate(self, capacity, names_dtype, dtype):
+        """ Returns zero-filled buffers ``(names, derivatives)`` with
+        room for *capacity* layers.  This is the single place where
+        memory for the layers is obtained. """
+
+        shape = (capacity,) + self.shape
+        return (numpy.zeros(shape, dtype=names_dtype),
+                numpy.zeros(shape, dtype=dtype))
+
+    @property
+    def capacity(self):
+        """ The number of layers which fit into the current buffers. """
+
+        return len(self._names)
+
+    @property
+    def names(self):
+        """ The names of all layers, in shape ``(nlayers,) + shape``.
+        This is a *view* into the buffers of the stack. """
+
+        return self._names[:self.nlayers]
+
+    @property
+    def derivatives(self):
+        """ The derivatives of all layers, in shape ``(nlayers,) +
+        shape``.  This is a *view* into the buffers of the stack. """
+
+        return self._derivatives[:self.nlayers]
+
+    def reserve(self, nlayers):
+        """ Makes sure that at least *nlayers* layers fit into the
+        buffers.  When the buffers need to grow, their capacity will be
+        at least doubled. """
+
+        if nlayers <= self.capacity:
+            return
+
+        capacity = max(nlayers, 2 * self.capacity)
+        (names, derivatives) = self._allocate(
+                capacity, self._names.dtype, self._derivatives.dtype)
+        names[:self.nlayers] = self.names
+        derivatives[:self.nlayers] = self.derivatives
+        (self._names, self._derivatives) = (names, derivatives)
+
+    def truncate(self, nlayers):
+        """ Drops all layers from index *nlayers* on.  The buffers will
+        be kept for reuse. """
+
+        if nlayers < self.nlayers:
+            self._names[nlayers:self.nlayers] = 0
+            self._derivatives[nlayers:self.nlayers] = 0
+            self.nlayers = nlayers
+
+    def append(self, dependency):
+        """ Appends a copy of the :class:`Dependency` *dependency* as
+        a new layer.  The shape of *dependency* needs to be equal to
+        the shape of the stack. """
+
+        self.extend(
+                names=dependency.names[numpy.newaxis],
+                derivatives=dependency.derivatives[numpy.newaxis])
+
+    def extend(self, names, derivatives):
+        """ Appends copies of the layers given by *names* and
+        *derivatives*, both of shape ``(n,) + shape``. """
+
+        if names.shape[1:] != self.shape or \
+                derivatives.shape[1:] != self.shape:
+            raise ValueError(
+                    'Cannot extend a {0}-shaped DependencyStack by layers '
+                    'of shape {1}'.format(self.shape, derivatives.shape[1:]))
+
+        check_names(names, self.names_dtype)
+        n = len(derivatives)
+        self.reserve(self.nlayers + n)
+        self._names[self.nlayers:self.nlayers + n] = names
+        self._derivatives[self.nlayers:self.nlayers + n] = derivatives
+        self.nlayers += n
+
+    def layer(self, index):
+        """ Returns a :class:`Dependency` whose names and derivatives
+        are *views* into layer *index* of the stack.  The views remain
+        valid until the buffers are reallocated by :meth:`reserve`. """
+
+        return Dependency(
+                names=self.names[index],
+                derivatives=self.derivatives[index])
+
+    def layers(self):
+        """ Returns a list of Dependencies, one per layer, as given by
+        :meth:`layer`. """
+
+        return [self.layer(index) for index in range(self.nlayers)]
+
+    def __len__(self):
+        return self.nlayers
+
+    #
+    # Obtaining the variances ...
+    #
+
+    @property
+    def variance(self):
+        """ Returns the variance induced by all layers together, given
+        by the sum over the layers of the squared derivatives, where
+        elements with zero name are masked out.  For non-real
+        derivatives, no such variance can be given. """
+
+        return self.induced_variance()
+
+    def induced_variance(self, dtype=None):
+        """ Returns the variance as given by :attr:`variance`, with
+        the squares computed and summed up in *dtype*.  This permits to
+        obtain the variance of derivatives stored with reduced
+        precision in the precision of the nominal value, without
+        casting all layers up front. """
+
+        if not numpy.isrealobj(self._derivatives):
+            raise ValueError(
+                'Refusing to calculate the variance of a non-real '
+                'DependencyStack')
+        if dtype is None:
+            dtype = self.dtype
+        size = int(numpy.prod(self.shape, dtype=int))
+        names = self.names.reshape((self.nlayers, size))
+        derivatives = self.derivatives.reshape((self.nlayers, size))
+        variance = numpy.empty(size, dtype=dtype)
+
+        def accumulate(key):
+            masked = numpy.where(names[:, key] != 0, derivatives[:, key], 0)
+            numpy.einsum('ij,ij->j', masked, masked, dtype=dtype,
+                    out=variance[key])
+
+        upy2.threads.run(accumulate,
+                upy2.threads.split(size, self.nlayers))
+        return variance.reshape(self.shape)
+
+    #
+    # Complex numbers ...
+    #
+
+    @property
+    def real(self):
+        """ Returns the real part of this stack, with the names and the
+        real part of the derivatives copied. """
+
+        return DependencyStack(
+                shape=self.shape,
+                names=self.names.copy(),
+                derivatives=self.derivatives.real.copy())
+
+    @property
+    def imag(self):
+        """ Returns the imaginary part of this stack. """
+
+        return DependencyStack(
+                shape=self.shape,
+                names=self.names.copy(),
+                derivatives=self.derivatives.imag.copy())
+
+    def conj(self):
+        """ Returns the complex conjugate. """
+
+        return DependencyStack(
+                shape=self.shape,
+                names=self.names.copy(),
+                derivatives=self.derivatives.conj())
+
+    def astype(self, dtype, names_dtype=None, casting='safe'):
+        """ Returns a stack with the derivatives cast to *dtype* and
+        the names cast to *names_dtype*, or *self* if the dtypes match
+        already.  Only casts permitted by the *casting* rule, see
+        ``numpy.can_cast``, are carried out; names need to fit into
+        *names_dtype*. """
+
+        dtype = numpy.dtype(dtype)
+        if names_dtype is None:
+            names_dtype = self.names_dtype
+        names_dtype = numpy.dtype(names_dtype)
+        if dtype == self.dtype and names_dtype == self.names_dtype:
+            return self
+        if not numpy.can_cast(self.dtype, dtype, casting):
+            raise ValueError(
+                    'Cannot cast a DependencyStack of dtype {0} to dtype '
+                    '{1}'.format(self.dtype, dtype))
+        check_names(self.names, names_dtype)
+        return DependencyStack(
+                shape=self.shape,
+                names=self.names.astype(names_dtype),
+                derivatives=self.derivatives.astype(dtype))
+
+    #
+    # Arithmetics ...
+    #
+
+    def expand(self, array, ndim):
+        """ Inserts axes of length one after the layer axis of the
+        stacked *array*, such that its element part has *ndim*
+        dimensions.  This aligns the element axes of *array* with the
+        trailing axes of an ndarray of dimension *ndim*, as numpy's
+        broadcasting rules require. """
+
+        padding = ndim - (array.ndim - 1)
+        return array.reshape(
+                array.shape[:1] + (1,) * padding + array.shape[1:])
+
+    def __mul__(self, other):
+        """ Returns a new stack with all derivatives multiplied by
+        *other*.  The element shape of the result is the broadcast of
+        the element shape of *self* and the shape of *other*; the names
+        will be broadcast and copied accordingly.  Floating-point
+        derivatives retain their precision, see :func:`promote`. """
+
+        other = numpy.asarray(other)
+        ndim = max(self.ndim, other.ndim)
+        expanded_names = self.expand(self.names, ndim)
+        expanded_derivatives = self.expand(self.derivatives, ndim)
+
+        shape = numpy.broadcast_shapes(expanded_derivatives.shape,
+                other.shape)
+        names = numpy.empty(shape, dtype=self.names_dtype)
+        derivatives = numpy.empty(shape,
+                dtype=promote(self.dtype, other.dtype))
+
+        def multiply(key):
+            # The layers are independent of each other.
+            names[key] = expanded_names[key]
+            numpy.multiply(expanded_derivatives[key], other,
+                    out=derivatives[key], dtype=derivatives.dtype)
+
+        upy2.threads.run(multiply, upy2.threads.split(
+            self.nlayers, int(numpy.prod(shape[1:], dtype=int))))
+
+        return DependencyStack(
+                shape=derivatives.shape[1:],
+                names=names,
+                derivatives=derivatives)
+
+    #
+    # Joining stacks ...
+    #
+
+    def join(self, other, key=None):
+        """ Incorporates the layers of the DependencyStack *other* into
+        the elements of *self* indexed by *key*.  *other* needs to be
+        broadcastable to the shape of the indexed part of *self*.
+
+        Derivatives of entries with matching names in the same
+        element are added up, all other entries are kept.  In contrast
+        to incorporating *other* layer by layer by means of
+        :meth:`Dependency.add`, all entries are joined at once: The
+        ``(element, name, derivative)`` triples of both sides are
+        gathered and sorted by element and name, duplicates are summed
+        up, and the result is repacked into the minimal number of
+        layers needed.  Thus joining *D* layers into *T* layers of *N*
+        elements takes ``O((D + T) N log((D + T) N))`` time instead of
+        ``O(D T N)``.
+
+        Layers not needed anymore after repacking are dropped when
+        *key* is ``None``. """
+
+        if key is None:
+            key = ()
+        if not isinstance(key, tuple):
+            key = (key,)
+        whole = (len(key) == 0)
+        key = key + (slice(None),)
+
+        if len(other) == 0:
+            return
+
+        # The indexed part of *self*, with the layer axis last:
+        target_names = numpy.moveaxis(self.names, 0, -1)[key]
+        target_derivatives = numpy.moveaxis(self.derivatives, 0, -1)[key]
+        shape = target_names.shape[:-1]
+
+        if numpy.broadcast_shapes(shape, other.shape) != shape:
+            raise ValueError(
+                    "non-broadcastable output operand with shape {0} "
+                    "doesn't match the broadcast shape {1}".format(
+                        format_shape(shape),
+                        format_shape(numpy.broadcast_shapes(
+                            shape, other.shape))))
+
+        # The layers of *other*, broadcast to *shape*, with the layer
+        # axis last:
+        ndim = len(shape)
+        source_names = numpy.moveaxis(numpy.broadcast_to(
+                other.expand(other.names, ndim),
+                (len(other),) + shape), 0, -1)
+        source_derivatives = numpy.moveaxis(numpy.broadcast_to(
+                other.expand(other.derivatives, ndim),
+                (len(other),) + shape), 0, -1)
+
+        if self.nlayers == 0:
+            # Nothing to join with; only the empty layers of *other*
+            # are omitted.
+            used = source_names.reshape((-1, len(other))).any(axis=0)
+            check_names(other.names, self.names_dtype)
+            packed_names = source_names[..., used]
+            packed_derivatives = source_derivatives[..., used]
+        else:
+            (packed_names, packed_derivatives) = self.repack(
+                    names=numpy.concatenate(
+                        (target_names, source_names), axis=-1),
+                    derivatives=numpy.concatenate(
+                        (target_derivatives, source_derivatives),
+                        axis=-1))
+
+        nlayers = packed_names.shape[-1]
+        if nlayers > self.nlayers:
+            self.reserve(nlayers)
+            self.nlayers = nlayers
+        elif whole:
+            self.truncate(nlayers)
+
+        self_names = numpy.moveaxis(self.names, 0, -1)
+        self_derivatives = numpy.moveaxis(self.derivatives, 0, -1)
+        self_names[key] = 0
+        self_derivatives[key] = 0
+        # Address the first *nlayers* layers at the indexed elements:
+        key = key[:-1]
+        if not any(index is Ellipsis for index in key):
+            key = key + (Ellipsis,)
+        key = key + (slice(0, nlayers),)
+        self_names[key] = packed_names
+        self_derivatives[key] = packed_derivatives
+
+    def repack(self, names, derivatives):
+        """ Repacks the entries given by *names* and *derivatives*,
+        both ndarrays of shape ``shape + (n,)`` with the layer axis
+        *last*, into the minimal number of layers.  Derivatives of
+        entries with equal name in the same element are summed up;
+        entries with zero name are dropped.  Returned are the repacked
+        names and derivatives, again with the layer axis last.  The
+        dtypes of the names and of the derivatives will be the dtypes
+        of *self*.
+
+        Elements are repacked independently of each other; within a
+        :class:`upy2.Threads` Session, disjoint ranges of elements are
+        repacked concurrently. """
+
+        shape = names.shape[:-1]
+        size = int(numpy.prod(shape, dtype=int))
+        names = names.reshape((size, names.shape[-1]))
+        derivatives = derivatives.reshape((size, derivatives.shape[-1]))
+
+        keys = upy2.threads.split(size, names.shape[-1])
+        blocks = upy2.threads.run(
+                lambda key: self.pack(names[key], derivatives[key]), keys)
+        if len(blocks) == 1:
+            (packed_names, packed_derivatives) = blocks[0]
+        else:
+            nlayers = max(block_names.shape[-1]
+                    for (block_names, block_derivatives) in blocks)
+            packed_names = numpy.zeros(
+                    (size, nlayers), dtype=self.names_dtype)
+            packed_derivatives = numpy.zeros(
+                    (size, nlayers), dtype=self.dtype)
+            for (key, (block_names, block_derivatives)) in \
+                    zip(keys, blocks):
+                packed_names[key, :block_names.shape[-1]] = block_names
+                packed_derivatives[key, :block_names.shape[-1]] = \
+                        block_derivatives
+
+        nlayers = packed_names.shape[-1]
+        return (packed_names.reshape(shape + (nlayers,)),
+                packed_derivatives.reshape(shape + (nlayers,)))
+
+    def pack(self, names, derivatives):
+        """ Repacks the entries given by *names* and *derivatives* of
+        shape ``(elements, n)``, see :meth:`repack`.  Returned are the
+        repacked names and derivatives of shape ``(elements,
+        nlayers)``. """
+
+        # Gather the ``(element, name, derivative)`` triples, sorted by
+        # element and name ...
+
+        (elements, positions) = numpy.nonzero(names)
+        entry_names = names[elements, positions]
+        entry_derivatives = derivatives[elements, positions]
+        check_names(entry_names, self.names_dtype)
+
+        order = numpy.lexsort((entry_names, elements))
+        elements = elements[order]
+        entry_names = entry_names[order]
+        entry_derivatives = entry_derivatives[order]
+
+        # Sum up entries with equal element and name ...
+
+        if len(elements) > 0:
+            distinct = numpy.ones(len(elements), dtype=bool)
+            distinct[1:] = (elements[1:] != elements[:-1]) | \
+                    (entry_names[1:] != entry_names[:-1])
+            starts = numpy.flatnonzero(distinct)
+
+            entry_derivatives = numpy.add.reduceat(
+                    entry_derivatives, starts)
+            elements = elements[starts]
+            entry_names = entry_names[starts]
+
+        # Determine the rank of each entry within its element, which
+        # is the index of the layer the entry will be placed in ...
+
+        index = numpy.arange(len(elements))
+        first = numpy.ones(len(elements), dtype=bool)
+        first[1:] = (elements[1:] != elements[:-1])
+        rank = index - numpy.maximum.accumulate(
+                numpy.where(first, index, 0))
+        nlayers = rank.max() + 1 if len(rank) > 0 else 0
+
+        packed_names = numpy.zeros(
+                (len(names), nlayers), dtype=self.names_dtype)
+        packed_derivatives = numpy.zeros(
+                (len(names), nlayers), dtype=self.dtype)
+        packed_names[elements, rank] = entry_names
+        packed_derivatives[elements, rank] = entry_derivatives
+
+        return (packed_names, packed_derivatives)
+
+    #
+    # Compaction ...
+    #
+
+    @property
+    def fill(self):
+        """ The fill factor of the stack: the fraction of entries with
+        nonzero name among all entries of all layers.  An empty stack
+        has a fill factor of one. """
+
+        if self.names.size == 0:
+            return 1.0
+        return numpy.count_nonzero(self.names) / float(self.names.size)
+
+    def compact(self):
+        """ Repacks the nonzero entries of each element densely into
+        as few layers as the maximum number of entries per element.
+        The buffers will be reallocated to fit the layers exactly. """
+
+        (names, derivatives) = self.repack(
+                names=numpy.moveaxis(self.names, 0, -1),
+                derivatives=numpy.moveaxis(self.derivatives, 0, -1))
+
+        nlayers = names.shape[-1]
+        (self._names, self._derivatives) = self._allocate(
+                nlayers, self._names.dtype, self._derivatives.dtype)
+        self._names[...] = numpy.moveaxis(names, -1, 0)
+        self._derivatives[...] = numpy.moveaxis(derivatives, -1, 0)
+        self.nlayers = nlayers
+
+    #
+    # Reductions ...
+    #
+
+    def sum(self, axes, keepdims=False):
+        """ Returns a new stack holding the Dependencies of the sum of
+        the elements of *self* along the axes *axes*, a tuple of
+        nonnegative axis indices.  The reduced axes are moved into the
+        layer axis, such that all entries contributing to an element
+        of the result are merged by a single :meth:`repack`.  With
+        *keepdims*, the reduced axes are retained with length one. """
+
+        kept = [axis for axis in range(self.ndim) if axis not in axes]
+        order = kept + list(axes) + [self.ndim]
+        shape = tuple(self.shape[axis] for axis in kept)
+        size = int(numpy.prod(
+                [self.shape[axis] for axis in axes], dtype=int)) * \
+                        self.nlayers
+
+        (names, derivatives) = self.repack(
+                names=numpy.moveaxis(self.names, 0, -1).transpose(
+                    order).reshape(shape + (size,)),
+                derivatives=numpy.moveaxis(self.derivatives, 0, -1)\
+                    .transpose(order).reshape(shape + (size,)))
+
+        if keepdims:
+            shape = tuple(1 if axis in axes else length
+                    for (axis, length) in enumerate(self.shape))
+        layers = (names.shape[-1],) + shape
+        return DependencyStack(
+                shape=shape,
+                names=numpy.ascontiguousarray(numpy.moveaxis(
+                    names, -1, 0).reshape(layers)),
+                derivatives=numpy.ascontiguousarray(numpy.moveaxis(
+                    derivatives, -1, 0).reshape(layers)))
+
+    def accumulate(self, axis):
+        """ Returns a new stack holding the Dependencies of the
+        cumulative sum of the elements of *self* along the nonnegative
+        axis index *axis*.  Element *k* along *axis* of the result
+        gathers the entries of the elements *0* to *k*, which are
+        merged by a single :meth:`repack`.  Note that this takes
+        memory quadratic in the length of *axis*. """
+
+        n = self.shape[axis]
+        # *mask[k, j]* tells whether element *j* contributes to the
+        # result element *k*:
+        mask = numpy.tri(n, dtype=bool)[:, :, numpy.newaxis]
+
+        # Move *axis* next to the layer axis, which is moved last:
+        names = numpy.moveaxis(numpy.moveaxis(self.names, 0, -1), axis, -2)
+        derivatives = numpy.moveaxis(
+                numpy.moveaxis(self.derivatives, 0, -1), axis, -2)
+        shape = names.shape[:-2]
+        layers = shape + (n, n * self.nlayers)
+
+        (names, derivatives) = self.repack(
+                names=(names[..., numpy.newaxis, :, :] * mask)\
+                    .reshape(layers),
+                derivatives=(derivatives[..., numpy.newaxis, :, :] * mask)\
+                    .reshape(layers))
+
+        return DependencyStack(
+                shape=self.shape,
+                names=numpy.ascontiguousarray(numpy.moveaxis(
+                    numpy.moveaxis(names, -2, axis), -1, 0)),
+                derivatives=numpy.ascontiguousarray(numpy.moveaxis(
+                    numpy.moveaxis(derivatives, -2, axis), -1, 0)))
+
+    #
+    # Shape manipulation ...
+    #
+
+    def layerwise(self, operation):
+        """ Returns a new stack constructed from copies of the names
+        and derivatives of *self* passed through *operation*.
+        *operation* is applied to the stacked arrays, with the layer
+        axis leading, and needs to retain the layer axis. """
+
+        names = numpy.array(operation(self.names), order='C')
+        derivatives = numpy.array(operation(self.derivatives), order='C')
+        return DependencyStack(
+                shape=derivatives.shape[1:],
+                names=names,
+                derivatives=derivatives)
+
+    def compress(self, condition, axis=None):
+        """ Returns a new stack with all layers compressed, see
+        ``numpy.compress``. """
+
+        if axis is None:
+            size = int(numpy.prod(self.shape, dtype=int))
+            return self.layerwise(lambda array: array.reshape(
+                (self.nlayers, size)).compress(condition, axis=1))
+        return self.layerwise(lambda array: array.compress(
+            condition, axis=(axis % self.ndim + 1)))
+
+    def flatten(self, order='C'):
+        """ Returns a new stack with all layers flattened in the
+        *order* ``'C'`` or ``'F'``. """
+
+        return self.reshape((int(numpy.prod(self.shape, dtype=int)),),
+                order=order)
+
+    def repeat(self, repeats, axis=None):
+        """ Returns a new stack with the elements of all layers
+        repeated, see ``numpy.repeat``. """
+
+        if axis is None:
+            size = int(numpy.prod(self.shape, dtype=int))
+            return self.layerwise(lambda array: array.reshape(
+                (self.nlayers, size)).repeat(repeats, axis=1))
+        return self.layerwise(lambda array: array.repeat(
+            repeats, axis=(axis % self.ndim + 1)))
+
+    def reshape(self, shape, order='C'):
+        """ Returns a new stack with all layers reshaped to the element
+        shape *shape* in the *order* ``'C'`` or ``'F'``.  Both orders
+        treat the leading layer axis consistently. """
+
+        return self.layerwise(lambda array: array.reshape(
+            (self.nlayers,) + tuple(shape), order=order))
+
+    def transpose(self, axes=None):
+        """ Returns a new stack with the element axes of all layers
+        permuted by *axes*, see ``numpy.transpose``.  By default, the
+        element axes are reversed. """
+
+        if axes is None:
+            axes = range(self.ndim - 1, -1, -1)
+        return self.layerwise(lambda array: array.transpose(
+            (0,) + tuple(axis % self.ndim + 1 for axis in axes)))
+
+    #
+    # Keying methods ...
+    #
+
+    def elementwise(self, array, key):
+        """ Applies the element key *key* to all layers of the stacked
+        *array* and returns the result with the layer axis leading.
+
+        The key is applied to a view of *array* with the layer axis
+        moved to the *end*, such that the placement of axes resulting
+        from advanced indexing is identical to the placement when
+        applying *key* to an ndarray of the element shape. """
+
+        if not isinstance(key, tuple):
+            key = (key,)
+        return numpy.moveaxis(
+                numpy.moveaxis(array, 0, -1)[key + (slice(None),)],
+                -1, 0)
+
+    def __getitem__(self, key):
+        """ Returns a new stack with the element key *key* applied to
+        all layers.  The results will be copied. """
+
+        derivatives = self.elementwise(self.derivatives, key).copy()
+        return DependencyStack(
+                shape=derivatives.shape[1:],
+                names=self.elementwise(self.names, key).copy(),
+                derivatives=derivatives)
+
+    def clear(self, key):
+        """ Sets the names and derivatives of all layers to zero at the
+        element positions indexed by *key*. """
+
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),)
+        numpy.moveaxis(self.names, 0, -1)[key] = 0
+        numpy.moveaxis(self.derivatives, 0, -1)[key] = 0
+
+    def copy(self):
+        """ Returns a stack constructed from copies of the layers of
+        *self*.  No room for further layers will be reserved. """
+
+        return DependencyStack(
+                shape=self.shape,
+                names=self.names.copy(),
+                derivatives=self.derivatives.copy())
+
+    def __reduce_ex__(self, protocol):
+        """ Pickles the layers in use, without the room reserved for
+        further layers.  All layers of names and of derivatives go out
+        as a single buffer each, see :func:`exported`.  Identical names
+        arrays pickled together are stored once.  The stack unpickled
+        is held in memory. """
+
+        return (unpickle_stack, (self.shape,
+                export_names(self.names), exported(self.derivatives)))
+
+    #
+    # String conversion ...
+    #
+
+    def __repr__(self):
+        return "<{shape}-shaped {dtype}-typed DependencyStack " \
+                "of {nlayers} layers>".format(
+                shape=self.shape, dtype=self.dtype, nlayers=self.nlayers)
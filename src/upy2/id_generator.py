@@ -1,37 +1,133 @@
 # Developed since: Feb 2010
 
-""" Implements a thread-safe generator for unique IDs. """
+""" Implements a thread-safe generator for unique IDs, and a generator
+for IDs unique across processes. """
 
+import os
 import threading
+import multiprocessing
 import numpy
+import upy2
 
-__all__ = ['IDGenerator']
+__all__ = ['IDGenerator', 'SharedIDGenerator', 'install']
 
 
 class IDGenerator:
-    """ Generates unique IDs in a threadsafe manner. """
-    
-    def __init__(self):
+    """ Generates unique IDs in a threadsafe manner.
+
+    Each thread draws its IDs from a *block* of consecutive IDs
+    reserved for this thread only.  Blocks are reserved from the
+    global counter under a lock, but IDs are handed out from the block
+    without locking.  Thus, IDs are unique across all threads, but IDs
+    generated later are not necessarily larger than IDs generated
+    earlier by other threads.  IDs left in the block of a thread when
+    a new block is reserved are never used. """
+
+    def __init__(self, blocksize=1024):
+        """ *blocksize* is the number of IDs reserved per thread at
+        once.  Requests for more IDs than *blocksize* are served from
+        the global counter directly. """
+
         self._lock = threading.Lock()
         self._current_id = 1
+        self._local = threading.local()
+        self.blocksize = blocksize
+
+    def reserve(self, N):
+        """ Reserves *N* consecutive IDs from the global counter and
+        returns the first of them. """
+
+        # Make sure that never two same IDs are returned by acquiring
+        # ``self.lock`` until the transaction is complete:
+        with self._lock:
+            start = self._current_id
+            self._current_id += N
+        return start
 
     def generate_idarray(self, shape):
         """ Returns unique IDs in shape *shape*. """
-        
+
         # For an empty iterable *shape* like [] and (), ``numpy.prod``
         # returns 1.0 with dtype float by default; thus we need to
         # override the result dtype.  This does not affect the
         # standard case of non-empty iterables as *shape* like [1, 2]
         # or (42, 100).
-        N = numpy.prod(shape, dtype=int)
+        N = int(numpy.prod(shape, dtype=int))
 
-        # Make sure that never two same IDs are returned by acquiring
-        # ``self.lock`` until the transaction is complete:
-        with self._lock:
-            idarray = numpy.arange(
-                self._current_id,
-                self._current_id + N
-            ).reshape(shape)
-            self._current_id += N
+        if N > self.blocksize:
+            start = self.reserve(N)
+        else:
+            # The block of the calling thread is ``[next, stop)``; it is
+            # accessed by the calling thread only:
+            local = self._local
+            if getattr(local, 'stop', 0) - getattr(local, 'next', 0) < N:
+                local.next = self.reserve(self.blocksize)
+                local.stop = local.next + self.blocksize
+            start = local.next
+            local.next += N
+
+        return numpy.arange(start, start + N).reshape(shape)
+
+
+class SharedIDGenerator(IDGenerator):
+    """ Generates IDs unique across all processes sharing the same
+    *counter*, a ``multiprocessing.Value`` of typecode ``'q'`` residing
+    in shared memory.  Blocks of IDs are reserved from the shared
+    counter under its lock; within a process, IDs are handed out as by
+    :class:`IDGenerator`.
+
+    Undarrays created in different processes with generators sharing
+    the counter can be combined without their names colliding.  Use
+    :func:`install` to plug such a generator into
+    ``upy2.guid_generator``. """
+
+    def __init__(self, blocksize=1024, counter=None):
+        """ Without *counter*, a new shared counter starting at one is
+        created. """
+
+        IDGenerator.__init__(self, blocksize)
+        if counter is None:
+            counter = multiprocessing.Value('q', 1)
+        self.counter = counter
+        self._pid = os.getpid()
+
+    def reserve(self, N):
+        with self.counter.get_lock():
+            start = self.counter.value
+            self.counter.value += N
+        return start
+
+    def generate_idarray(self, shape):
+        if os.getpid() != self._pid:
+            # This is a forked child process.  The blocks inherited
+            # from the parent are in use by the parent:
+            self._pid = os.getpid()
+            self._local = threading.local()
+        return IDGenerator.generate_idarray(self, shape)
+
+
+def install(counter=None, blocksize=1024, context=None):
+    """ Replaces ``upy2.guid_generator`` by a :class:`SharedIDGenerator`
+    using *counter*, and returns it.  Without *counter*, a new counter
+    is created, starting after all IDs generated so far by the current
+    generator.  It is created in the multiprocessing *context*, if
+    given, which needs to be the context the workers are started in.
+
+    In the parent process, call :func:`install` before creating the
+    workers, and pass :func:`install` with the counter of the generator
+    returned as the initializer of the workers::
+
+        generator = upy2.id_generator.install()
+        with ProcessPoolExecutor(
+                initializer=upy2.id_generator.install,
+                initargs=(generator.counter,)) as executor:
+            ...
+
+    Then the undarrays returned by the workers can be merged safely
+    with each other and with undarrays created in the parent. """
 
-        return idarray
+    if counter is None:
+        counter = (context or multiprocessing).Value('q',
+                upy2.guid_generator.reserve(0))
+    upy2.guid_generator = SharedIDGenerator(blocksize, counter)
+    return upy2.guid_generator
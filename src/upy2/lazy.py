@@ -0,0 +1,260 @@
+# Developed since: Oct 2026
+
+""" Implements deferred evaluation of uufuncs.  Within a :class:`Lazy`
+Session manager, uufuncs do not compute their results immediately;
+instead they return :class:`lazyundarray` instances, which are the
+nodes of an expression graph.  The graph is evaluated as soon as the
+data of a node is requested. """
+
+import numpy
+import upy2.core
+import upy2.dependency
+
+__all__ = ['Lazy', 'lazyundarray']
+
+
+class Lazy(upy2.core.Engine):
+    """ An :class:`Engine` deferring the evaluation of uufuncs.  Use
+    it as a context manager::
+
+        with Lazy():
+            ua = (a * x + b) / ulog(c)
+
+    Here, ``ua`` is a :class:`lazyundarray`.  Upon evaluation, chains
+    of elementwise operations are *fused*: Each Dependency of the
+    undarrays the expression is built from is scaled *once* by the
+    product of the chain-rule factors along the expression, and the
+    scaled Dependencies are joined in a single pass.  Intermediate
+    undarrays with their own Dependencies are never created. """
+
+    def unary(self, uufunc, x):
+        if not isinstance(x, upy2.core.undarray):
+            return uufunc.evaluate(x)
+        return lazyundarray(uufunc, (x,))
+
+    def binary(self, uufunc, x1, x2):
+        if not isinstance(x1, upy2.core.undarray) and \
+                not isinstance(x2, upy2.core.undarray):
+            return uufunc.evaluate(x1, x2)
+        return lazyundarray(uufunc, (x1, x2))
+
+
+class lazyundarray(upy2.core.undarray):
+    """ A node of an expression graph of uufuncs.  A ``lazyundarray``
+    behaves like an :class:`undarray`; it is evaluated as soon as its
+    :attr:`nominal` value, its Dependencies, or its shape and dtype are
+    accessed.  This happens, e.g., when requesting :attr:`stddev` or
+    :attr:`variance`, when indexing and when typesetting.
+
+    The operands are referenced, not copied; modifying an operand
+    before evaluation alters the result.  Evaluation happens only
+    once; the result is retained and the operands are released. """
+
+    def __init__(self, uufunc, operands):
+        """ *uufunc* is the :class:`Unary` or :class:`Binary` uufunc
+        applied to the sequence *operands*. """
+
+        self.uufunc = uufunc
+        self.operands = tuple(operands)
+        self.result = None
+
+    #
+    # Evaluation ...
+    #
+
+    def evaluate(self):
+        """ Evaluates the expression graph rooted at *self* and returns
+        the resulting :class:`undarray`. """
+
+        if self.result is not None:
+            return self.result
+
+        nodes = self.graph()
+
+        # Count the consumers of each node, such that the data of the
+        # node can be dropped as soon as it is used up:
+        consumers = {}
+        for node in nodes:
+            for operand in node.operands:
+                if isinstance(operand, lazyundarray):
+                    consumers[id(operand)] = \
+                            consumers.get(id(operand), 0) + 1
+
+        # For each node, its nominal value and its *terms* are held.
+        # The terms are a dictionary ``{id(leaf): (leaf, factor)}``
+        # expressing the uncertainty of the node as a linear
+        # combination of the uncertainties of the *leaves*, which are
+        # evaluated undarrays.
+        data = {}
+
+        for node in nodes:
+            operands = []
+            for operand in node.operands:
+                if isinstance(operand, lazyundarray) and \
+                        operand.result is None:
+                    operands.append(data[id(operand)])
+                    consumers[id(operand)] -= 1
+                    if consumers[id(operand)] == 0:
+                        del data[id(operand)]
+                elif isinstance(operand, upy2.core.undarray):
+                    leaf = operand
+                    if isinstance(leaf, lazyundarray):
+                        leaf = leaf.result
+                    operands.append(
+                            (leaf.nominal, {id(leaf): (leaf, 1)}))
+                else:
+                    operands.append((numpy.asarray(operand), None))
+
+            data[id(node)] = fuse(node.uufunc, operands)
+
+        (nominal, terms) = data[id(self)]
+        self.result = materialize(nominal, terms)
+        # The graph is not needed anymore; releasing it frees the
+        # operands not referenced otherwise:
+        self.operands = ()
+        return self.result
+
+    def graph(self):
+        """ Returns the unevaluated nodes of the graph rooted at *self*
+        in an order where all operands precede their consumers. """
+
+        nodes = []
+        visited = set()
+        pending = [(self, False)]
+        while pending:
+            (node, expanded) = pending.pop()
+            if expanded:
+                nodes.append(node)
+                continue
+            if id(node) in visited:
+                continue
+            visited.add(id(node))
+            pending.append((node, True))
+            for operand in node.operands:
+                if isinstance(operand, lazyundarray) and \
+                        operand.result is None:
+                    pending.append((operand, False))
+        return nodes
+
+    #
+    # Data of the evaluated undarray ...
+    #
+
+    @property
+    def nominal(self):
+        return self.evaluate().nominal
+
+    @property
+    def shape(self):
+        return self.evaluate().shape
+
+    @property
+    def dtype(self):
+        return self.evaluate().dtype
+
+    @property
+    def ndim(self):
+        return self.evaluate().ndim
+
+    @property
+    def stack(self):
+        return self.evaluate().stack
+
+    @stack.setter
+    def stack(self, stack):
+        self.evaluate().stack = stack
+
+
+def fuse(uufunc, operands, out=None):
+    """ Applies *uufunc* to *operands*, a sequence of ``(nominal,
+    terms)`` tuples, where *terms* is ``None`` for operands without
+    uncertainty.  Returns the ``(nominal, terms)`` of the result.  The
+    nominal value of the result is written to *out*, if given. """
+
+    nominals = [nominal for (nominal, terms) in operands]
+    if out is None:
+        nominal = uufunc.ufunc(*nominals)
+    else:
+        nominal = uufunc.ufunc(*nominals, out=out)
+
+    try:
+        factors = derivatives(uufunc, operands, nominal)
+    except NotImplementedError:
+        # The uufunc cannot be expressed by elementwise derivatives.
+        # Evaluate it immediately on materialised operands:
+        result = uufunc.evaluate(*[
+                nominal if terms is None else materialize(nominal, terms)
+                for (nominal, terms) in operands])
+        return (result.nominal, {id(result): (result, 1)})
+
+    fused = {}
+    for ((operand_nominal, terms), factor) in zip(operands, factors):
+        if terms is None:
+            continue
+        for (key, (leaf, coefficient)) in terms.items():
+            coefficient = coefficient * factor
+            if key in fused:
+                coefficient = fused[key][1] + coefficient
+            fused[key] = (leaf, coefficient)
+
+    return (nominal, fused)
+
+
+def derivatives(uufunc, operands, yout):
+    """ Returns the elementwise derivatives of *uufunc* with respect to
+    those of the ``(nominal, terms)`` tuples *operands* which carry
+    uncertainty, and ``None`` for the others.  *yout* is the nominal
+    value of the result. """
+
+    if len(operands) == 1:
+        ((y, terms),) = operands
+        return [uufunc._derivative(y, yout)]
+
+    ((y1, terms1), (y2, terms2)) = operands
+    if terms1 is not None and terms2 is not None:
+        return list(uufunc._derivatives(y1, y2, yout))
+    return [
+        None if terms1 is None else uufunc._derivative1(y1, y2, yout),
+        None if terms2 is None else uufunc._derivative2(y1, y2, yout),
+    ]
+
+
+def materialize(nominal, terms):
+    """ Returns an :class:`undarray` with nominal value *nominal* and
+    with the Dependencies described by *terms*, a dictionary
+    ``{id(leaf): (leaf, factor)}``.  The Dependencies of each leaf are
+    scaled by its factor once and the results are joined at once. """
+
+    result = upy2.core.undarray(nominal=nominal)
+
+    names = []
+    derivatives = []
+    for (leaf, factor) in terms.values():
+        if len(leaf.stack) == 0:
+            continue
+        if not numpy.can_cast(leaf.dtype, result.dtype):
+            raise ValueError(
+                    ('Cannot incorporate the dependencies of an '
+                     '{0}-dtype undarray into an {1}-dtype undarray')\
+                             .format(leaf.dtype, result.dtype))
+        scaled = leaf.stack * factor
+        layers = (len(scaled),) + result.shape
+        ndim = result.ndim
+        names.append(numpy.broadcast_to(
+                scaled.expand(scaled.names, ndim), layers))
+        derivatives.append(numpy.broadcast_to(
+                scaled.expand(scaled.derivatives, ndim), layers))
+
+    if len(names) == 0:
+        return result
+
+    (names, derivatives) = result.stack.repack(
+            names=numpy.moveaxis(numpy.concatenate(names), 0, -1),
+            derivatives=numpy.moveaxis(
+                numpy.concatenate(derivatives), 0, -1))
+    result.adopt(upy2.dependency.DependencyStack(
+            shape=result.shape,
+            names=numpy.ascontiguousarray(numpy.moveaxis(names, -1, 0)),
+            derivatives=numpy.ascontiguousarray(
+                numpy.moveaxis(derivatives, -1, 0))))
+    return result
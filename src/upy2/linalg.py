@@ -0,0 +1,252 @@
+# Developed since: Oct 2026
+
+""" Implements contractions of undarrays: :func:`ueinsum`, and based on
+it, :func:`udot` and :func:`umatmul`, which is also available as the
+``@`` operator. """
+
+import string
+import numpy
+import upy2.core
+import upy2.dependency
+
+__all__ = ['ueinsum', 'udot', 'umatmul']
+
+
+def ueinsum(subscripts, *operands):
+    """ Evaluates the Einstein summation convention on the operands,
+    see ``numpy.einsum``.  Any of the *operands* might be undarrays.
+
+    The result is linear in each operand.  The Dependencies arising
+    from an undarray operand are obtained by carrying out the
+    contraction on its derivatives, with the nominal values of the
+    other operands in place.  Where the names of a Dependency layer
+    are *uniform* along the summed indices of the operand, the layer
+    is contracted as a whole by ``numpy.einsum`` (with BLAS-backed
+    optimisation).  Other layers are *expanded*: each summed element
+    contributes its own layer of entries.  All layers are merged into
+    the Dependencies of the result by a single
+    :meth:`DependencyStack.repack`. """
+
+    operands = list(operands)
+    nominals = [operand.nominal
+            if isinstance(operand, upy2.core.undarray)
+            else numpy.asarray(operand) for operand in operands]
+    (inputs, output, layouts) = parse(subscripts, nominals)
+    nominals = [numpy.broadcast_to(nominal.reshape(expanded), shape)
+            for (nominal, (expanded, shape)) in zip(nominals, layouts)]
+
+    nominal = numpy.einsum(
+            ','.join(inputs) + '->' + output, *nominals, optimize=True)
+    result = upy2.core.undarray(nominal=nominal)
+
+    sizes = {}
+    for (labels, array) in zip(inputs, nominals):
+        sizes.update(zip(labels, array.shape))
+    used = set(''.join(inputs))
+    layer = [letter for letter in string.ascii_letters
+            if letter not in used][0]
+
+    names = []
+    derivatives = []
+    for (index, operand) in enumerate(operands):
+        if not isinstance(operand, upy2.core.undarray) or \
+                len(operand.stack) == 0:
+            continue
+        if not numpy.can_cast(operand.dtype, result.dtype):
+            raise ValueError(
+                    ('Cannot incorporate the dependencies of an '
+                     '{0}-dtype undarray into an {1}-dtype undarray')\
+                             .format(operand.dtype, result.dtype))
+
+        labels = inputs[index]
+        stack = operand.stack
+        operand_names = stack.names
+        operand_derivatives = stack.derivatives
+        (expanded, shape) = layouts[index]
+        if operand.shape != shape:
+            # The operand is broadcast over the ellipsis dimensions:
+            (expanded, shape) = ((len(stack),) + expanded,
+                    (len(stack),) + shape)
+            operand_names = numpy.broadcast_to(
+                    operand_names.reshape(expanded), shape)
+            operand_derivatives = numpy.broadcast_to(
+                    operand_derivatives.reshape(expanded), shape)
+
+        # The output labels present in the operand, and the labels
+        # summed over:
+        present = ''.join(label for label in output if label in labels)
+        summed = ''.join(sorted(set(labels) - set(output),
+            key=labels.index))
+        summed_shape = tuple(sizes[label] for label in summed)
+        summed_size = int(numpy.prod(summed_shape, dtype=int))
+
+        # The names per layer, with the summed labels last:
+        operand_names = numpy.einsum(
+                layer + labels + '->' + layer + present + summed,
+                operand_names)
+        flat = operand_names.reshape(
+                operand_names.shape[:1 + len(present)] + (summed_size,))
+        uniform = (flat == flat[..., :1]).reshape(
+                (len(flat), -1)).all(axis=1)
+
+        def spread(array, shape):
+            # Inserts the output axes missing in the operand.
+            return numpy.broadcast_to(array.reshape(
+                array.shape[:1] +
+                tuple(sizes[label] if label in labels else 1
+                    for label in output) +
+                array.shape[1 + len(present):]),
+                array.shape[:1] + shape)
+
+        factors = nominals[:index] + nominals[index + 1:]
+        others = inputs[:index] + inputs[index + 1:]
+        if uniform.any():
+            contracted = numpy.einsum(
+                    ','.join([layer + labels] + others) +
+                    '->' + layer + output,
+                    operand_derivatives[uniform], *factors,
+                    optimize=True)
+            names.append(spread(
+                flat[uniform][..., 0], result.shape))
+            derivatives.append(contracted)
+
+        if not uniform.all():
+            expanded = numpy.einsum(
+                    ','.join([layer + labels] + others) +
+                    '->' + layer + output + summed,
+                    operand_derivatives[~uniform], *factors,
+                    optimize=True)
+            shape = result.shape + summed_shape
+            for (array, target) in [
+                    (spread(operand_names[~uniform], shape), names),
+                    (expanded, derivatives)]:
+                # Each summed element yields its own layer:
+                array = array.reshape(
+                        array.shape[:1] + result.shape + (summed_size,))
+                target.append(numpy.moveaxis(array, -1, 1).reshape(
+                    (-1,) + result.shape))
+
+    if len(names) == 0:
+        return result
+
+    (names, derivatives) = result.stack.repack(
+            names=numpy.moveaxis(numpy.concatenate(names), 0, -1),
+            derivatives=numpy.moveaxis(
+                numpy.concatenate(derivatives), 0, -1))
+    result.adopt(upy2.dependency.DependencyStack(
+            shape=result.shape,
+            names=numpy.ascontiguousarray(numpy.moveaxis(names, -1, 0)),
+            derivatives=numpy.ascontiguousarray(
+                numpy.moveaxis(derivatives, -1, 0))))
+    return result
+
+
+def parse(subscripts, nominals):
+    """ Parses the einsum *subscripts* for operands with nominal values
+    *nominals*.  Returned are the input subscripts, the output
+    subscripts, and the *layouts* of the operands.  Ellipses are
+    replaced by explicit labels, such that each operand covers all of
+    the ellipsis dimensions.  To achieve this, the operands need to be
+    broadcast; the layout of an operand is a tuple ``(expanded,
+    shape)``, where *expanded* is the shape with axes of length one
+    inserted and *shape* is the shape to broadcast to. """
+
+    subscripts = subscripts.replace(' ', '')
+    if '->' in subscripts:
+        (inputs, output) = subscripts.split('->')
+    else:
+        (inputs, output) = (subscripts, None)
+    inputs = inputs.split(',')
+    if len(inputs) != len(nominals):
+        raise ValueError(
+                'The number of subscripts ({0}) does not match the number '
+                'of operands ({1})'.format(len(inputs), len(nominals)))
+
+    if output is None:
+        # Implicit mode: The labels occurring once, sorted.
+        labels = ''.join(inputs).replace('...', '')
+        output = ''.join(sorted(
+            label for label in set(labels) if labels.count(label) == 1))
+        if any('...' in labels for labels in inputs):
+            output = '...' + output
+
+    # Replace ellipses by explicit labels ...
+
+    used = set(''.join(inputs) + output)
+    free = [letter for letter in string.ascii_letters
+            if letter not in used]
+    shapes = []
+    for (labels, nominal) in zip(inputs, nominals):
+        if '...' in labels:
+            head = len(labels.split('...')[0])
+            count = nominal.ndim - len(labels.replace('...', ''))
+            shapes.append(nominal.shape[head:head + count])
+        else:
+            shapes.append(())
+    ellipsis_shape = numpy.broadcast_shapes(*shapes)
+    ellipsis = ''.join(free[:len(ellipsis_shape)])
+
+    layouts = []
+    for (labels, nominal, shape) in zip(inputs, nominals, shapes):
+        if '...' in labels:
+            head = len(labels.split('...')[0])
+            layouts.append((
+                nominal.shape[:head] +
+                    (1,) * (len(ellipsis_shape) - len(shape)) +
+                    nominal.shape[head:],
+                nominal.shape[:head] + ellipsis_shape +
+                    nominal.shape[head + len(shape):]))
+        else:
+            layouts.append((nominal.shape, nominal.shape))
+
+    inputs = [labels.replace('...', ellipsis) for labels in inputs]
+    output = output.replace('...', ellipsis)
+    return (inputs, output, layouts)
+
+
+def udot(a, b):
+    """ Dot product of *a* and *b*, see ``numpy.dot``.  Either operand
+    might be an undarray. """
+
+    ndim_a = numpy.ndim(a.nominal if isinstance(a, upy2.core.undarray)
+            else a)
+    ndim_b = numpy.ndim(b.nominal if isinstance(b, upy2.core.undarray)
+            else b)
+    if ndim_a == 0 or ndim_b == 0:
+        return upy2.core.umultiply(a, b)
+
+    letters = string.ascii_letters
+    labels_a = letters[:ndim_a]
+    if ndim_b == 1:
+        labels_b = labels_a[-1]
+    else:
+        labels_b = letters[ndim_a:ndim_a + ndim_b - 2] + labels_a[-1] + \
+                letters[ndim_a + ndim_b - 2]
+    output = labels_a[:-1] + labels_b[:-2] + \
+            (labels_b[-1] if ndim_b > 1 else '')
+    return ueinsum(
+            '{0},{1}->{2}'.format(labels_a, labels_b, output), a, b)
+
+
+def umatmul(a, b):
+    """ Matrix product of *a* and *b*, see ``numpy.matmul``.  Either
+    operand might be an undarray.  Stacks of matrices are broadcast
+    like by ``numpy.matmul``. """
+
+    ndim_a = numpy.ndim(a.nominal if isinstance(a, upy2.core.undarray)
+            else a)
+    ndim_b = numpy.ndim(b.nominal if isinstance(b, upy2.core.undarray)
+            else b)
+    if ndim_a == 0 or ndim_b == 0:
+        raise ValueError(
+                'matmul: Input operand does not have enough dimensions')
+
+    if ndim_a == 1 and ndim_b == 1:
+        subscripts = 'j,j->'
+    elif ndim_a == 1:
+        subscripts = 'j,...jk->...k'
+    elif ndim_b == 1:
+        subscripts = '...ij,j->...i'
+    else:
+        subscripts = '...ij,...jk->...ik'
+    return ueinsum(subscripts, a, b)
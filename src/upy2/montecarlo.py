@@ -0,0 +1,264 @@
+# Developed since: Oct 2026
+
+""" Implements Monte Carlo propagation of uncertainties.  Within a
+:class:`MonteCarlo` Session manager, uufuncs are evaluated on *samples*
+of their operands instead of propagating Dependencies linearly.  Each
+quantity is represented by an ndarray of shape ``(n,) + shape`` of
+``n`` samples, held by a :class:`mcundarray`.
+
+The samples of an undarray are drawn from its Dependencies: each name
+stands for an independent source of uncertainty of unit variance,
+which is assigned one standard normal variate per sample.  The
+variates are the same for all undarrays sampled by the same Session
+manager, such that correlations between undarrays sharing names are
+retained. """
+
+import numpy
+import upy2
+import upy2.core
+import upy2.dependency
+
+__all__ = ['MonteCarlo', 'mcundarray']
+
+
+class MonteCarlo(upy2.core.Engine):
+    """ An :class:`Engine` propagating uncertainties by Monte Carlo
+    simulation::
+
+        with MonteCarlo(samples=100000, rng=1):
+            ua = uarccosh(x) / ulog(y)
+
+        ua.linearized().stddev
+
+    Linear propagation is exact for linear operations only; for
+    operations strongly nonlinear within the uncertainty of their
+    operands, e.g. :func:`ulog` near zero or :func:`uarccosh` near
+    one, the distribution of the samples reflects the nonlinearity.
+    Besides uufuncs, :meth:`~mcundarray.sum`, :meth:`~mcundarray.mean`,
+    :meth:`~mcundarray.scaled` and indexing operate on the samples.
+
+    *samples* is the number of samples per quantity, *rng* a
+    ``numpy.random.Generator`` or a seed for one.  The variates
+    assigned to the names are retained by the Session manager, one
+    ndarray of *samples* variates per name encountered.  When drawing
+    samples from Dependencies and when linearising, the samples are
+    processed in chunks, such that the temporary ndarrays hold at most
+    *chunksize* entries, i.e. samples times layers times elements.
+
+    Real-valued undarrays are supported only. """
+
+    def __init__(self, samples=10000, rng=None, chunksize=2 ** 22):
+        upy2.core.Engine.__init__(self)
+
+        self.samples = samples
+        self.rng = numpy.random.default_rng(rng)
+        self.chunksize = chunksize
+        self.names = numpy.zeros(0, dtype=int)
+            # The names encountered, in ascending order.
+        self.variates = numpy.zeros((0, samples))
+            # The variates assigned to :attr:`names`, one row per name.
+
+    def chunks(self, entries):
+        """ Returns the slices splitting the samples into chunks, where
+        each sample stands for *entries* entries. """
+
+        step = max(self.chunksize // max(entries, 1), 1)
+        return [slice(start, min(start + step, self.samples))
+                for start in range(0, self.samples, step)]
+
+    def lookup(self, names):
+        """ Returns the indices of the rows of :attr:`variates` assigned
+        to *names*.  Variates are drawn for names not encountered yet.
+        The indices of zero names are arbitrary. """
+
+        new = numpy.setdiff1d(names, self.names)
+        new = new[new != 0]
+        if len(new):
+            known = numpy.concatenate([self.names, new])
+            variates = numpy.concatenate([self.variates,
+                self.rng.standard_normal((len(new), self.samples))])
+            order = numpy.argsort(known, kind='stable')
+            (self.names, self.variates) = (known[order], variates[order])
+        if len(self.names) == 0:
+            return numpy.zeros(numpy.shape(names), dtype=int)
+        return numpy.minimum(numpy.searchsorted(self.names, names),
+                len(self.names) - 1)
+
+    def draw(self, ua):
+        """ Returns the samples of the undarray *ua*, of shape ``(n,) +
+        ua.shape``. """
+
+        if isinstance(ua, mcundarray) and ua.engine is self:
+            return ua.samples
+        if not numpy.isrealobj(ua.nominal) or \
+                not numpy.isrealobj(ua.stack.derivatives):
+            raise ValueError(
+                    'Monte Carlo propagation supports real-valued '
+                    'undarrays only')
+
+        stack = ua.stack
+        indices = self.lookup(stack.names)
+        samples = numpy.empty((self.samples,) + ua.shape,
+                dtype=numpy.result_type(ua.dtype, stack.dtype,
+                    self.variates.dtype))
+        samples[...] = ua.nominal
+        for key in self.chunks(stack.names.size):
+            # The variates of the chunk, of shape ``(nlayers,) +
+            # shape + (chunk,)``:
+            variates = self.variates[:, key][indices]
+            samples[key] += numpy.moveaxis(numpy.einsum(
+                'i...,i...j->...j', stack.derivatives, variates), -1, 0)
+        return samples
+
+    def operands(self, operands):
+        """ Returns the samples and the first-order undarrays of
+        *operands*.  The samples of undarrays are expanded to the
+        dimension of the result. """
+
+        ndim = max(numpy.ndim(operand) if not isinstance(operand,
+            upy2.core.undarray) else operand.ndim for operand in operands)
+        samples = []
+        linear = []
+        for operand in operands:
+            if isinstance(operand, upy2.core.undarray):
+                drawn = self.draw(operand)
+                samples.append(drawn.reshape(drawn.shape[:1] +
+                    (1,) * (ndim - operand.ndim) + operand.shape))
+                if isinstance(operand, mcundarray):
+                    operand = operand.linear
+            else:
+                samples.append(operand)
+            linear.append(operand)
+        return (samples, linear)
+
+    #
+    # Engine implementation ...
+    #
+
+    def unary(self, uufunc, x):
+        return self.map(uufunc, (x,))
+
+    def binary(self, uufunc, x1, x2):
+        return self.map(uufunc, (x1, x2))
+
+    def map(self, uufunc, operands):
+        if not any(isinstance(operand, upy2.core.undarray)
+                for operand in operands):
+            return uufunc.evaluate(*operands)
+
+        (samples, linear) = self.operands(operands)
+        return mcundarray(uufunc.ufunc(*samples),
+                uufunc.evaluate(*linear), self)
+
+    def sum(self, x, axes, dtype, keepdims):
+        samples = self.draw(x).sum(axis=tuple(axis + 1 for axis in axes),
+                dtype=dtype, keepdims=keepdims)
+        if isinstance(x, mcundarray):
+            x = x.linear
+        linear = upy2.core.undarray(nominal=x.nominal.sum(
+            axis=axes, dtype=dtype, keepdims=keepdims))
+        linear.adopt(x.stack.sum(axes, keepdims=keepdims))
+        return mcundarray(samples, linear, self)
+
+
+class mcundarray(upy2.core.undarray):
+    """ A quantity propagated by :class:`MonteCarlo`, given by its
+    :attr:`samples`, an ndarray of shape ``(n,) + shape``.
+
+    The :attr:`nominal` value and the Dependencies of an
+    ``mcundarray`` are those of its linearisation, see
+    :meth:`linearized`, such that ``mcundarray`` instances can be used
+    wherever undarrays are expected.  In particular, the nominal value
+    is the mean of the samples and the :attr:`variance` is their
+    variance.
+
+    :attr:`linear` holds the result of first-order propagation, for
+    comparison. """
+
+    def __init__(self, samples, linear, engine):
+        """ *samples* are the samples, *linear* is the undarray
+        resulting from first-order propagation and *engine* the
+        :class:`MonteCarlo` Session manager which drew the samples. """
+
+        self.samples = numpy.asarray(samples)
+        self.linear = linear
+        self.engine = engine
+        self.shape = self.samples.shape[1:]
+        self.dtype = self.samples.dtype
+        self.ndim = self.samples.ndim - 1
+        self.result = None
+
+    #
+    # Operations on the samples ...
+    #
+
+    def scaled(self, factor):
+        return mcundarray(self.samples * factor,
+                self.linear.scaled(factor), self.engine)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        return mcundarray(self.samples[(slice(None),) + key],
+                self.linear[key], self.engine)
+
+    def augment(self, uufunc, other):
+        # The samples might be referenced by other instances.
+        return NotImplemented
+
+    #
+    # Linearisation ...
+    #
+
+    def linearized(self):
+        """ Returns the :class:`undarray` approximating *self* linearly
+        in terms of the sources of uncertainty.  Its nominal value is
+        the mean of the samples.  Its Dependencies carry the names
+        *self* depends on in first order; the derivative with respect
+        to each name is estimated by the covariance of the samples with
+        the variates of the name.  The variance of the samples not
+        explained by these names, e.g. due to nonlinearities, is
+        attributed to a Dependency with new names. """
+
+        if self.result is not None:
+            return self.result
+
+        samples = self.samples
+        count = len(samples)
+        nominal = samples.mean(axis=0)
+        variance = samples.var(axis=0, ddof=1)
+
+        stack = self.linear.stack
+        indices = self.engine.lookup(stack.names)
+        derivatives = numpy.zeros(stack.names.shape, dtype=self.dtype)
+        for key in self.engine.chunks(stack.names.size):
+            variates = self.engine.variates[:, key][indices]
+            derivatives += numpy.einsum('...j,j...->...', variates,
+                    samples[key] - nominal)
+        derivatives /= count - 1
+        derivatives[stack.names == 0] = 0
+
+        result = upy2.core.undarray(nominal=nominal)
+        result.adopt(upy2.dependency.DependencyStack(self.shape,
+            names=stack.names.copy(), derivatives=derivatives))
+        residual = numpy.sqrt(numpy.maximum(
+            variance - (derivatives ** 2).sum(axis=0), 0))
+        if residual.any():
+            result.append(upy2.dependency.Dependency(
+                names=numpy.where(residual > 0,
+                    upy2.guid_generator.generate_idarray(self.shape), 0),
+                derivatives=residual.astype(self.dtype)))
+        self.result = result
+        return result
+
+    @property
+    def nominal(self):
+        return self.linearized().nominal
+
+    @property
+    def stack(self):
+        return self.linearized().stack
+
+    @stack.setter
+    def stack(self, stack):
+        self.linearized().stack = stack
@@ -0,0 +1,236 @@
+# Developed since: Oct 2026
+
+""" Implements out-of-core undarrays, whose nominal values and
+Dependencies are held in ``numpy.memmap`` files in a working
+directory.  Within an :class:`OutOfCore` Session manager, uufuncs and
+sums are evaluated in chunks along the leading axis, such that the
+memory needed is bounded by the size of the chunks instead of by the
+size of the undarrays times their number of layers. """
+
+import os
+import tempfile
+import weakref
+import numpy
+import upy2.core
+import upy2.dependency
+
+__all__ = ['OutOfCore', 'MappedDependencyStack']
+
+
+def allocate(shape, dtype, directory=None):
+    """ Returns a zero-filled ndarray of shape *shape* and dtype
+    *dtype* mapped from a new file in *directory*.  The file is removed
+    as soon as the ndarray and all views of it are deleted. """
+
+    (fd, filename) = tempfile.mkstemp(prefix='upy2-', dir=directory)
+    os.close(fd)
+    array = numpy.memmap(filename, dtype=dtype, mode='w+', shape=shape)
+    weakref.finalize(array, os.remove, filename)
+    return array
+
+
+class MappedDependencyStack(upy2.dependency.DependencyStack):
+    """ A :class:`DependencyStack` whose buffers are mapped from files
+    in the working directory *directory*, see :func:`allocate`. """
+
+    def __init__(self, shape, dtype=None, names=None, derivatives=None,
+            names_dtype=None, directory=None):
+        self.directory = directory
+        upy2.dependency.DependencyStack.__init__(self, shape,
+                dtype=dtype, names=names, derivatives=derivatives,
+                names_dtype=names_dtype)
+
+    def _allocate(self, capacity, names_dtype, dtype):
+        if capacity == 0:
+            # Empty stacks do not need files.
+            return upy2.dependency.DependencyStack._allocate(
+                    self, capacity, names_dtype, dtype)
+
+        shape = (capacity,) + self.shape
+        return (allocate(shape, names_dtype, self.directory),
+                allocate(shape, dtype, self.directory))
+
+
+class OutOfCore(upy2.core.Engine):
+    """ An :class:`Engine` keeping undarrays out of core::
+
+        with OutOfCore('/scratch/work'):
+            cube = undarray(nominal=nominal_cube, stddev=sigma_cube)
+            calibrated = (cube - dark) * gain
+            image = calibrated.sum(axis=0)
+
+    The Dependencies of the undarrays created while in effect are held
+    in :class:`MappedDependencyStack` instances, with their files in
+    *directory*, by default the temporary directory.  uufuncs and sums
+    are evaluated in chunks along the leading axis: each chunk of the
+    operands is read, evaluated in memory and written to the nominal
+    value and the Dependencies of the result, which are mapped from
+    files as well.  The chunks hold at most *chunksize* entries, i.e.
+    elements times layers, unless a single index along the leading
+    axis exceeds this.
+
+    Other operations, e.g. indexing, produce undarrays held in memory.
+    Nominal values given by the user are not copied; pass
+    ``numpy.memmap`` instances to keep them out of core as well. """
+
+    def __init__(self, directory=None, chunksize=2 ** 22):
+        upy2.core.Engine.__init__(self)
+
+        self.directory = directory
+        self.chunksize = chunksize
+        self.streaming = False
+            # While evaluating chunks, operations are carried out
+            # immediately and the undarrays created are held in memory.
+
+    def stack(self, shape, dtype, names_dtype):
+        if self.streaming:
+            return NotImplemented
+        return MappedDependencyStack(shape, dtype=dtype,
+                names_dtype=names_dtype, directory=self.directory)
+
+    def bounds(self, shape, nlayers):
+        """ Returns the slices splitting the leading axis of *shape*
+        into chunks for *nlayers* layers. """
+
+        entries = int(numpy.prod(shape[1:], dtype=int)) * max(nlayers, 1)
+        step = max(self.chunksize // max(entries, 1), 1)
+        return [slice(start, min(start + step, shape[0]))
+                for start in range(0, shape[0], step)]
+
+    def result(self, shape, dtype, capacity):
+        """ Returns an undarray of shape *shape* and dtype *dtype* with
+        its nominal value mapped from a file, and mapped buffers for
+        *capacity* layers of Dependencies. """
+
+        result = upy2.core.undarray(
+                nominal=allocate(shape, dtype, self.directory))
+        buffers = (
+                allocate((capacity,) + shape, result.stack.names_dtype,
+                    self.directory),
+                allocate((capacity,) + shape, result.stack.dtype,
+                    self.directory))
+        return (result, buffers)
+
+    def store(self, chunk, result, buffers, key):
+        """ Writes the undarray *chunk* into the elements *key* of
+        *result* and of its Dependency *buffers*.  Returns the number
+        of layers of *chunk*. """
+
+        (names, derivatives) = buffers
+        nlayers = len(chunk.stack)
+        upy2.dependency.check_names(chunk.stack.names, names.dtype)
+        result.nominal[key] = chunk.nominal
+        names[:nlayers, key] = chunk.stack.names
+        derivatives[:nlayers, key] = chunk.stack.derivatives
+        return nlayers
+
+    def adopt(self, result, buffers, nlayers):
+        """ Uses the first *nlayers* layers of *buffers* as the
+        Dependencies of *result*. """
+
+        (names, derivatives) = buffers
+        result.adopt(MappedDependencyStack(result.shape,
+                names=names[:nlayers], derivatives=derivatives[:nlayers],
+                directory=self.directory))
+        return result
+
+    #
+    # Engine implementation ...
+    #
+
+    def unary(self, uufunc, x):
+        return self.map(uufunc, (x,))
+
+    def binary(self, uufunc, x1, x2):
+        return self.map(uufunc, (x1, x2))
+
+    def map(self, uufunc, operands):
+        """ Evaluates *uufunc* on *operands* chunk by chunk. """
+
+        shapes = [operand.shape
+                if isinstance(operand, upy2.core.undarray)
+                else numpy.shape(operand) for operand in operands]
+        shape = numpy.broadcast_shapes(*shapes)
+        capacity = sum(len(operand.stack) for operand in operands
+                if isinstance(operand, upy2.core.undarray))
+        if self.streaming or len(shape) == 0 or not any(
+                isinstance(operand, upy2.core.undarray)
+                for operand in operands):
+            return uufunc.evaluate(*operands)
+
+        # The dtype of the result is determined from empty operands:
+        dtype = uufunc.ufunc(*[
+            numpy.empty((0,), dtype=operand.dtype)
+            if isinstance(operand, (upy2.core.undarray, numpy.ndarray))
+            else operand for operand in operands]).dtype
+        (result, buffers) = self.result(shape, dtype, capacity)
+
+        # Operands extending over the leading axis of the result are
+        # split, the others are used in whole:
+        split = [len(operand_shape) == len(shape) and
+                operand_shape[0] == shape[0] for operand_shape in shapes]
+        nlayers = 0
+        self.streaming = True
+        try:
+            for key in self.bounds(shape, capacity):
+                chunk = uufunc.evaluate(*[operand[key] if chunked
+                    else operand
+                    for (operand, chunked) in zip(operands, split)])
+                nlayers = max(nlayers,
+                        self.store(chunk, result, buffers, key))
+        finally:
+            self.streaming = False
+        return self.adopt(result, buffers, nlayers)
+
+    def sum(self, x, axes, dtype, keepdims):
+        if self.streaming or x.ndim == 0 or x.shape[0] == 0:
+            return NotImplemented
+
+        bounds = self.bounds(x.shape, len(x.stack))
+        self.streaming = True
+        try:
+            if 0 in axes:
+                # The partial sums of the chunks are stored along the
+                # leading axis of a mapped undarray, whose Dependencies
+                # are joined at once when summing it up:
+                partial = x[bounds[0]].sum(axis=axes, dtype=dtype,
+                        keepdims=True)
+                reduced = int(numpy.prod([x.shape[axis] for axis in axes
+                    if axis != 0], dtype=int))
+                (partials, buffers) = self.result(
+                        (len(bounds),) + partial.shape[1:], partial.dtype,
+                        len(x.stack) * (bounds[0].stop - bounds[0].start) *
+                        reduced)
+                nlayers = 0
+                for (index, key) in enumerate(bounds):
+                    if index > 0:
+                        partial = x[key].sum(axis=axes, dtype=dtype,
+                                keepdims=True)
+                    nlayers = max(nlayers, self.store(partial, partials,
+                        buffers, slice(index, index + 1)))
+                del partial
+                total = self.adopt(partials, buffers, nlayers).sum(
+                        axis=axes, keepdims=keepdims)
+                (result, buffers) = self.result(
+                        total.shape, total.dtype, len(total.stack))
+                return self.adopt(result, buffers,
+                        self.store(total, result, buffers, Ellipsis))
+
+            # The chunks of *x* yield the chunks of the result:
+            dtype = numpy.empty((0,), dtype=x.dtype).sum(dtype=dtype)\
+                    .dtype
+            shape = tuple(1 if axis in axes else length
+                    for (axis, length) in enumerate(x.shape)
+                    if keepdims or axis not in axes)
+            reduced = int(numpy.prod([x.shape[axis] for axis in axes],
+                dtype=int))
+            (result, buffers) = self.result(
+                    shape, dtype, len(x.stack) * reduced)
+            nlayers = 0
+            for key in bounds:
+                nlayers = max(nlayers, self.store(
+                    x[key].sum(axis=axes, dtype=dtype, keepdims=keepdims),
+                    result, buffers, key))
+            return self.adopt(result, buffers, nlayers)
+        finally:
+            self.streaming = False
@@ -0,0 +1,351 @@
+# Developed since: Oct 2026
+
+""" Implements parallel evaluation of uufuncs and sums.  Within a
+:class:`Parallel` Session manager, large undarrays are split into
+chunks along their leading axis, and the chunks are evaluated by the
+worker processes of a process pool.
+
+Operands and results are exchanged via *segments* of shared memory,
+which are files mapped into memory, located in ``/dev/shm`` where
+available.  The workers write their parts of the result directly into
+the segments of the result; the result undarray uses the segments as
+its buffers without copying.  Operands residing in segments already,
+e.g. results of earlier parallel operations, are not copied again. """
+
+import os
+import mmap
+import concurrent.futures
+import numpy
+import upy2.core
+import upy2.dependency
+import upy2.outofcore
+import upy2.sessions
+
+__all__ = ['Parallel']
+
+
+class Parallel(upy2.core.Engine):
+    """ An :class:`Engine` evaluating uufuncs and sums of large
+    undarrays in a process pool::
+
+        with Parallel(processes=8):
+            ua = (a * x + b) / ulog(c)
+            total = ua.sum(axis=0)
+
+    The result of an operation is split along its leading axis into
+    *chunks* parts, each of which is evaluated by a worker.  Operations
+    with results of less than *threshold* elements, or of dimension
+    zero, are evaluated immediately in the calling process.  Sums along
+    the leading axis are carried out in two steps: the workers sum up
+    their chunks, and the partial sums are summed up by the calling
+    process.
+
+    The process pool is started on first use and shut down when the
+    Session manager is left, or by :meth:`shutdown`.  *mp_context* is
+    the multiprocessing context used to start the workers.  Segments
+    are created in *directory*, by default ``/dev/shm`` where available
+    and the default temporary directory otherwise.  Segments are
+    removed as soon as the ndarrays using them are deleted. """
+
+    def __init__(self, processes=None, chunks=None, threshold=100000,
+            mp_context=None, directory=None):
+        upy2.core.Engine.__init__(self)
+
+        self.processes = processes or os.cpu_count()
+        self.chunks = chunks or self.processes
+        self.threshold = threshold
+        self.mp_context = mp_context
+        if directory is None and os.path.isdir('/dev/shm'):
+            directory = '/dev/shm'
+        self.directory = directory
+        self.executor = None
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.shutdown()
+        upy2.core.Engine.__exit__(self, exc_type, exc_value, exc_tb)
+
+    def pool(self):
+        """ Returns the process pool, starting it if needed. """
+
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                    self.processes, mp_context=self.mp_context,
+                    initializer=upy2.sessions.reset)
+                # Forked workers would inherit the Session managers,
+                # including *self*.
+        return self.executor
+
+    def shutdown(self):
+        """ Shuts the process pool down.  It will be restarted when
+        needed. """
+
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    #
+    # Segments ...
+    #
+
+    def allocate(self, shape, dtype):
+        """ Returns a zero-filled ndarray of shape *shape* and dtype
+        *dtype* in a new segment. """
+
+        return upy2.outofcore.allocate(shape, dtype, self.directory)
+
+    def share(self, array, keep):
+        """ Returns the descriptor of *array* as expected by
+        :func:`attach`.  When *array* does not reside in a segment, it
+        is copied into a new one, which is appended to the list *keep*
+        to keep it alive. """
+
+        array = numpy.asarray(array)
+        descriptor = describe(array)
+        if descriptor is None:
+            copy = self.allocate(array.shape, array.dtype)
+            copy[...] = array
+            keep.append(copy)
+            descriptor = describe(copy)
+        return descriptor
+
+    def operand(self, operand, keep):
+        """ Returns the description of the uufunc operand *operand*
+        as expected by :func:`operand`. """
+
+        if isinstance(operand, upy2.core.undarray):
+            return ('undarray',
+                    self.share(operand.nominal, keep),
+                    self.share(operand.stack.names, keep),
+                    self.share(operand.stack.derivatives, keep))
+        elif isinstance(operand, numpy.ndarray):
+            return ('array', self.share(operand, keep))
+        return ('value', operand)
+
+    def result(self, shape, dtype, capacity, keep):
+        """ Returns an undarray of shape *shape* and dtype *dtype*
+        whose nominal value resides in a segment, together with the
+        descriptors of segments for its nominal value and for
+        *capacity* layers of Dependencies, and the latter segments.
+        Use :meth:`adopt` to complete the undarray.  The Dependencies
+        are stored with the dtypes of the result, see
+        :class:`upy2.Precision`. """
+
+        result = upy2.core.undarray(nominal=self.allocate(shape, dtype))
+        buffers = (
+                self.allocate((max(capacity, 1),) + shape,
+                    result.stack.names_dtype),
+                self.allocate((max(capacity, 1),) + shape,
+                    result.stack.dtype))
+        keep.extend(buffers)
+        return (result, [describe(buffer)
+            for buffer in (result.nominal,) + buffers], buffers)
+
+    def adopt(self, result, buffers, futures):
+        """ Waits for the workers computing *result* by means of the
+        futures *futures*, and uses the layers of the Dependency
+        segments *buffers* filled by the workers as the Dependencies
+        of *result*. """
+
+        nlayers = max([future.result() for future in futures])
+        (names, derivatives) = buffers
+        result.adopt(upy2.dependency.DependencyStack(
+                shape=result.shape,
+                names=names[:nlayers],
+                derivatives=derivatives[:nlayers]))
+        return result
+
+    def bounds(self, length):
+        """ Returns the slices splitting an axis of length *length*
+        into chunks. """
+
+        edges = numpy.unique(numpy.linspace(0, length,
+            min(self.chunks, length) + 1).astype(int))
+        return [slice(int(start), int(stop))
+                for (start, stop) in zip(edges[:-1], edges[1:])]
+
+    #
+    # Engine implementation ...
+    #
+
+    def unary(self, uufunc, x):
+        return self.map(uufunc, (x,))
+
+    def binary(self, uufunc, x1, x2):
+        return self.map(uufunc, (x1, x2))
+
+    def map(self, uufunc, operands):
+        """ Evaluates *uufunc* on *operands* chunk by chunk. """
+
+        shapes = [operand.shape
+                if isinstance(operand, upy2.core.undarray)
+                else numpy.shape(operand) for operand in operands]
+        shape = numpy.broadcast_shapes(*shapes)
+        if not any(isinstance(operand, upy2.core.undarray)
+                for operand in operands) or len(shape) == 0 or \
+                shape[0] < 2 or \
+                numpy.prod(shape, dtype=int) < self.threshold:
+            return uufunc.evaluate(*operands)
+
+        # The dtype of the result is determined from empty operands:
+        dtype = uufunc.ufunc(*[
+            numpy.empty((0,), dtype=operand.dtype)
+            if isinstance(operand, (upy2.core.undarray, numpy.ndarray))
+            else operand for operand in operands]).dtype
+        capacity = sum(len(operand.stack) for operand in operands
+                if isinstance(operand, upy2.core.undarray))
+
+        keep = []
+        descriptions = [self.operand(operand, keep)
+                for operand in operands]
+        # Operands extending over the leading axis of the result are
+        # split, the others are passed in whole:
+        split = [len(operand_shape) == len(shape) and
+                operand_shape[0] == shape[0] for operand_shape in shapes]
+        (result, outputs, buffers) = self.result(shape, dtype, capacity, keep)
+
+        futures = [self.pool().submit(evaluate_chunk, uufunc,
+                descriptions, [key if chunked else None
+                    for chunked in split], outputs, key)
+            for key in self.bounds(shape[0])]
+        return self.adopt(result, buffers, futures)
+
+    def sum(self, x, axes, dtype, keepdims):
+        if x.ndim == 0 or x.shape[0] < 2 or \
+                x.nominal.size < self.threshold:
+            return NotImplemented
+
+        dtype = numpy.empty((0,), dtype=x.dtype).sum(dtype=dtype).dtype
+        reduced = int(numpy.prod([x.shape[axis] for axis in axes],
+            dtype=int))
+        bounds = self.bounds(x.shape[0])
+
+        keep = []
+        description = self.operand(x, keep)
+        if 0 not in axes:
+            # The chunks yield the chunks of the result:
+            shape = tuple(1 if axis in axes else length
+                    for (axis, length) in enumerate(x.shape)
+                    if keepdims or axis not in axes)
+            (result, outputs, buffers) = self.result(
+                    shape, dtype, len(x.stack) * reduced, keep)
+            futures = [self.pool().submit(sum_chunk, description, key,
+                    axes, dtype, keepdims, outputs, key)
+                for key in bounds]
+            return self.adopt(result, buffers, futures)
+
+        # The chunks yield partial sums, to be summed up:
+        shape = (len(bounds),) + tuple(1 if axis in axes else length
+                for (axis, length) in enumerate(x.shape) if axis > 0)
+        longest = max(key.stop - key.start for key in bounds)
+        (partial, outputs, buffers) = self.result(shape, dtype,
+                len(x.stack) * reduced // x.shape[0] * longest, keep)
+        futures = [self.pool().submit(sum_chunk, description, key,
+                axes, dtype, True, outputs, slice(index, index + 1))
+            for (index, key) in enumerate(bounds)]
+        partial = self.adopt(partial, buffers, futures)
+
+        result = upy2.core.undarray(nominal=partial.nominal.sum(
+            axis=axes, dtype=dtype, keepdims=keepdims))
+        result.adopt(partial.stack.sum(axes, keepdims=keepdims))
+        return result
+
+
+#
+# Segments ...
+#
+
+
+def describe(array):
+    """ Returns the descriptor ``(filename, offset, dtype, shape,
+    strides)`` of the ndarray *array* residing in a file mapped by
+    ``numpy.memmap``, or ``None`` if it does not. """
+
+    base = array
+    while base is not None and not isinstance(base, numpy.memmap):
+        base = getattr(base, 'base', None)
+    if base is None or base._mmap is None or base.filename is None \
+            or base.mode == 'c':
+        # Copy-on-write maps might deviate from their files.
+        return None
+
+    # The offset of *array* in the file, where the map starts at the
+    # allocation boundary preceding the offset of the memmap:
+    start = numpy.frombuffer(base._mmap, dtype=numpy.uint8)
+    offset = base.offset - base.offset % mmap.ALLOCATIONGRANULARITY + \
+            array.__array_interface__['data'][0] - \
+            start.__array_interface__['data'][0]
+    return (base.filename, offset, array.dtype.str, array.shape,
+            array.strides)
+
+
+def attach(descriptor, mode):
+    """ Returns the ndarray described by *descriptor*, see
+    :func:`describe`, mapped in *mode* ``'r'`` or ``'r+'``. """
+
+    (filename, offset, dtype, shape, strides) = descriptor
+    data = numpy.memmap(filename, dtype=numpy.uint8, mode=mode)
+    return numpy.ndarray(shape, dtype=dtype, buffer=data, offset=offset,
+            strides=strides)
+
+
+#
+# Worker functions ...
+#
+
+
+def operand(description, key):
+    """ Returns the uufunc operand described by *description*, see
+    :meth:`Parallel.operand`, restricted to the chunk *key* along the
+    leading axis unless *key* is ``None``. """
+
+    if description[0] == 'value':
+        return description[1]
+    elif description[0] == 'array':
+        array = attach(description[1], 'r')
+        return array if key is None else array[key]
+
+    (nominal, names, derivatives) = [attach(descriptor, 'r')
+            for descriptor in description[1:]]
+    if key is not None:
+        (nominal, names, derivatives) = \
+                (nominal[key], names[:, key], derivatives[:, key])
+    result = upy2.core.undarray(nominal=nominal)
+    # The dtypes of the stack are retained; :meth:`undarray.adopt`
+    # might cast them.
+    result.stack = upy2.dependency.DependencyStack(shape=nominal.shape,
+            names=names, derivatives=derivatives)
+    return result
+
+
+def store(result, outputs, key):
+    """ Writes the undarray *result* into the chunk *key* of the
+    segments described by *outputs*, and returns its number of layers.
+    """
+
+    (nominal, names, derivatives) = [attach(descriptor, 'r+')
+            for descriptor in outputs]
+    nlayers = len(result.stack)
+    upy2.dependency.check_names(result.stack.names, names.dtype)
+    nominal[key] = result.nominal
+    names[:nlayers, key] = result.stack.names
+    derivatives[:nlayers, key] = result.stack.derivatives
+    return nlayers
+
+
+def evaluate_chunk(uufunc, descriptions, keys, outputs, key):
+    """ Evaluates *uufunc* on the chunks *keys* of the operands
+    described by *descriptions*, and stores the result into the chunk
+    *key* of *outputs*. """
+
+    return store(uufunc.evaluate(*[operand(description, operand_key)
+        for (description, operand_key) in zip(descriptions, keys)]),
+        outputs, key)
+
+
+def sum_chunk(description, key, axes, dtype, keepdims, outputs, target):
+    """ Sums the chunk *key* of the undarray described by
+    *description* and stores the sum into the chunk *target* of
+    *outputs*. """
+
+    return store(operand(description, key).sum(
+        axis=axes, dtype=dtype, keepdims=keepdims), outputs, target)
@@ -0,0 +1,268 @@
+# Developed since: Oct 2026
+
+""" Implements second-order propagation of uncertainties.  Within a
+:class:`SecondOrder` Session manager, uufuncs propagate, besides the
+Dependencies, the *curvature* of their result with respect to each
+source of uncertainty, held by a :class:`curvedundarray`.
+
+With the sources of uncertainty given by independent standard normal
+variates ``z_a``, one per name ``a``, a quantity is approximated by::
+
+    y = nominal + sum_a g_a z_a + 1/2 sum_a h_a z_a^2 ,
+
+where the ``g_a`` are the derivatives held by the Dependencies and the
+``h_a`` the curvatures, i.e. the diagonal of the Hessian with respect
+to the variates.  Mixed terms ``z_a z_b`` with ``a != b`` are
+neglected.  Then the expectation of ``y`` is shifted by the *bias*
+``1/2 sum_a h_a`` from the nominal value, and the variance is
+``sum_a g_a^2 + 1/2 sum_a h_a^2``.
+
+Applying ``f`` to ``x`` yields the curvatures::
+
+    h'_a = f'(x) h_a + f''(x) g_a^2 ,
+
+where the derivatives of ``f`` are given by :meth:`Unary._derivative`
+and :meth:`Unary._second_derivative`.  Binary uufuncs add the mixed
+term ``2 f_12 g1_a g2_a``, which is obtained from the squared
+derivatives of the sum of both operands, see :meth:`SecondOrder.binary`.
+"""
+
+import numpy
+import upy2.core
+import upy2.dependency
+
+__all__ = ['SecondOrder', 'curvedundarray']
+
+
+def squared(stack):
+    """ Returns a :class:`DependencyStack` with the names of *stack*
+    and the squares of its derivatives.  The names are not copied. """
+
+    return upy2.dependency.DependencyStack(stack.shape,
+            names=stack.names, derivatives=stack.derivatives ** 2)
+
+
+def vanishes(factor):
+    """ Returns whether *factor* is known to be zero everywhere without
+    inspecting arrays. """
+
+    return numpy.ndim(factor) == 0 and factor == 0
+
+
+class SecondOrder(upy2.core.Engine):
+    """ An :class:`Engine` propagating uncertainties to second order::
+
+        with SecondOrder():
+            ua = ulog(x) / usqrt(y)
+
+        ua.expectation, ua.bias, ua.stddev
+
+    This is a deterministic alternative to :class:`MonteCarlo` for
+    operations moderately nonlinear within the uncertainty of their
+    operands: its cost is a small multiple of the cost of first-order
+    propagation, instead of scaling with a number of samples.
+
+    Besides uufuncs, :meth:`~curvedundarray.sum`,
+    :meth:`~curvedundarray.mean`, :meth:`~curvedundarray.scaled` and
+    indexing retain the curvatures.  Other operations, e.g. reshaping,
+    operate on the first-order undarray only.  uufuncs without second
+    derivatives, e.g. :func:`uabsolute`, raise ``ValueError``.
+
+    Real-valued undarrays are supported only. """
+
+    def operand(self, x):
+        """ Returns the first-order undarray and the curvature stack of
+        the operand *x*; the curvature stack of undarrays propagated
+        to first order is ``None``. """
+
+        if isinstance(x, curvedundarray):
+            (linear, curvature) = (x.linear, x.curvature)
+        else:
+            (linear, curvature) = (x, None)
+        if not numpy.isrealobj(linear.nominal) or \
+                not numpy.isrealobj(linear.stack.derivatives):
+            raise ValueError(
+                    'Second-order propagation supports real-valued '
+                    'undarrays only')
+        return (linear, curvature)
+
+    def curved(self, result, terms):
+        """ Returns the :class:`curvedundarray` with first-order part
+        *result* and curvatures given by the sum over the stacks in
+        *terms*, each scaled by its factor.  *terms* is a sequence of
+        ``(stack, factor)`` pairs; stacks might be ``None``. """
+
+        curvature = upy2.dependency.DependencyStack(result.shape,
+                dtype=result.stack.dtype,
+                names_dtype=result.stack.names_dtype)
+        for (stack, factor) in terms:
+            if stack is None or len(stack) == 0 or vanishes(factor):
+                continue
+            curvature.join(stack * factor)
+        return curvedundarray(result, curvature)
+
+    #
+    # Engine implementation ...
+    #
+
+    def unary(self, uufunc, x):
+        if not isinstance(x, upy2.core.undarray):
+            return uufunc.evaluate(x)
+
+        (linear, curvature) = self.operand(x)
+        result = uufunc.evaluate(linear)
+        (y, yout) = (linear.nominal, result.nominal)
+        try:
+            derivative = uufunc._derivative(y, yout)
+            second = uufunc._second_derivative(y, yout)
+        except NotImplementedError:
+            raise ValueError(
+                    'Second-order propagation is not supported by '
+                    '{0}'.format(uufunc))
+
+        return self.curved(result, [
+            (curvature, derivative),
+            (squared(linear.stack), second)])
+
+    def binary(self, uufunc, x1, x2):
+        """ Evaluates *uufunc* with operands *x1* and *x2*.  When both
+        operands are undarrays, the mixed term ``2 f_12 g1_a g2_a`` of
+        the curvatures is rewritten as ``f_12 (s_a^2 - g1_a^2 -
+        g2_a^2)``, with ``s_a`` the derivatives of the sum of the
+        operands, such that all terms are obtained by joining stacks.
+        """
+
+        if isinstance(x1, upy2.core.undarray):
+            (linear1, curvature1) = self.operand(x1)
+            y1 = linear1.nominal
+        else:
+            (linear1, y1) = (x1, numpy.asarray(x1))
+        if isinstance(x2, upy2.core.undarray):
+            (linear2, curvature2) = self.operand(x2)
+            y2 = linear2.nominal
+        else:
+            (linear2, y2) = (x2, numpy.asarray(x2))
+
+        result = uufunc.evaluate(linear1, linear2)
+        yout = result.nominal
+        try:
+            if isinstance(x1, upy2.core.undarray) and \
+                    isinstance(x2, upy2.core.undarray):
+                (derivative1, derivative2) = \
+                        uufunc._derivatives(y1, y2, yout)
+                (second1, mixed, second2) = \
+                        uufunc._second_derivatives(y1, y2, yout)
+                terms = [
+                    (curvature1, derivative1),
+                    (curvature2, derivative2),
+                    (squared(linear1.stack), second1 - mixed),
+                    (squared(linear2.stack), second2 - mixed)]
+                if not vanishes(mixed):
+                    terms.append((squared(upy2.core.uadd.evaluate(
+                        linear1, linear2).stack), mixed))
+            elif isinstance(x1, upy2.core.undarray):
+                terms = [
+                    (curvature1, uufunc._derivative1(y1, y2, yout)),
+                    (squared(linear1.stack),
+                        uufunc._second_derivative1(y1, y2, yout))]
+            elif isinstance(x2, upy2.core.undarray):
+                terms = [
+                    (curvature2, uufunc._derivative2(y1, y2, yout)),
+                    (squared(linear2.stack),
+                        uufunc._second_derivative2(y1, y2, yout))]
+            else:
+                return result
+        except NotImplementedError:
+            raise ValueError(
+                    'Second-order propagation is not supported by '
+                    '{0}'.format(uufunc))
+
+        return self.curved(result, terms)
+
+    def sum(self, x, axes, dtype, keepdims):
+        if not isinstance(x, curvedundarray):
+            return NotImplemented
+
+        return curvedundarray(
+                x.linear.sum(axis=axes, dtype=dtype, keepdims=keepdims),
+                x.curvature.sum(axes, keepdims=keepdims))
+
+
+class curvedundarray(upy2.core.undarray):
+    """ A quantity propagated by :class:`SecondOrder`, given by the
+    undarray :attr:`linear` resulting from first-order propagation and
+    the :class:`DependencyStack` :attr:`curvature`, which holds the
+    curvature with respect to each name.
+
+    The :attr:`nominal` value and the Dependencies are those of
+    :attr:`linear`, such that ``curvedundarray`` instances can be used
+    wherever undarrays are expected.  The :attr:`variance` includes
+    the second-order term; the :attr:`bias` of the expectation is
+    available separately. """
+
+    def __init__(self, linear, curvature):
+        self.linear = linear
+        self.curvature = curvature
+        self.shape = linear.shape
+        self.dtype = linear.dtype
+        self.ndim = linear.ndim
+
+    #
+    # Operations retaining the curvatures ...
+    #
+
+    def scaled(self, factor):
+        return curvedundarray(self.linear.scaled(factor),
+                self.curvature * factor)
+
+    def __getitem__(self, key):
+        return curvedundarray(self.linear[key], self.curvature[key])
+
+    def augment(self, uufunc, other):
+        # The curvatures would not be updated in place.
+        return NotImplemented
+
+    #
+    # Second-order properties ...
+    #
+
+    def curvatures(self):
+        """ Returns the curvatures of all layers, with entries of zero
+        name masked out. """
+
+        return numpy.where(self.curvature.names != 0,
+                self.curvature.derivatives, 0)
+
+    @property
+    def bias(self):
+        """ The shift of the expectation from the nominal value, half
+        the sum of the curvatures. """
+
+        return 0.5 * self.curvatures().sum(axis=0, dtype=self.dtype)
+
+    @property
+    def expectation(self):
+        """ The expectation, i.e. the nominal value corrected by the
+        :attr:`bias`. """
+
+        return self.nominal + self.bias
+
+    @property
+    def variance(self):
+        """ The variance including the second-order term, half the sum
+        of the squared curvatures. """
+
+        return upy2.core.undarray.variance.fget(self) + \
+                0.5 * (self.curvatures() ** 2).sum(axis=0, dtype=self.dtype)
+
+    @property
+    def nominal(self):
+        return self.linear.nominal
+
+    @property
+    def stack(self):
+        return self.linear.stack
+
+    @stack.setter
+    def stack(self, stack):
+        self.linear.stack = stack
@@ -115,6 +115,16 @@ def define(protocol):
 # Sessions exist as long as their key Protocol class, so we don't need
 # :func:`undefine`.
 
+def reset():
+    """ Unregisters all session managers of all Sessions, including
+    the Defaults.  This is meant for child processes, which inherit the
+    session managers of the parent when forked. """
+
+    for session in sessions.values():
+        session.thread_stacks.clear()
+        with session.lock_default:
+            del session.default_stack[:]
+
 def byprotocol(protocol):
     """ Returns the Session for a Protocol class *protocol*.  Keys
     which are a *parent class* of *protocol* will match. """
@@ -0,0 +1,179 @@
+# Developed since: Oct 2026
+
+""" Implements undarrays residing in blocks of shared memory, which
+several processes can use without copying.  :meth:`undarray.to_shared`
+copies an undarray into a new block and returns a :class:`SharedHandle`
+to it.  Handles are small and can be passed to other processes, e.g.
+as arguments of pool tasks, where :func:`shared_undarray` attaches to
+the block::
+
+    handle = calibrated.to_shared()
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(analyse, [handle] * 8)
+
+    def analyse(handle):
+        calibrated = upy2.shared_undarray(handle)
+        ...
+
+A block holds the nominal value, the names and the derivatives of an
+undarray in this order, each aligned to
+:data:`upy2.storage.ALIGNMENT`. """
+
+import os
+import weakref
+import multiprocessing.shared_memory
+import numpy
+import upy2.core
+import upy2.dependency
+import upy2.storage
+
+__all__ = ['SharedHandle', 'shared_undarray']
+
+
+class SharedHandle(object):
+    """ Describes an undarray residing in the block of shared memory
+    named :attr:`name`.  The handle returned by
+    :meth:`undarray.to_shared` *owns* the block: the block is removed
+    when the owning handle is unlinked, see :meth:`unlink`, or deleted.
+    Undarrays attached to the block remain valid after the block has
+    been removed, but no further undarrays can be attached.
+
+    Copies of the handle obtained by pickling do not own the block.
+    """
+
+    def __init__(self, name, descriptions, memory=None):
+        """ *descriptions* maps ``'nominal'``, ``'names'`` and
+        ``'derivatives'`` to the ``(dtype, shape, offset)`` of the
+        respective array in the block.  The owning handle is given the
+        ``SharedMemory`` instance *memory*. """
+
+        self.name = name
+        self.descriptions = descriptions
+        self.memory = memory
+        if memory is not None:
+            self.finalizer = weakref.finalize(self, unlink, memory)
+
+    def __getstate__(self):
+        return {'name': self.name, 'descriptions': self.descriptions,
+                'memory': None}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.unlink()
+
+    def unlink(self):
+        """ Removes the block, if owned by *self*. """
+
+        if self.memory is not None:
+            self.finalizer()
+            self.memory = None
+
+    def attach(self):
+        """ Returns the undarray in the block, see
+        :func:`shared_undarray`. """
+
+        return shared_undarray(self)
+
+    def __repr__(self):
+        (dtype, shape, offset) = self.descriptions['nominal']
+        return "<SharedHandle {name} of a {shape}-shaped {dtype}-typed " \
+                "undarray>".format(name=self.name, shape=tuple(shape),
+                dtype=numpy.dtype(dtype))
+
+
+class Block(multiprocessing.shared_memory.SharedMemory):
+    """ A block of shared memory, which can be closed while ndarrays
+    still use its buffer. """
+
+    def close(self):
+        """ Closes the block.  When ndarrays still use its buffer, they
+        keep the buffer mapped until they are deleted. """
+
+        try:
+            multiprocessing.shared_memory.SharedMemory.close(self)
+        except BufferError:
+            if os.name == 'posix' and self._fd >= 0:
+                os.close(self._fd)
+                self._fd = -1
+
+
+def unlink(memory):
+    memory.unlink()
+    memory.close()
+
+
+def share(ua):
+    """ Copies the undarray *ua* into a new block of shared memory and
+    returns the owning :class:`SharedHandle`.  See
+    :meth:`undarray.to_shared`. """
+
+    arrays = {'nominal': ua.nominal, 'names': ua.stack.names,
+            'derivatives': ua.stack.derivatives}
+    descriptions = {}
+    offset = 0
+    for key in upy2.storage.ARRAYS:
+        array = arrays[key]
+        if array.dtype.hasobject:
+            raise ValueError(
+                    'Cannot share {0} of dtype {1}'.format(key, array.dtype))
+        offset = upy2.storage.aligned(offset)
+        descriptions[key] = (array.dtype.str, list(array.shape), offset)
+        offset += array.nbytes
+
+    memory = Block(create=True, size=max(offset, 1))
+    handle = SharedHandle(memory.name, descriptions, memory)
+    block = numpy.frombuffer(memory.buf, dtype=numpy.uint8)
+    for (key, target) in view(block, descriptions).items():
+        target[...] = arrays[key]
+    del block, target
+    return handle
+
+
+def view(block, descriptions):
+    """ Returns the arrays described by *descriptions* as views into the
+    uint8 ndarray *block*. """
+
+    arrays = {}
+    for (key, (dtype, shape, offset)) in descriptions.items():
+        dtype = numpy.dtype(dtype)
+        count = int(numpy.prod(shape, dtype=int))
+        arrays[key] = block[offset:offset + count * dtype.itemsize]\
+                .view(dtype).reshape(shape)
+    return arrays
+
+
+def shared_undarray(handle):
+    """ Returns the undarray in the block of shared memory described by
+    the :class:`SharedHandle` *handle*, without copying.  The undarray
+    shares its nominal value and its Dependencies with all other
+    undarrays attached to the block; modifications in-place apply to
+    all of them.  Operations producing new undarrays do not modify the
+    block.
+
+    The block is kept mapped as long as the undarray, or any view of
+    its arrays, is alive. """
+
+    if handle.memory is not None:
+        memory = handle.memory
+    else:
+        try:
+            memory = Block(handle.name, track=False)
+        except TypeError:
+            # Before Python 3.13, attaching registers the block with the
+            # resource tracker, which removes the block when it exits.
+            # Processes started by multiprocessing share the tracker of
+            # the process creating the block.
+            memory = Block(handle.name)
+
+    # The ndarrays keep the buffer mapped:
+    block = numpy.frombuffer(memory.buf, dtype=numpy.uint8)
+    if handle.memory is None:
+        memory.close()
+    arrays = view(block, handle.descriptions)
+
+    result = upy2.core.undarray(nominal=arrays['nominal'])
+    result.stack = upy2.dependency.DependencyStack(result.shape,
+            names=arrays['names'], derivatives=arrays['derivatives'])
+    return result
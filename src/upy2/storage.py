@@ -0,0 +1,271 @@
+# Developed since: Oct 2026
+
+""" Implements the native file format of undarrays, :func:`save` and
+:func:`load`, and archives of several undarrays, :func:`savez` and
+:func:`loadz`.
+
+A file starts with the magic string ``b'\\x93UPY2'``, followed by the
+major and minor version of the format as one byte each, the length of
+the header as little-endian 4-byte unsigned integer, and the header.
+The header is a JSON object describing the *arrays* stored, which are
+the nominal value and the stacked names and derivatives of the
+undarray.  Each array is given by its dtype descriptor, its shape and
+the offset of its raw C-ordered data in the file.  The offsets are
+multiples of :data:`ALIGNMENT`, such that the arrays can be mapped
+into memory without copying.
+
+Archives are zip files holding ``.npy`` members and a JSON member
+``header.json``, which maps the keys of the undarrays to the members
+holding their nominal values, names and derivatives.  Identical names
+arrays are stored only once. """
+
+import json
+import hashlib
+import zipfile
+import numpy
+import upy2
+import upy2.core
+import upy2.dependency
+
+__all__ = ['save', 'load', 'savez', 'loadz']
+
+MAGIC = b'\x93UPY2'
+VERSION = (1, 0)
+ALIGNMENT = 64
+ARRAYS = ('nominal', 'names', 'derivatives')
+
+
+def aligned(offset):
+    """ Returns the first multiple of :data:`ALIGNMENT` not smaller
+    than *offset*. """
+
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save(path, ua):
+    """ Saves the undarray *ua* to the file *path*, see :mod:`this
+    module <upy2.storage>`.  Only the layers in use are stored, with
+    the dtypes of the stack of *ua*. """
+
+    ua = upy2.core.asuarray(ua)
+    arrays = {'nominal': ua.nominal, 'names': ua.stack.names,
+            'derivatives': ua.stack.derivatives}
+    for (key, array) in arrays.items():
+        if array.dtype.hasobject:
+            raise ValueError(
+                    'Cannot save {0} of dtype {1}'.format(key, array.dtype))
+
+    # The offsets depend on the length of the header, which depends on
+    # the offsets:
+    prefix = len(MAGIC) + 2 + 4
+    start = prefix
+    while True:
+        descriptions = {}
+        offset = start
+        for key in ARRAYS:
+            offset = aligned(offset)
+            descriptions[key] = {
+                    'descr': numpy.lib.format.dtype_to_descr(
+                        arrays[key].dtype),
+                    'shape': list(arrays[key].shape),
+                    'offset': offset}
+            offset += arrays[key].nbytes
+        header = json.dumps({'arrays': descriptions}).encode('ascii')
+        if aligned(prefix + len(header)) <= start:
+            break
+        start = aligned(prefix + len(header))
+    header += b' ' * (start - prefix - len(header))
+
+    with open(path, 'wb') as stream:
+        stream.write(MAGIC + bytes(VERSION))
+        stream.write(len(header).to_bytes(4, 'little'))
+        stream.write(header)
+        for key in ARRAYS:
+            stream.seek(descriptions[key]['offset'])
+            numpy.ascontiguousarray(arrays[key]).tofile(stream)
+
+
+def read_header(stream):
+    """ Reads the header from the file object *stream* and returns the
+    descriptions of the arrays. """
+
+    prefix = stream.read(len(MAGIC) + 2 + 4)
+    if len(prefix) < len(MAGIC) + 2 + 4 or \
+            not prefix.startswith(MAGIC):
+        raise ValueError('Not an undarray file')
+    if prefix[len(MAGIC)] != VERSION[0]:
+        raise ValueError(
+                'Unsupported undarray file format version {0}.{1}'.format(
+                    prefix[len(MAGIC)], prefix[len(MAGIC) + 1]))
+    length = int.from_bytes(prefix[-4:], 'little')
+    return json.loads(stream.read(length).decode('ascii'))['arrays']
+
+
+def load(path, mmap_mode='r'):
+    """ Loads the undarray stored in the file *path* by :func:`save`.
+
+    With *mmap_mode* ``'r'``, ``'r+'`` or ``'c'``, the nominal value
+    and the Dependencies are mapped from the file without copying,
+    with the meaning of the modes as for ``numpy.memmap``.  With
+    *mmap_mode* ``None``, they are read into memory.  The dtypes of
+    the stack are retained as saved. """
+
+    if mmap_mode not in ('r', 'r+', 'c', None):
+        raise ValueError('Invalid mmap_mode {0!r}'.format(mmap_mode))
+
+    with open(path, 'rb') as stream:
+        descriptions = read_header(stream)
+        arrays = {}
+        for key in ARRAYS:
+            description = descriptions[key]
+            dtype = numpy.lib.format.descr_to_dtype(description['descr'])
+            shape = tuple(description['shape'])
+            count = int(numpy.prod(shape, dtype=int))
+            if count == 0:
+                # Empty arrays are not mapped; their offset might
+                # lie beyond the end of the file.
+                arrays[key] = numpy.zeros(shape, dtype=dtype)
+            elif mmap_mode is None:
+                stream.seek(description['offset'])
+                arrays[key] = numpy.fromfile(stream, dtype=dtype,
+                        count=count).reshape(shape)
+            else:
+                arrays[key] = numpy.memmap(path, dtype=dtype,
+                        mode=mmap_mode, offset=description['offset'],
+                        shape=shape)
+
+    ua = upy2.core.undarray(nominal=arrays['nominal'])
+    ua.stack = upy2.dependency.DependencyStack(ua.shape,
+            names=arrays['names'], derivatives=arrays['derivatives'])
+    return ua
+
+
+def savez(path, *args, **kwds):
+    """ Saves the undarrays given as positional arguments *args* and
+    as keyword arguments *kwds* to the archive *path*, see :mod:`this
+    module <upy2.storage>`.  Positional arguments are stored under the
+    keys ``'arr_0'``, ``'arr_1'``, ..., as by ``numpy.savez``.
+
+    The undarrays are stored with their names, such that correlations
+    between them are retained by :func:`loadz`.  Identical names
+    arrays, as common for undarrays derived elementwise from the same
+    sources, are stored once.  Unless *compress* is false, the
+    members are deflated, which shrinks the sparse layers, i.e. layers
+    of mostly absent Dependencies, considerably. """
+
+    compress = kwds.pop('compress', True)
+    undarrays = dict(('arr_{0}'.format(index), ua)
+            for (index, ua) in enumerate(args))
+    for key in kwds:
+        if key in undarrays:
+            raise ValueError(
+                    'Cannot use positional argument key {0} as keyword '
+                    'argument'.format(key))
+    undarrays.update(kwds)
+
+    mode = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    members = {}
+    digests = {}
+    with zipfile.ZipFile(path, 'w', compression=mode,
+            allowZip64=True) as archive:
+
+        def write(member, array):
+            with archive.open(member, 'w', force_zip64=True) as stream:
+                numpy.lib.format.write_array(stream, array,
+                        allow_pickle=False)
+
+        for (key, ua) in undarrays.items():
+            ua = upy2.core.asuarray(ua)
+            names = ua.stack.names
+            digest = hashlib.sha1(names.tobytes())
+            digest.update(repr((names.dtype.str, names.shape)).encode())
+            candidates = digests.setdefault(digest.hexdigest(), [])
+            for (member, array) in candidates:
+                if numpy.array_equal(array, names):
+                    names_member = member
+                    break
+            else:
+                names_member = 'names_{0}.npy'.format(len(members))
+                write(names_member, names)
+                candidates.append((names_member, names))
+
+            members[key] = {
+                    'nominal': '{0}.nominal.npy'.format(key),
+                    'names': names_member,
+                    'derivatives': '{0}.derivatives.npy'.format(key)}
+            write(members[key]['nominal'], ua.nominal)
+            write(members[key]['derivatives'], ua.stack.derivatives)
+
+        archive.writestr('header.json', json.dumps(
+            {'version': list(VERSION), 'undarrays': members}))
+
+
+def loadz(path, remap=True):
+    """ Loads the undarrays stored in the archive *path* by
+    :func:`savez`.  Returns a dictionary mapping their keys to the
+    undarrays, in the order saved.
+
+    With *remap*, the names stored are replaced by new names obtained
+    from ``upy2.guid_generator``, such that they do not collide with
+    the names of the undarrays in use.  All undarrays of the archive
+    are remapped consistently, so correlations between them are
+    retained.  Without *remap*, the names are used as stored; this is
+    only safe within the process which saved them. """
+
+    with zipfile.ZipFile(path, 'r') as archive:
+        header = json.loads(archive.read('header.json').decode('ascii'))
+        if header['version'][0] != VERSION[0]:
+            raise ValueError(
+                    'Unsupported undarray archive format version '
+                    '{0}.{1}'.format(*header['version']))
+
+        arrays = {}
+
+        def read(member):
+            if member not in arrays:
+                with archive.open(member) as stream:
+                    arrays[member] = numpy.lib.format.read_array(stream,
+                            allow_pickle=False)
+            return arrays[member]
+
+        members = header['undarrays']
+        loaded = dict((key, (read(description['nominal']),
+                read(description['names']),
+                read(description['derivatives'])))
+                for (key, description) in members.items())
+
+    if remap:
+        # Each name in use is mapped to a new name drawn from a single
+        # contiguous range:
+        sources = numpy.unique(numpy.concatenate([names.ravel()
+            for (nominal, names, derivatives) in loaded.values()] +
+            [numpy.zeros(1, dtype=int)]))
+        sources = sources[sources != 0]
+        start = upy2.guid_generator.reserve(len(sources))
+        remapped = {}
+        for (key, (nominal, names, derivatives)) in loaded.items():
+            member = members[key]['names']
+            if member not in remapped:
+                targets = numpy.where(names == 0, 0,
+                        start + numpy.searchsorted(sources, names))
+                try:
+                    upy2.dependency.check_names(targets, names.dtype)
+                except ValueError:
+                    remapped[member] = targets
+                else:
+                    remapped[member] = targets.astype(names.dtype)
+            loaded[key] = (nominal, remapped[member], derivatives)
+
+    result = {}
+    used = set()
+    for (key, (nominal, names, derivatives)) in loaded.items():
+        # Undarrays sharing names in the archive do not share them in
+        # memory, since their stacks might be modified in-place:
+        if members[key]['names'] in used:
+            names = names.copy()
+        used.add(members[key]['names'])
+        ua = upy2.core.undarray(nominal=nominal)
+        ua.stack = upy2.dependency.DependencyStack(ua.shape,
+                names=names, derivatives=derivatives)
+        result[key] = ua
+    return result
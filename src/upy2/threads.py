@@ -0,0 +1,96 @@
+# Developed since: Oct 2026
+
+""" Implements the distribution of work on Dependency layers over the
+threads of a thread pool.  Most of the work on the layers of a
+:class:`~upy2.dependency.DependencyStack` consists of large numpy
+operations which release the GIL.  Within a :class:`Threads` Session
+manager, such operations are split into tasks on disjoint ranges of
+layers or elements, which are carried out concurrently. """
+
+import os
+import concurrent.futures
+import upy2.sessions
+
+__all__ = ['Threads']
+
+
+class Threads(upy2.sessions.Protocol):
+    def __init__(self, workers=None, grain=65536):
+        """ "Threads" Session managers carry out the work on
+        Dependency layers in a pool of *workers* threads, by default
+        one per CPU.  The work is split into at most *workers* tasks
+        with at least *grain* entries each; smaller work is carried out
+        by the calling thread.
+
+        The thread pool is started on first use and shut down when the
+        Session manager is left, or by :meth:`shutdown`.  Without a
+        Threads Session manager in effect, all work is carried out by
+        the calling thread. """
+
+        upy2.sessions.Protocol.__init__(self)
+
+        self.workers = workers or os.cpu_count()
+        self.grain = grain
+        self.executor = None
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        upy2.sessions.Protocol.__exit__(self, exc_type, exc_value, exc_tb)
+        self.shutdown()
+
+    def shutdown(self):
+        """ Shuts the thread pool down.  It will be restarted when
+        needed. """
+
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def split(self, length, size=1):
+        """ Returns the slices splitting ``range(length)`` into tasks,
+        where each index stands for *size* entries. """
+
+        count = min(self.workers, length * size // max(self.grain, 1))
+        if count < 2:
+            return [slice(0, length)]
+        return [slice(length * index // count,
+                      length * (index + 1) // count)
+                for index in range(count)]
+
+    def map(self, function, keys):
+        """ Returns the list of the results of *function* applied to
+        each of *keys*, computed concurrently. """
+
+        if len(keys) < 2:
+            return [function(key) for key in keys]
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                    self.workers)
+        return list(self.executor.map(function, keys))
+
+upy2.sessions.define(Threads)
+
+threads_session = upy2.sessions.byprotocol(Threads)
+
+
+def split(length, size=1):
+    """ Returns the slices splitting ``range(length)`` into the tasks
+    of the current :class:`Threads` Session manager, where each index
+    stands for *size* entries.  Without a Threads Session manager,
+    ``range(length)`` is not split. """
+
+    try:
+        threads = threads_session.current()
+    except LookupError:
+        return [slice(0, length)]
+    return threads.split(length, size)
+
+
+def run(function, keys):
+    """ Returns the list of the results of *function* applied to each
+    of *keys*, as obtained from :func:`split`.  Several keys are
+    processed concurrently by the current :class:`Threads` Session
+    manager. """
+
+    if len(keys) < 2:
+        return [function(key) for key in keys]
+    return threads_session.current().map(function, keys)
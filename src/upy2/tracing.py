@@ -0,0 +1,244 @@
+# Developed since: Oct 2026
+
+""" Implements propagation plans, which are traced once and evaluated
+for many batches of input data.  See :func:`compile`. """
+
+import numpy
+import upy2.core
+import upy2.lazy
+
+__all__ = ['compile', 'Plan']
+
+
+def compile(fn):
+    """ Returns a :class:`Plan` evaluating the function *fn*.  *fn*
+    must compute its results from its arguments by uufuncs only, e.g.::
+
+        calibrate = upy2.compile(lambda x: (a * x + b) / ulog(c))
+        for batch in batches:
+            result = calibrate(batch)
+
+    The sequence of uufuncs applied is recorded when the plan is called
+    the first time. """
+
+    return Plan(fn)
+
+
+class Plan(object):
+    """ A propagation plan for a function of undarrays.
+
+    Upon the first call, the function is *traced*: it is called in a
+    :class:`~upy2.lazy.Lazy` Session, and the uufuncs applied are
+    recorded as a sequence of *steps*.  All calls, including the first,
+    then replay the steps on the arguments given.  The replay skips the
+    dispatch in :meth:`undarray.__array_ufunc__`; it fuses the
+    uncertainty propagation like :class:`~upy2.lazy.Lazy` does, and it
+    writes the nominal values of intermediate results into work
+    buffers, which are retained from batch to batch as long as the
+    shapes and dtypes of the operands stay the same.
+
+    Objects the function uses besides its arguments, e.g. calibration
+    constants, are *fixed* at tracing time.  While tracing, the
+    arguments, undarrays as well as plain data, are represented by
+    :class:`placeholder` instances, which carry no data.  Operations on
+    the arguments other than uufuncs, like indexing, cannot be traced
+    and raise a ValueError.
+
+    Plans retain work buffers and are hence not thread-safe. """
+
+    def __init__(self, fn):
+        """ *fn* is the function to evaluate. """
+
+        self.fn = fn
+        self.nargs = None
+        self.steps = None
+        self.outputs = None
+        self.consumers = None
+        self.buffers = None
+        self.sequence = None
+
+    #
+    # Tracing ...
+    #
+
+    def trace(self, *args):
+        """ Records the steps of the function when called with
+        *args*.  Only the number of the arguments is used. """
+
+        arguments = [placeholder(index) for index in range(len(args))]
+        with upy2.lazy.Lazy():
+            results = self.fn(*arguments)
+
+        if isinstance(results, tuple):
+            (outputs, sequence) = (results, True)
+        else:
+            (outputs, sequence) = ((results,), False)
+
+        indices = dict((id(arg), index)
+                for (index, arg) in enumerate(arguments))
+
+        nodes = []
+        steps = {}
+        for output in outputs:
+            if isinstance(output, upy2.lazy.lazyundarray) and \
+                    output.result is None and id(output) not in indices:
+                for node in output.graph():
+                    if id(node) not in steps:
+                        steps[id(node)] = len(nodes)
+                        nodes.append(node)
+
+        def reference(operand):
+            if id(operand) in indices:
+                return ('argument', indices[id(operand)])
+            if id(operand) in steps:
+                return ('step', steps[id(operand)])
+            if isinstance(operand, placeholder):
+                # E.g. a copy of an argument.
+                untraceable()
+            if isinstance(operand, upy2.core.undarray):
+                # Undarrays derived from the arguments by operations
+                # other than uufuncs cannot be obtained without
+                # accessing the data of the placeholders; the others
+                # are fixed:
+                if isinstance(operand, upy2.lazy.lazyundarray):
+                    operand = operand.evaluate()
+                return ('leaf', operand)
+            return ('constant', numpy.asarray(operand))
+
+        self.nargs = len(arguments)
+        self.steps = [(node.uufunc,
+                [reference(operand) for operand in node.operands])
+                for node in nodes]
+        self.outputs = [reference(output) for output in outputs]
+        self.sequence = sequence
+
+        self.consumers = [0] * len(self.steps)
+        for (uufunc, references) in self.steps:
+            for (kind, value) in references:
+                if kind == 'step':
+                    self.consumers[value] += 1
+        self.buffers = [None] * len(self.steps)
+        for (kind, value) in self.outputs:
+            if kind == 'step':
+                # The nominal values of results must not be recycled:
+                self.consumers[value] += 1
+                self.buffers[value] = False
+
+    #
+    # Evaluation ...
+    #
+
+    def __call__(self, *args):
+        """ Evaluates the plan for arguments *args*.  Traces the
+        function if it has not been traced before. """
+
+        if self.steps is None:
+            self.trace(*args)
+        if len(args) != self.nargs:
+            raise ValueError(
+                    'The Plan takes {0} arguments ({1} given)'.format(
+                        self.nargs, len(args)))
+
+        data = [None] * len(self.steps)
+        remaining = list(self.consumers)
+
+        def resolve(reference):
+            (kind, value) = reference
+            if kind == 'step':
+                operand = data[value]
+                remaining[value] -= 1
+                if remaining[value] == 0:
+                    data[value] = None
+                return operand
+            if kind == 'argument':
+                value = args[value]
+                if not isinstance(value, upy2.core.undarray):
+                    return (numpy.asarray(value), None)
+            if kind == 'constant':
+                return (value, None)
+            return (value.nominal, {id(value): (value, 1)})
+
+        for (index, (uufunc, references)) in enumerate(self.steps):
+            operands = [resolve(reference) for reference in references]
+            buffer = self.buffers[index]
+            if buffer is False:
+                data[index] = upy2.lazy.fuse(uufunc, operands)
+                continue
+
+            signature = self.signature(operands)
+            if buffer is not None and buffer[0] == signature:
+                data[index] = upy2.lazy.fuse(uufunc, operands,
+                        out=buffer[1])
+            else:
+                data[index] = upy2.lazy.fuse(uufunc, operands)
+                # The nominal value computed is used only by the steps
+                # consuming it, and can hence be recycled:
+                nominal = data[index][0]
+                if isinstance(nominal, numpy.ndarray):
+                    self.buffers[index] = (signature, nominal)
+
+        results = []
+        for (kind, value) in self.outputs:
+            if kind == 'step':
+                (nominal, terms) = data[value]
+                results.append(upy2.lazy.materialize(nominal, terms))
+            elif kind == 'argument':
+                results.append(args[value])
+            else:
+                results.append(value)
+
+        if self.sequence:
+            return tuple(results)
+        return results[0]
+
+    def signature(self, operands):
+        """ Returns the shapes and dtypes of the nominal values of
+        *operands*, which determine the shape and dtype of the result
+        of a step. """
+
+        return tuple((numpy.shape(nominal), numpy.result_type(nominal))
+                for (nominal, terms) in operands)
+
+
+def untraceable():
+    raise ValueError(
+            'Cannot trace operations other than uufuncs on the '
+            'arguments of a Plan')
+
+
+class placeholder(upy2.core.undarray):
+    """ Stands for the argument *index* of a :class:`Plan` while
+    tracing.  uufuncs record their application to placeholders in the
+    :class:`~upy2.lazy.Lazy` Session of the tracing; all other
+    operations access the data of the placeholder, which raises a
+    ValueError. """
+
+    def __init__(self, index):
+        self.index = index
+
+    @property
+    def nominal(self):
+        untraceable()
+
+    @property
+    def shape(self):
+        untraceable()
+
+    @property
+    def dtype(self):
+        untraceable()
+
+    @property
+    def ndim(self):
+        untraceable()
+
+    @property
+    def stack(self):
+        untraceable()
+
+    @stack.setter
+    def stack(self, stack):
+        untraceable()
+
+    def __repr__(self):
+        return "<placeholder of argument {0}>".format(self.index)
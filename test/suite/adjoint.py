@@ -0,0 +1,65 @@
+# Developed since: Oct 2026
+
+import unittest
+import numpy
+import upy2
+from upy2 import undarray, Reverse, adjointundarray
+
+
+class Test_Reverse(unittest.TestCase):
+
+    def assertClose(self, a, b):
+        if not numpy.allclose(a, b):
+            raise AssertionError('{} not close to {}'.format(a, b))
+
+    def assertEquivalent(self, ua, ub):
+        self.assertEqual(ua.shape, ub.shape)
+        self.assertClose(ua.nominal, ub.nominal)
+        self.assertClose(ua.variance, ub.variance)
+        self.assertClose((ua - ub).stddev, 0)
+
+    def setUp(self):
+        rng = numpy.random.default_rng(1201)
+        self.ua = undarray(nominal=2.0, stddev=0.1)
+        self.ub = undarray(nominal=1.0, stddev=0.2)
+        self.uc = undarray(nominal=rng.random(4) + 2,
+                stddev=0.1 * rng.random(4))
+        self.ux = undarray(nominal=rng.random((3, 4)),
+                stddev=rng.random((3, 4)))
+
+    def formula(self, ux):
+        return (self.ua * ux + self.ub) / upy2.ulog(self.uc) - ux * ux
+
+    def test_recording(self):
+        with Reverse():
+            uy = self.formula(self.ux)
+        self.assertIsInstance(uy, adjointundarray)
+        self.assertIsNone(uy.result)
+        self.assertClose(uy.nominal, self.formula(self.ux).nominal)
+        self.assertIsNone(uy.result)
+            # The nominal value is available without back-propagation.
+        uy.variance
+        self.assertIsNotNone(uy.result)
+
+    def test_equivalence(self):
+        eager = self.formula(self.ux)
+        with Reverse(blocksize=5):
+            uy = self.formula(self.ux)
+            usum = uy.sum()
+            umean = uy.mean(axis=0)
+            uitem = uy[1, ::2]
+            uabs = abs(uy - 1)
+
+        self.assertEquivalent(uy, eager)
+        self.assertEquivalent(usum, eager.sum())
+        self.assertEquivalent(umean, eager.mean(axis=0))
+        self.assertEquivalent(uitem, eager[1, ::2])
+        self.assertEquivalent(uabs, abs(eager - 1))
+
+    def test_shared_subexpression(self):
+        with Reverse():
+            uy = self.ux * self.ua
+            uz = (uy * uy + uy).sum(axis=1)
+        eager = ((self.ux * self.ua) * (self.ux * self.ua) +
+                self.ux * self.ua).sum(axis=1)
+        self.assertEquivalent(uz, eager)
@@ -1,5 +1,6 @@
 # Developed since: Jun 2020
 
+import pickle
 import threading
 import operator
 import unittest
@@ -297,6 +298,15 @@ class Test_undarray(unittest.TestCase):
         self.assertAllEqual(uc.nominal, [50.0, 50.5])
         self.assertAllEqual(uc.stddev, [0.5, 1.0])
 
+        # Scaling with broadcasting:
+        ua = undarray(nominal=[1.0, 2.0], stddev=[0.1, 0.2])
+        ub = ua.scaled([[1], [10]])
+        self.assertEqual(ub.shape, (2, 2))
+        self.assertEqual(ub.stack.shape, (2, 2))
+        self.assertClose(ub.stddev, [[0.1, 0.2], [1.0, 2.0]])
+        self.assertAllEqual(ub.dependencies[0].names[0],
+                ub.dependencies[0].names[1])
+
     def test_copy_dependencies(self):
         utarget = undarray(shape=(2, 2))
         usource1 = undarray(shape=(2, 2), stddev=[[0.1, 0.2], [0.3, 0.4]])
@@ -355,6 +365,187 @@ class Test_undarray(unittest.TestCase):
                 r"doesn't match the broadcast shape \(2,2\)$"):
             utarget.copy_dependencies(usource)
 
+    def test_correlated_operands(self):
+        ua = undarray(nominal=[1.0, 2.0], stddev=[0.1, 0.2])
+        ub = undarray(nominal=[3.0, 4.0], stddev=[0.3, 0.4])
+
+        uc = ua + ub
+        ud = uc - ua
+            # The dependency on *ua* cancels out.
+        self.assertClose(ud.stddev, [0.3, 0.4])
+        self.assertEqual(len(ud.dependencies), 2)
+            # A name with zero derivative is retained.
+
+        ue = ua * ua
+        self.assertEqual(len(ue.dependencies), 1)
+        self.assertClose(ue.stddev, 2 * ua.nominal * ua.stddev)
+
+    def test_uufunc_protocol(self):
+        calls = []
+
+        class Hypot(upy2.core.Binary):
+            def __init__(self):
+                upy2.core.Binary.__init__(self, numpy.hypot)
+
+            def _derivative1(self, y1, y2, yout):
+                calls.append('derivative1')
+                return y1 / yout
+
+            def _derivative2(self, y1, y2, yout):
+                calls.append('derivative2')
+                return y2 / yout
+
+            def _derivatives(self, y1, y2, yout):
+                calls.append('derivatives')
+                reciprocal = 1.0 / yout
+                return (y1 * reciprocal, y2 * reciprocal)
+
+        uhypot = Hypot()
+        ua = undarray(nominal=[3.0, 5.0], stddev=[0.3, 0.5])
+        ub = undarray(nominal=[4.0, 12.0], stddev=[0.4, 1.2])
+
+        uc = uhypot(ua, ub)
+        self.assertEqual(calls, ['derivatives'])
+        self.assertClose(uc.nominal, [5.0, 13.0])
+        self.assertClose(uc.stddev, numpy.sqrt(
+                (ua.nominal * ua.stddev) ** 2 +
+                (ub.nominal * ub.stddev) ** 2) / uc.nominal)
+
+        uhypot(ua, ub.nominal)
+        uhypot(ua.nominal, ub)
+        self.assertEqual(calls,
+                ['derivatives', 'derivative1', 'derivative2'])
+
+    def test_compact(self):
+        ua = undarray(shape=(3,))
+        for index in range(3):
+            dependency = Dependency(shape=(3,))
+            dependency.names[index] = index + 1
+            dependency.derivatives[index] = 0.1 * (index + 1)
+            ua.append(dependency)
+        self.assertEqual(len(ua.dependencies), 3)
+
+        ub = ua.copy()
+        ub.compact()
+        self.assertEqual(len(ub.dependencies), 1)
+        self.assertAllEqual(ub.dependencies[0].names, [1, 2, 3])
+        self.assertClose(ub.stddev, [0.1, 0.2, 0.3])
+
+        # Automatic compaction:
+        uc = ua.copy()
+        with upy2.Compaction(threshold=0.3):
+            uc[0] = undarray(nominal=1.0, stddev=0.5)
+                # The fill factor is one third.
+            self.assertEqual(len(uc.dependencies), 3)
+        with upy2.Compaction(threshold=0.5):
+            uc[1] = undarray(nominal=2.0, stddev=0.5)
+            self.assertEqual(len(uc.dependencies), 1)
+        self.assertClose(uc.stddev, [0.5, 0.5, 0.3])
+
+    def test_sample(self):
+        ux = undarray(nominal=[1.0, 2.0], stddev=[0.1, 0.2])
+        ua = ux * ux[::-1] + ux
+        samples = ua.sample(100000, rng=2401)
+        self.assertEqual(samples.shape, (100000, 2))
+        self.assertTrue(numpy.allclose(samples.mean(axis=0), ua.nominal,
+            rtol=0, atol=0.01))
+        self.assertTrue(numpy.allclose(numpy.cov(samples.T),
+            upy2.ucovariance(ua), rtol=0.03))
+
+        # Chunking does not alter the realisations:
+        out = numpy.zeros((50, 2))
+        self.assertIs(ua.sample(50, rng=2402, out=out, chunksize=8), out)
+        self.assertAllEqual(out, ua.sample(50, rng=2402))
+
+        self.assertAllEqual(undarray(nominal=[3.0]).sample(2), [[3.0]] * 2)
+
+        # Integer undarrays are sampled in floating point:
+        ub = undarray(nominal=numpy.array([1, 2]),
+                stddev=numpy.array([1, 2]))
+        samples = ub.sample(100000, rng=2403)
+        self.assertEqual(samples.dtype.kind, 'f')
+        self.assertTrue(numpy.allclose(samples.mean(axis=0), [1, 2],
+            rtol=0, atol=0.03))
+        self.assertTrue(numpy.allclose(samples.std(axis=0), ub.stddev,
+            rtol=0.02))
+        with self.assertRaises(ValueError):
+            undarray(nominal=[1j], stddev=[1.0], dtype=complex).sample(1)
+
+    def test_pickle(self):
+        ua = undarray(nominal=[[1.0, 2.0], [3.0, 4.0]],
+                stddev=[[0.1, 0.2], [0.3, 0.4]])
+        ua.stack.reserve(8)
+        ub = ua * 2 + 1
+        uc = ua[::-1]
+        with upy2.Lazy():
+            ud = ua + ub
+
+        buffers = []
+        data = pickle.dumps([ua, ub, uc, ud], protocol=5,
+                buffer_callback=buffers.append)
+        # The names of *ua*, *ub* and *ud* are identical and stored
+        # once; the reversed *uc* is made contiguous:
+        self.assertEqual(len(buffers), 10)
+        for buffer in buffers:
+            self.assertLessEqual(buffer.raw().nbytes, 4 * 8)
+
+        loaded = pickle.loads(data, buffers=buffers)
+        for (result, reference) in zip(loaded, [ua, ub, uc, ud]):
+            self.assertIs(type(result), undarray)
+            self.assertAllEqual(result.nominal, reference.nominal)
+            self.assertAllEqual(result.stack.names, reference.stack.names)
+            self.assertEqual(result.stack.capacity, len(reference.stack))
+        self.assertFalse(numpy.shares_memory(loaded[0].stack.names,
+            loaded[1].stack.names))
+        self.assertClose((loaded[1] - 2 * loaded[0]).stddev, 0)
+
+        # Without protocol 5, the buffers are pickled in-band:
+        loaded = pickle.loads(pickle.dumps(ub, protocol=2))
+        self.assertClose(loaded.stddev, ub.stddev)
+
+    def test_precision(self):
+        nominal = numpy.asarray([1.0, 2.0, 4.0])
+        ua = undarray(nominal=nominal, stddev=[0.1, 0.2, 0.3])
+        with upy2.Precision():
+            ub = undarray(nominal=nominal, stddev=[0.1, 0.2, 0.3])
+            uc = undarray(nominal=[1 + 1j], stddev=[1.0], dtype=complex)
+            ui = undarray(nominal=[1, 2], stddev=[1, 2])
+            uh = undarray(nominal=[1, 2], dtype=numpy.float16)
+
+        self.assertEqual(ub.dtype, numpy.float64)
+        self.assertEqual(ub.stack.dtype, numpy.float32)
+        self.assertEqual(ub.stack.names.dtype, numpy.int32)
+        self.assertEqual(uc.stack.dtype, numpy.complex64)
+        self.assertEqual(ui.stack.dtype, ui.dtype)
+        self.assertEqual(uh.stack.dtype, numpy.float16)
+
+        # The nominal value retains its precision, the derivatives
+        # retain theirs:
+        with upy2.Precision():
+            expected = (ua * 1.5 + ua ** 2).sum()
+            result = (ub * 1.5 + ub ** 2).sum()
+        self.assertEqual(result.dtype, numpy.float64)
+        self.assertEqual(result.stack.dtype, numpy.float32)
+        self.assertEqual(result.variance.dtype, numpy.float64)
+        self.assertEqual(result.nominal, expected.nominal)
+        self.assertTrue(numpy.allclose(result.stddev, expected.stddev,
+            rtol=1e-6, atol=0))
+
+        # Without a Precision Session, the Dependencies are stored with
+        # the dtype of the nominal value:
+        ud = ub * 2 + ua
+        self.assertEqual(ud.stack.dtype, numpy.float64)
+        self.assertEqual(ud.stack.names.dtype, int)
+        self.assertTrue(numpy.allclose(ud.variance,
+            5 * numpy.asarray([0.1, 0.2, 0.3]) ** 2))
+
+        with upy2.Precision(names_dtype=numpy.int8):
+            ue = undarray(nominal=[1.0, 2.0])
+        with self.assertRaisesRegex(ValueError,
+                r'^Cannot store Dependency names up to 300 with dtype '
+                r'int8$'):
+            ue.append(Dependency(names=[300, 1], derivatives=[1.0, 1.0]))
+
     def test_complex(self):
         ua = undarray(
                 nominal=[1 + 2j, 2 + 3j],
@@ -451,7 +642,9 @@ class Test_undarray(unittest.TestCase):
         self.assertIsundarray(c ** ua)
 
         ub = ua; ub += b; self.assertIsundarray(ub)
-        self.assertAllEqual(ua.nominal, [10, 11.5])
+        self.assertIs(ub, ua)
+        self.assertAllEqual(ua.nominal, [11, 13.5])
+            # Augmented arithmetics operate in place.
         ub = ua; ub += c; self.assertIsundarray(ub)
         ub = ua; ub += ux; self.assertIsundarray(ub)
 
@@ -476,6 +669,170 @@ class Test_undarray(unittest.TestCase):
         ub = ua; ub **= c; self.assertIsundarray(ub)
         ub = ua; ub **= ux; self.assertIsundarray(ub)
 
+    def test_augmented_arithmetics(self):
+        ua = undarray(nominal=[1.0, 2.0], stddev=[0.1, 0.2])
+        ub = undarray(nominal=[3.0, 4.0], stddev=[0.3, 0.4])
+
+        uc = ua.copy()
+        nominal = uc.nominal
+        uc += ub
+        uc -= ua
+        self.assertIs(uc.nominal, nominal)
+        self.assertClose(uc.nominal, ub.nominal)
+        self.assertClose(uc.stddev, ub.stddev)
+            # The dependency on *ua* cancels out.
+
+        for (augmented, binary) in [
+                (operator.iadd, operator.add),
+                (operator.isub, operator.sub),
+                (operator.imul, operator.mul),
+                (operator.itruediv, operator.truediv)]:
+            for other in [ub, ub.nominal, 2.0, ua]:
+                uc = ua.copy()
+                ud = augmented(uc, other)
+                self.assertIs(ud, uc)
+                expected = binary(ua, other)
+                self.assertClose(ud.nominal, expected.nominal)
+                self.assertClose(ud.stddev, expected.stddev)
+                self.assertClose((ud - expected).stddev, 0)
+
+        # Aliased operands:
+        uc = ua.copy()
+        uc += uc
+        self.assertClose(uc.stddev, 2 * ua.stddev)
+        uc = ua.copy()
+        uc *= uc
+        self.assertClose(uc.stddev, 2 * ua.nominal * ua.stddev)
+
+        # Running sums reuse the existing layers:
+        usum = undarray(nominal=numpy.zeros(2))
+        for i in range(10):
+            usum += ua
+        self.assertEqual(len(usum.dependencies), 1)
+        self.assertClose(usum.stddev, 10 * ua.stddev)
+
+        # Results which do not fit into *self* are not stored in place:
+        uc = ua.copy()
+        ud = uc
+        ud += undarray(nominal=[[1.0], [2.0]], stddev=[[0.1], [0.1]])
+        self.assertIsNot(ud, uc)
+        self.assertEqual(ud.shape, (2, 2))
+
+        ue = undarray(nominal=[1, 2])
+        uf = ue
+        uf *= ua
+        self.assertIsNot(uf, ue)
+        self.assertAllEqual(ue.nominal, [1, 2])
+
+    def test_out_where(self):
+        ua = undarray(nominal=[1.0, 2.0], stddev=[0.1, 0.2])
+        ub = undarray(nominal=[[3.0, 4.0], [5.0, 6.0]],
+                stddev=[[0.3, 0.4], [0.5, 0.6]])
+
+        uc = upy2.uzeros((2, 2))
+        nominal = uc.nominal
+        ud = numpy.multiply(ua, ub, out=uc)
+        self.assertIs(ud, uc)
+        self.assertIs(uc.nominal, nominal)
+        self.assertClose((uc - ua * ub).stddev, 0)
+        self.assertClose(uc.nominal, ua.nominal * ub.nominal)
+
+        # The layers are reused:
+        names = uc.stack._names
+        numpy.add(ub, ua, out=uc)
+        self.assertIs(uc.stack._names, names)
+        self.assertClose((uc - (ua + ub)).stddev, 0)
+
+        # The output might be an operand:
+        ue = ub.copy()
+        numpy.add(ue, ua, out=ue)
+        self.assertClose((ue - (ua + ub)).stddev, 0)
+        ue = ub.copy()
+        numpy.multiply(ue, ue, out=ue)
+        self.assertClose((ue - ub * ub).stddev, 0)
+        ue = ub.copy()
+        numpy.sin(ue, out=ue)
+        self.assertClose((ue - numpy.sin(ub)).stddev, 0)
+
+        # Restricting the output elements:
+        uf = ub.copy()
+        where = numpy.asarray([True, False])
+        numpy.multiply(ua, ub, out=uf, where=where)
+        self.assertClose((uf[:, 0] - (ua * ub)[:, 0]).stddev, 0)
+        self.assertClose((uf[:, 1] - ub[:, 1]).stddev, 0)
+
+        uf = ub.copy()
+        numpy.exp(ua, out=uf, where=where[:, numpy.newaxis])
+        self.assertClose((uf[0] - numpy.exp(ua)).stddev, 0)
+        self.assertClose((uf[1] - ub[1]).stddev, 0)
+
+        with self.assertRaises(ValueError):
+            numpy.add(ub, ub, out=upy2.uzeros((2,)))
+        with self.assertRaises(ValueError):
+            numpy.add(ua, ua, out=upy2.uzeros((2,), dtype=int))
+        with self.assertRaises(TypeError):
+            numpy.add(ua, ua, where=where)
+
+    def test_reductions(self):
+        ua = undarray(nominal=[[1.0, 2.0, 3.0], [4.0, 0.0, 6.0]],
+                stddev=[[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]])
+        ub = ua + ua[0]
+            # Correlated elements.
+
+        def elements(ua):
+            return [ua[index] for index in numpy.ndindex(*ua.shape)]
+
+        def reference(ua, axis, combine):
+            if axis is None:
+                return combine(elements(ua))
+            axis %= ua.ndim
+            moved = ua.transpose(
+                    [axis] + [i for i in range(ua.ndim) if i != axis])
+            return combine([moved[i] for i in range(len(moved))])
+
+        def total(uas):
+            result = uas[0]
+            for ux in uas[1:]:
+                result = result + ux
+            return result
+
+        def product(uas):
+            result = uas[0]
+            for ux in uas[1:]:
+                result = result * ux
+            return result
+
+        for axis in [None, 0, 1, -1]:
+            for (reduced, expected) in [
+                    (ub.sum(axis=axis), reference(ub, axis, total)),
+                    (numpy.add.reduce(ub, axis=axis),
+                        reference(ub, axis, total)),
+                    (ub.prod(axis=axis), reference(ub, axis, product)),
+                    (numpy.multiply.reduce(ub, axis=axis),
+                        reference(ub, axis, product)),
+                    (numpy.mean(ub, axis=axis),
+                        reference(ub, axis, total) * (1.0 / (
+                            ub.nominal.size if axis is None
+                            else ub.shape[axis])))]:
+                self.assertEqual(reduced.shape, expected.shape)
+                self.assertClose(reduced.nominal, expected.nominal)
+                self.assertClose((reduced - expected).stddev, 0)
+
+        self.assertEqual(ub.sum(axis=(0, 1), keepdims=True).shape, (1, 1))
+        self.assertEqual(ub.prod(axis=1, keepdims=True).shape, (2, 1))
+        with self.assertRaises(ValueError):
+            ub.sum(axis=2)
+
+        uc = numpy.add.accumulate(ub, axis=1)
+        self.assertEqual(uc.shape, (2, 3))
+        for k in range(3):
+            expected = total([ub[:, j] for j in range(k + 1)])
+            self.assertClose((uc[:, k] - expected).stddev, 0)
+
+        ud = upy2.uzeros(())
+        self.assertIs(ub.sum(out=ud), ud)
+        self.assertClose((ud - reference(ub, None, total)).stddev, 0)
+
     def test_getitem_setitem_len(self):
         with U(1):
             ua = [[1.0, 2.0], [3.0, 4.0]] +- u([[0.1, 0.2], [0.3, 0.4]])
@@ -572,6 +929,49 @@ class Test_undarray(unittest.TestCase):
         self.assertAllEqual(ub.nominal, numpy.transpose(nominal, (0, 2, 1)))
         self.assertAllEqual(ub.stddev, numpy.transpose(stddev, (0, 2, 1)))
 
+    def test_shape_methods_layers(self):
+        # All layers are rearranged like the nominal value, in the
+        # same way as Dependency by Dependency:
+        rng = numpy.random.default_rng(1010)
+        nominal = numpy.asfortranarray(rng.random((2, 3, 4)))
+        ua = undarray(nominal=nominal, stddev=rng.random((2, 3, 4)))
+        ua = ua * undarray(nominal=nominal, stddev=rng.random((2, 3, 4))) \
+                + undarray(nominal=2.0, stddev=0.5)
+        self.assertEqual(len(ua.stack), 3)
+        nominal = ua.nominal
+        self.assertTrue(numpy.isfortran(nominal))
+
+        for (method, args, kwargs) in [
+                ('compress', ([True, False, True],), {'axis': -2}),
+                ('compress', ([False, True] * 6,), {}),
+                ('flatten', (), {}),
+                ('flatten', ('F',), {}),
+                ('flatten', ('K',), {}),
+                ('repeat', ([1, 0, 2, 3],), {'axis': 2}),
+                ('repeat', (2,), {}),
+                ('reshape', ((6, 4),), {}),
+                ('reshape', (4, -1), {'order': 'F'}),
+                ('reshape', ((3, 8),), {'order': 'A'}),
+                ('transpose', (), {}),
+                ('transpose', (2, 0, 1), {}),
+                ('transpose', (numpy.asarray([1, -1, 0]),), {})]:
+            ub = getattr(ua, method)(*args, **kwargs)
+            expected = getattr(nominal, method)(*args, **kwargs)
+            self.assertAllEqual(ub.nominal, expected)
+            self.assertEqual(len(ub.stack), 3)
+            # The orders 'A' and 'K' refer to the layout of the nominal
+            # value, which is Fortran contiguous:
+            args = tuple('F' if isinstance(arg, str) else arg
+                    for arg in args)
+            if kwargs.get('order') in ('A', 'K'):
+                kwargs = dict(kwargs, order='F')
+            for (layer, dependency) in zip(ub.dependencies,
+                    ua.dependencies):
+                reference = getattr(dependency, method)(*args, **kwargs)
+                self.assertAllEqual(layer.names, reference.names)
+                self.assertAllEqual(layer.derivatives,
+                        reference.derivatives)
+
     def test_repr(self):
         ua = undarray(
                 nominal=42,
@@ -0,0 +1,72 @@
+# Developed since: Oct 2026
+
+import unittest
+import numpy
+import upy2
+from upy2 import undarray, ucovariance, ucorrelation
+
+
+class Test_Covariance(unittest.TestCase):
+
+    def assertClose(self, a, b):
+        if not numpy.allclose(a, b, equal_nan=True):
+            raise AssertionError('{} not close to {}'.format(a, b))
+
+    def setUp(self):
+        rng = numpy.random.default_rng(1101)
+        self.ux = undarray(nominal=rng.random(5), stddev=rng.random(5))
+        self.ug = undarray(nominal=2.0, stddev=0.3)
+        self.uy = self.ux * self.ug + self.ux[::-1]
+
+    def jacobian(self, ua, names):
+        """ Returns the Jacobian of *ua* with respect to *names*. """
+
+        result = numpy.zeros((ua.nominal.size, len(names)))
+        for dependency in ua.dependencies:
+            for (element, name) in enumerate(dependency.names.flat):
+                if name != 0:
+                    result[element, names.index(name)] += \
+                            dependency.derivatives.flat[element]
+        return result
+
+    def test_covariance(self):
+        names = sorted(set(
+            int(name) for ua in [self.ux, self.uy]
+            for dependency in ua.dependencies
+            for name in dependency.names.flat if name != 0))
+        jx = self.jacobian(self.ux, names)
+        jy = self.jacobian(self.uy, names)
+
+        self.assertClose(ucovariance(self.uy), jy.dot(jy.T))
+        self.assertClose(ucovariance(self.uy, self.ux), jy.dot(jx.T))
+        self.assertClose(numpy.diag(ucovariance(self.uy)),
+                self.uy.variance)
+
+        # Blocked computation into a given output array:
+        out = numpy.empty((5, 5))
+        self.assertIs(ucovariance(self.uy, self.ux, blocksize=2, out=out),
+                out)
+        self.assertClose(out, jy.dot(jx.T))
+
+        self.assertEqual(
+                ucovariance(self.uy.reshape((5, 1)), self.ug).shape,
+                (5, 1))
+        self.assertClose(ucovariance(self.ux, numpy.ones(3)),
+                numpy.zeros((5, 3)))
+
+        with self.assertRaises(ValueError):
+            ucovariance(self.ux, out=numpy.empty((5, 4)))
+        with self.assertRaises(ValueError):
+            ucovariance(self.ux * 1j)
+
+    def test_correlation(self):
+        uc = ucorrelation(self.uy, blocksize=3)
+        self.assertClose(numpy.diag(uc), 1)
+        self.assertTrue((numpy.abs(uc) <= 1 + 1e-12).all())
+        self.assertClose(uc, ucovariance(self.uy) /
+                numpy.outer(self.uy.stddev, self.uy.stddev))
+
+        self.assertClose(ucorrelation(self.ux, self.ug),
+                numpy.zeros((5,)))
+        self.assertTrue(numpy.isnan(
+            ucorrelation(self.ux, numpy.ones(2))).all())
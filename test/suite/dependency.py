@@ -1,8 +1,9 @@
 # Developed since: Jun 2020
 
+import pickle
 import unittest
 import numpy
-from upy2.dependency import Dependency
+from upy2.dependency import Dependency, DependencyStack, promote
 
 import sys
 py3 = (sys.version_info >= (3,))
@@ -477,3 +478,291 @@ class Test_Dependency(unittest.TestCase):
         dtype2 = numpy.dtype(float)
         self.assertEqual(repr(dep2),
                 "<(2,)-shaped {}-typed Dependency>".format(dtype2))
+
+
+class Test_DependencyStack(unittest.TestCase):
+
+    def assertAllEqual(self, a, b):
+        if not numpy.all(a == b):
+            raise AssertionError(
+                'Not all equal:\n{a}\nand\n{b}'.format(a=a, b=b))
+
+    def assertRaisesRegex(self, *args, **kwargs):
+        if py2:
+            return unittest.TestCase.assertRaisesRegexp(self, *args, **kwargs)
+        else:
+            return unittest.TestCase.assertRaisesRegex(self, *args, **kwargs)
+
+    def test_construction(self):
+        stack = DependencyStack(shape=(2, 3))
+        self.assertEqual(len(stack), 0)
+        self.assertEqual(stack.names.shape, (0, 2, 3))
+        self.assertEqual(stack.names.dtype, int)
+        self.assertEqual(stack.dtype, float)
+
+        names = numpy.asarray([[1, 2], [3, 0]])
+        derivatives = numpy.asarray([[0.1, 0.2], [0.3, 0.0]])
+        stack = DependencyStack(shape=(2,),
+                names=names, derivatives=derivatives)
+        self.assertEqual(len(stack), 2)
+        self.assertIs(stack.names.base, names)
+            # The buffers are used without copying.
+
+        with self.assertRaisesRegex(ValueError,
+                r'^Shape mismatch in initialising a DependencyStack: '
+                r'shape = \(3,\), names.shape = \(2, 2\), '
+                r'derivatives.shape = \(2, 2\)$'):
+            DependencyStack(shape=(3,),
+                    names=names, derivatives=derivatives)
+
+    def test_append_extend_truncate(self):
+        stack = DependencyStack(shape=(2,), dtype=int)
+        stack.append(Dependency(names=[1, 2], derivatives=[10, 20]))
+        stack.append(Dependency(names=[3, 0], derivatives=[30, 0]))
+        self.assertEqual(len(stack), 2)
+        self.assertGreaterEqual(stack.capacity, 2)
+        self.assertAllEqual(stack.names, [[1, 2], [3, 0]])
+        self.assertAllEqual(stack.derivatives, [[10, 20], [30, 0]])
+
+        stack.extend(
+                names=numpy.asarray([[4, 5], [6, 7], [8, 9]]),
+                derivatives=numpy.asarray([[1, 1], [2, 2], [3, 3]]))
+        self.assertEqual(len(stack), 5)
+        self.assertAllEqual(stack.names[4], [8, 9])
+
+        capacity = stack.capacity
+        stack.truncate(1)
+        self.assertEqual(len(stack), 1)
+        self.assertEqual(stack.capacity, capacity)
+        self.assertAllEqual(stack.names, [[1, 2]])
+
+        with self.assertRaisesRegex(ValueError,
+                r'^Cannot extend a \(2,\)-shaped DependencyStack by '
+                r'layers of shape \(3,\)$'):
+            stack.append(Dependency(shape=(3,)))
+
+    def test_layer(self):
+        stack = DependencyStack(shape=(2,))
+        stack.append(Dependency(names=[1, 2], derivatives=[0.1, 0.2]))
+
+        layer = stack.layer(0)
+        layer.derivatives[1] = 42
+        self.assertAllEqual(stack.derivatives, [[0.1, 42]])
+        self.assertEqual(len(stack.layers()), 1)
+
+    def test_variance(self):
+        stack = DependencyStack(shape=(2,),
+                names=numpy.asarray([[1, 0], [2, 3]]),
+                derivatives=numpy.asarray([[3.0, 5.0], [4.0, 1.0]]))
+        self.assertAllEqual(stack.variance, [25.0, 1.0])
+
+        stack = DependencyStack(shape=(2,), dtype=complex)
+        with self.assertRaisesRegex(ValueError,
+                r'^Refusing to calculate the variance of a non-real '
+                r'DependencyStack$'):
+            stack.variance
+
+    def test_multiplication(self):
+        stack = DependencyStack(shape=(2,),
+                names=numpy.asarray([[1, 2], [3, 0]]),
+                derivatives=numpy.asarray([[10, 11], [12, 0]]))
+
+        product = stack * 2
+        self.assertAllEqual(product.derivatives, [[20, 22], [24, 0]])
+
+        product = stack * numpy.asarray([[1], [2], [3]])
+        self.assertEqual(product.shape, (3, 2))
+        self.assertAllEqual(product.names[0], [[1, 2], [1, 2], [1, 2]])
+        self.assertAllEqual(product.derivatives[1],
+                [[12, 0], [24, 0], [36, 0]])
+
+        product.names[0, 0, 0] = 42
+        self.assertAllEqual(stack.names[0], [1, 2])
+
+    def test_getitem_clear(self):
+        stack = DependencyStack(shape=(2, 3),
+                names=numpy.arange(1, 13).reshape((2, 2, 3)),
+                derivatives=numpy.arange(12).reshape((2, 2, 3)))
+
+        keyed = stack[1]
+        self.assertEqual(keyed.shape, (3,))
+        self.assertAllEqual(keyed.names, [[4, 5, 6], [10, 11, 12]])
+
+        keyed = stack[..., 0]
+        self.assertAllEqual(keyed.names, [[1, 4], [7, 10]])
+
+        # Advanced indices separated by a slice:
+        nominal = numpy.zeros((2, 2, 3))
+        stack3 = DependencyStack(shape=(2, 2, 3),
+                names=numpy.ones((1, 2, 2, 3), dtype=int),
+                derivatives=numpy.ones((1, 2, 2, 3)))
+        key = ([0, 1], slice(None), [2, 0])
+        self.assertEqual(stack3[key].shape, nominal[key].shape)
+
+        keyed.names[0, 0] = 100
+        self.assertAllEqual(stack.names[0, 0], [1, 2, 3])
+
+        stack.clear((0, slice(1, 3)))
+        self.assertAllEqual(stack.names[:, 0], [[1, 0, 0], [7, 0, 0]])
+        self.assertAllEqual(stack.derivatives[:, 0], [[0, 0, 0], [6, 0, 0]])
+
+    def test_join(self):
+        stack = DependencyStack(shape=(2,),
+                names=numpy.asarray([[1, 2], [3, 0]]),
+                derivatives=numpy.asarray([[10, 20], [30, 0]]))
+        other = DependencyStack(shape=(2,),
+                names=numpy.asarray([[3, 0], [4, 2]]),
+                derivatives=numpy.asarray([[1, 0], [2, 3]]))
+        stack.join(other)
+
+        # Entries are sorted by name within each element:
+        self.assertEqual(len(stack), 3)
+        self.assertAllEqual(stack.names, [[1, 2], [3, 0], [4, 0]])
+        self.assertAllEqual(stack.derivatives, [[10, 23], [31, 0], [2, 0]])
+
+        # Joining into an empty stack, with broadcasting:
+        stack = DependencyStack(shape=(2, 2), dtype=int)
+        other = DependencyStack(shape=(2,),
+                names=numpy.asarray([[0, 0], [5, 6]]),
+                derivatives=numpy.asarray([[0, 0], [1, 2]]))
+        stack.join(other)
+        self.assertEqual(len(stack), 1)
+            # The empty layer of *other* is omitted.
+        self.assertAllEqual(stack.names, [[[5, 6], [5, 6]]])
+
+        # Joining with a key:
+        other = DependencyStack(shape=(),
+                names=numpy.asarray([5, 7]),
+                derivatives=numpy.asarray([100, 200]))
+        stack.join(other, key=(1, 0))
+        self.assertEqual(len(stack), 2)
+        self.assertAllEqual(stack.names,
+                [[[5, 6], [5, 6]], [[0, 0], [7, 0]]])
+        self.assertAllEqual(stack.derivatives,
+                [[[1, 2], [101, 2]], [[0, 0], [200, 0]]])
+
+        # Repacking into fewer layers drops the layers not needed:
+        stack = DependencyStack(shape=(2,),
+                names=numpy.asarray([[1, 0], [0, 2]]),
+                derivatives=numpy.asarray([[1, 0], [0, 2]]))
+        other = DependencyStack(shape=(2,),
+                names=numpy.asarray([[1, 2]]),
+                derivatives=numpy.asarray([[1, 1]]))
+        stack.join(other)
+        self.assertEqual(len(stack), 1)
+        self.assertAllEqual(stack.names, [[1, 2]])
+        self.assertAllEqual(stack.derivatives, [[2, 3]])
+
+        with self.assertRaisesRegex(ValueError,
+                r"^non-broadcastable output operand with shape \(2,\) "
+                r"doesn't match the broadcast shape \(2,2\)$"):
+            stack.join(DependencyStack(shape=(2, 2),
+                names=numpy.ones((1, 2, 2), dtype=int),
+                derivatives=numpy.ones((1, 2, 2))))
+
+    def test_compact(self):
+        stack = DependencyStack(shape=(3,),
+                names=numpy.asarray([[1, 0, 0], [0, 2, 0], [0, 0, 3]]),
+                derivatives=numpy.asarray([[1, 0, 0], [0, 2, 0], [0, 0, 3]]))
+        self.assertAlmostEqual(stack.fill, 1.0 / 3)
+
+        stack.compact()
+        self.assertEqual(len(stack), 1)
+        self.assertEqual(stack.capacity, 1)
+        self.assertEqual(stack.fill, 1.0)
+        self.assertAllEqual(stack.names, [[1, 2, 3]])
+        self.assertAllEqual(stack.derivatives, [[1, 2, 3]])
+
+        stack = DependencyStack(shape=(2,))
+        self.assertEqual(stack.fill, 1.0)
+        stack.compact()
+        self.assertEqual(len(stack), 0)
+
+    def test_reductions(self):
+        stack = DependencyStack(shape=(2, 2),
+                names=numpy.asarray([[[1, 2], [1, 0]]]),
+                derivatives=numpy.asarray([[[1.0, 2.0], [3.0, 0.0]]]))
+
+        summed = stack.sum((0,))
+        self.assertEqual(summed.shape, (2,))
+        self.assertEqual(len(summed), 1)
+        self.assertAllEqual(summed.names, [[1, 2]])
+        self.assertAllEqual(summed.derivatives, [[4.0, 2.0]])
+
+        summed = stack.sum((0, 1), keepdims=True)
+        self.assertEqual(summed.shape, (1, 1))
+        self.assertAllEqual(summed.names, [[[1]], [[2]]])
+        self.assertAllEqual(summed.derivatives, [[[4.0]], [[2.0]]])
+
+        accumulated = stack.accumulate(1)
+        self.assertEqual(accumulated.shape, (2, 2))
+        self.assertAllEqual(accumulated.names,
+                [[[1, 1], [1, 1]], [[0, 2], [0, 0]]])
+        self.assertAllEqual(accumulated.derivatives,
+                [[[1.0, 1.0], [3.0, 3.0]], [[0.0, 2.0], [0.0, 0.0]]])
+
+        self.assertIs(stack.astype(float), stack)
+        self.assertEqual(stack.astype(complex).dtype, complex)
+        with self.assertRaises(ValueError):
+            stack.astype(int)
+
+    def test_precision(self):
+        stack = DependencyStack(shape=(2,),
+                names=numpy.asarray([[1, 2], [3, 0]], dtype=numpy.int32),
+                derivatives=numpy.asarray([[1.0, 2.0], [3.0, 4.0]],
+                    dtype=numpy.float32))
+
+        self.assertEqual(promote(numpy.float32, numpy.float64),
+                numpy.float32)
+        self.assertEqual(promote(numpy.float32, numpy.complex128),
+                numpy.complex64)
+        self.assertEqual(promote(int, numpy.float32), numpy.float64)
+        self.assertEqual((stack * numpy.asarray([2.0, 3.0])).dtype,
+                numpy.float32)
+        self.assertEqual((stack * 1j).dtype, numpy.complex64)
+
+        variance = stack.induced_variance(numpy.float64)
+        self.assertEqual(variance.dtype, numpy.float64)
+        self.assertAllEqual(variance, [10.0, 4.0])
+
+        # Joining wider names and derivatives stores them narrowed:
+        other = DependencyStack(shape=(2,),
+                names=numpy.asarray([[1, 4]]),
+                derivatives=numpy.asarray([[0.5, 0.5]]))
+        stack.join(other)
+        self.assertEqual(stack.names.dtype, numpy.int32)
+        self.assertEqual(stack.dtype, numpy.float32)
+        self.assertAllEqual(stack.variance, [11.25, 4.25])
+
+        stack = DependencyStack(shape=(1,), names_dtype=numpy.int8)
+        with self.assertRaisesRegex(ValueError,
+                r'^Cannot store Dependency names up to 128 with dtype '
+                r'int8$'):
+            stack.join(DependencyStack(shape=(1,),
+                names=numpy.asarray([[128]]),
+                derivatives=numpy.asarray([[1.0]])))
+
+    def test_pickle(self):
+        stack = DependencyStack(shape=(2,))
+        stack.reserve(4)
+        stack.extend(names=numpy.asarray([[1, 2]]),
+                derivatives=numpy.asarray([[0.5, 1.5]]))
+        dependency = Dependency(names=[1, 2], derivatives=[2.0, 3.0])
+
+        buffers = []
+        data = pickle.dumps([stack, dependency], protocol=5,
+                buffer_callback=buffers.append)
+        self.assertEqual(len(buffers), 4)
+        (stack2, dependency2) = pickle.loads(data, buffers=buffers)
+
+        self.assertEqual(stack2.capacity, 1)
+        self.assertAllEqual(stack2.names, [[1, 2]])
+        self.assertAllEqual(stack2.derivatives, [[0.5, 1.5]])
+        self.assertAllEqual(dependency2.names, [1, 2])
+        self.assertAllEqual(dependency2.derivatives, [2.0, 3.0])
+
+    def test_string_conversion(self):
+        stack = DependencyStack(shape=(2,))
+        self.assertEqual(repr(stack),
+                "<(2,)-shaped {}-typed DependencyStack of 0 layers>".\
+                        format(numpy.dtype(float)))
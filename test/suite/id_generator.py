@@ -0,0 +1,87 @@
+# Developed since: Oct 2026
+
+import threading
+import unittest
+import multiprocessing
+import concurrent.futures
+import numpy
+import upy2
+import upy2.id_generator
+from upy2 import IDGenerator
+
+
+class Test_IDGenerator(unittest.TestCase):
+
+    def test_uniqueness(self):
+        generator = IDGenerator(blocksize=16)
+        shapes = [(), (3,), (2, 2), (0,), (5, 4), (16,), (17,), (1,)]
+
+        results = []
+        def generate():
+            ids = [generator.generate_idarray(shape) for shape in shapes]
+            for (shape, idarray) in zip(shapes, ids):
+                self.assertEqual(idarray.shape, shape)
+            results.extend(idarray.reshape(-1) for idarray in ids)
+
+        threads = [threading.Thread(target=generate) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        generate()
+        for thread in threads:
+            thread.join()
+
+        ids = numpy.concatenate(results)
+        self.assertEqual(len(numpy.unique(ids)), len(ids))
+        self.assertTrue((ids > 0).all())
+
+    def test_blocks(self):
+        generator = IDGenerator(blocksize=4)
+        self.assertEqual(generator.generate_idarray((2,)).tolist(), [1, 2])
+        self.assertEqual(generator.generate_idarray(()), 3)
+        # Two IDs don't fit into the block anymore:
+        self.assertEqual(generator.generate_idarray((2,)).tolist(), [5, 6])
+        # Large requests are served from the global counter directly:
+        self.assertEqual(generator.generate_idarray((5,)).tolist(),
+                [9, 10, 11, 12, 13])
+        self.assertEqual(generator.generate_idarray(()), 7)
+
+
+def create(seed):
+    return upy2.undarray(nominal=[1.0, 2.0, 3.0], stddev=[0.1, 0.1, seed])
+
+
+class Test_SharedIDGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.previous = upy2.guid_generator
+
+    def tearDown(self):
+        upy2.guid_generator = self.previous
+
+    def test_process_pool(self):
+        ua = upy2.undarray(nominal=[1.0], stddev=[0.1])
+        generator = upy2.id_generator.install(blocksize=8)
+        self.assertIs(upy2.guid_generator, generator)
+        self.assertGreater(generator.generate_idarray(()),
+                ua.stack.names.max())
+
+        # Forked children inherit the generator of the parent, including
+        # its per-thread blocks:
+        context = multiprocessing.get_context('fork')
+        with concurrent.futures.ProcessPoolExecutor(2,
+                mp_context=context,
+                initializer=upy2.id_generator.install,
+                initargs=(generator.counter,)) as executor:
+            results = list(executor.map(create, range(6)))
+        results.append(create(0))
+
+        names = numpy.concatenate(
+                [result.stack.names.reshape(-1) for result in results])
+        self.assertEqual(len(numpy.unique(names)), len(names))
+
+        # Independent undarrays don't correlate spuriously:
+        total = results[0]
+        for result in results[1:]:
+            total = total + result
+        self.assertTrue(numpy.allclose(total.variance,
+            numpy.sum([result.variance for result in results], axis=0)))
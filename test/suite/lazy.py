@@ -0,0 +1,103 @@
+# Developed since: Oct 2026
+
+import weakref
+import unittest
+import numpy
+import upy2
+from upy2 import undarray, Lazy, lazyundarray
+
+
+class Test_Lazy(unittest.TestCase):
+
+    def assertClose(self, a, b):
+        if not numpy.allclose(a, b):
+            raise AssertionError('{} not close to {}'.format(a, b))
+
+    def operands(self):
+        ua = undarray(nominal=[1.0, 2.0, 3.0], stddev=[0.1, 0.2, 0.3])
+        ub = undarray(nominal=[0.5, 0.25, 0.125], stddev=[0.01, 0.02, 0.03])
+        uc = undarray(nominal=[2.0, 3.0, 4.0], stddev=[0.2, 0.1, 0.1])
+        return (ua, ub, uc)
+
+    def formula(self, ua, ub, uc):
+        return numpy.exp(numpy.sin(ua * ub + 1)) / upy2.ulog(uc) - ua
+
+    def test_deferral(self):
+        (ua, ub, uc) = self.operands()
+        with Lazy():
+            ud = self.formula(ua, ub, uc)
+
+        self.assertIsInstance(ud, lazyundarray)
+        self.assertIsNone(ud.result)
+        ud.stddev
+        self.assertIsNotNone(ud.result)
+
+    def test_equivalence(self):
+        (ua, ub, uc) = self.operands()
+        eager = self.formula(ua, ub, uc)
+        with Lazy():
+            lazy = self.formula(ua, ub, uc)
+
+        self.assertClose(lazy.nominal, eager.nominal)
+        self.assertClose(lazy.stddev, eager.stddev)
+        self.assertEqual(len(lazy.dependencies), 3)
+            # Each element depends on three sources.
+
+        # Correlations are retained:
+        self.assertClose((lazy - eager).stddev, 0)
+
+    def test_release(self):
+        # Evaluated nodes do not keep their graph alive:
+        (ua, ub, uc) = self.operands()
+        with Lazy():
+            ud = ua * ub
+            ue = upy2.ulog(ud) + uc
+        leaf = weakref.ref(ua)
+        node = weakref.ref(ud)
+        del ua, ud
+        self.assertIsNotNone(leaf())
+        ue.evaluate()
+        self.assertEqual(ue.operands, ())
+        self.assertIsNone(leaf())
+        self.assertIsNone(node())
+        self.assertEqual(len(ue.dependencies), 3)
+
+    def test_shared_subexpression(self):
+        (ua, ub, uc) = self.operands()
+        with Lazy():
+            ud = ua * ub
+            ue = ud * ud + ud
+
+        eager = (ua * ub) * (ua * ub) + (ua * ub)
+        self.assertClose(ue.nominal, eager.nominal)
+        self.assertClose(ue.stddev, eager.stddev)
+
+        # Intermediate nodes can be evaluated on their own:
+        self.assertClose(ud.stddev, (ua * ub).stddev)
+
+    def test_nonelementwise(self):
+        ua = undarray(nominal=[-1.0, 2.0], stddev=[0.1, 0.2])
+        with Lazy():
+            ub = abs(ua * 2) + 1
+
+        self.assertClose(ub.nominal, [3.0, 5.0])
+        self.assertClose(ub.stddev, [0.2, 0.4])
+
+    def test_long_chain(self):
+        ua = undarray(nominal=[1.0, 2.0], stddev=[0.1, 0.2])
+        with Lazy():
+            acc = ua
+            for index in range(3000):
+                acc = acc + ua
+
+        self.assertClose(acc.nominal, [3001.0, 6002.0])
+        self.assertClose(acc.stddev, [300.1, 600.2])
+        self.assertEqual(len(acc.dependencies), 1)
+
+    def test_broadcasting_and_indexing(self):
+        ua = undarray(nominal=[1.0, 2.0], stddev=[0.1, 0.2])
+        with Lazy():
+            ub = ua * [[1.0], [2.0]]
+
+        self.assertEqual(ub.shape, (2, 2))
+        self.assertClose(ub[1].stddev, [0.2, 0.4])
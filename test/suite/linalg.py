@@ -0,0 +1,89 @@
+# Developed since: Oct 2026
+
+import unittest
+import numpy
+import upy2
+from upy2 import undarray, ueinsum, udot, umatmul
+
+
+class Test_Linalg(unittest.TestCase):
+
+    def assertClose(self, a, b):
+        if not numpy.allclose(a, b):
+            raise AssertionError('{} not close to {}'.format(a, b))
+
+    def assertEquivalent(self, ua, ub):
+        self.assertEqual(ua.shape, ub.shape)
+        self.assertClose(ua.nominal, ub.nominal)
+        self.assertClose((ua - ub).stddev, 0)
+
+    def setUp(self):
+        self.rng = numpy.random.default_rng(1031)
+
+    def random(self, *shape):
+        return undarray(nominal=self.rng.random(shape),
+                stddev=self.rng.random(shape))
+
+    def product(self, ua, ub):
+        """ The matrix product calculated by elementwise operations. """
+
+        rows = []
+        for i in range(ua.shape[0]):
+            row = ua[i, 0] * ub[0]
+            for j in range(1, ua.shape[1]):
+                row = row + ua[i, j] * ub[j]
+            rows.append(row)
+        return rows
+
+    def test_matmul(self):
+        ua = self.random(3, 4)
+        ux = self.random(4)
+        m = self.rng.random((3, 4))
+        ug = undarray(nominal=2.0, stddev=0.1)
+        uy = ux * ug
+            # The layer of *ug* is uniform along *uy*.
+
+        for (a, b) in [(m, ux), (ua, ux), (ua, m.T), (ua, uy), (m, uy)]:
+            uc = a @ b
+            expected = self.product(upy2.asuarray(a), b)
+            for i in range(3):
+                self.assertEquivalent(uc[i], expected[i])
+
+        self.assertEquivalent(ux @ ua.transpose(), ua @ ux)
+        self.assertEquivalent(numpy.matmul(m, ux), umatmul(m, ux))
+
+        # A uniform layer is contracted as a whole:
+        uz = m @ (undarray(nominal=numpy.ones(4)) * ug)
+        self.assertEqual(len(uz.dependencies), 1)
+
+        # Stacks of matrices:
+        ub = self.random(2, 3, 4)
+        uc = ub @ ux
+        self.assertEqual(uc.shape, (2, 3))
+        self.assertEquivalent(uc[1], ub[1] @ ux)
+
+        with self.assertRaises(ValueError):
+            umatmul(ux, 2.0)
+
+    def test_dot_einsum(self):
+        ua = self.random(3, 4)
+        ux = self.random(4)
+
+        self.assertEquivalent(udot(ua, ux), ua @ ux)
+        self.assertEquivalent(udot(ux, ux), (ux * ux).sum())
+        self.assertEquivalent(udot(ux, 2.0), ux * 2.0)
+        self.assertEqual(
+                udot(self.random(2, 3, 4), self.rng.random((5, 4, 2))).shape,
+                (2, 3, 5, 2))
+
+        self.assertEquivalent(ueinsum('ij,ij->', ua, ua), (ua * ua).sum())
+        self.assertEquivalent(ueinsum('ij->j', ua), ua.sum(axis=0))
+        self.assertEquivalent(ueinsum('ij,j', ua, ux), ua @ ux)
+
+        ub = self.random(3, 3)
+        self.assertEquivalent(ueinsum('ii->i', ub), ub.flatten()[::4])
+
+        uc = self.random(2, 3, 4)
+        ud = ueinsum('...j,j', uc, ux)
+        self.assertEqual(ud.shape, (2, 3))
+        self.assertEquivalent(ud[1], uc[1] @ ux)
@@ -8,9 +8,22 @@ from typesetting import \
     Test_TypesettingFixedpointRelativeU, \
     Test_Convention
 from operators import TestOperators
-from dependency import Test_Dependency
+from dependency import Test_Dependency, Test_DependencyStack
 from core import Test_Core, Test_undarray
 from sessions import Test_Sessions
+from id_generator import Test_IDGenerator, Test_SharedIDGenerator
+from lazy import Test_Lazy
+from adjoint import Test_Reverse
+from parallel import Test_Parallel
+from threads import Test_Threads
+from outofcore import Test_OutOfCore
+from montecarlo import Test_MonteCarlo
+from secondorder import Test_SecondOrder
+from tracing import Test_Plan
+from linalg import Test_Linalg
+from covariance import Test_Covariance
+from storage import Test_Storage
+from shared import Test_Shared
 
 
 unittest.main()
@@ -0,0 +1,83 @@
+# Developed since: Oct 2026
+
+import unittest
+import numpy
+import upy2
+from upy2 import undarray, MonteCarlo, mcundarray
+
+
+class Test_MonteCarlo(unittest.TestCase):
+
+    def setUp(self):
+        self.ux = undarray(nominal=[1.0, 2.0, 3.0], stddev=[0.1, 0.2, 0.3])
+        self.uy = undarray(nominal=2.0, stddev=0.05)
+
+    def test_linear(self):
+        engine = MonteCarlo(samples=100000, rng=2301)
+        with engine:
+            ua = self.ux * self.uy + 1
+            total = ua.sum()
+            mean = ua[1:].mean()
+        self.assertIsInstance(ua, mcundarray)
+        self.assertIsInstance(total, mcundarray)
+        self.assertIsInstance(mean, mcundarray)
+        self.assertEqual(ua.samples.shape, (100000, 3))
+
+        linear = self.ux * self.uy + 1
+        self.assertTrue(numpy.allclose(ua.nominal, linear.nominal,
+            rtol=0, atol=0.01))
+        self.assertTrue(numpy.allclose(ua.stddev, linear.stddev,
+            rtol=0.02))
+        self.assertAlmostEqual(total.stddev, linear.sum().stddev,
+                delta=0.02)
+        self.assertAlmostEqual(mean.stddev, linear[1:].mean().stddev,
+                delta=0.01)
+
+        # The linearisation retains the names of the sources:
+        linearized = ua.linearized()
+        self.assertTrue(numpy.array_equal(
+            linearized.stack.names[:2], linear.stack.names))
+        self.assertTrue(numpy.allclose(linearized.stack.derivatives[:2],
+            linear.stack.derivatives, rtol=0, atol=0.01))
+        self.assertTrue(numpy.allclose((ua - linear).stddev, 0,
+            rtol=0, atol=0.05))
+        self.assertTrue(numpy.allclose(ua.linear.stddev, linear.stddev))
+
+    def test_correlation(self):
+        with MonteCarlo(samples=1000, rng=2302):
+            ua = upy2.uexp(self.ux)
+            difference = ua - upy2.uexp(self.ux)
+            square = self.ux * self.ux
+        self.assertTrue(numpy.array_equal(difference.samples,
+            numpy.zeros((1000, 3))))
+        self.assertTrue(numpy.allclose(square.samples,
+            ua.engine.draw(self.ux) ** 2))
+
+    def test_nonlinear(self):
+        ux = undarray(nominal=1.0, stddev=0.5)
+        with MonteCarlo(samples=100000, rng=2303):
+            ua = ux ** 2
+        # The mean of the square exceeds the square of the mean by the
+        # variance, and the square of a normal variate is skewed:
+        self.assertAlmostEqual(ua.nominal, 1.25, delta=0.02)
+        self.assertAlmostEqual(ua.variance, 4 * 0.25 + 2 * 0.0625,
+                delta=0.03)
+        self.assertAlmostEqual(ua.linear.variance, 1.0)
+        self.assertEqual(len(ua.stack), 2)
+
+    def test_chunking(self):
+        results = []
+        for chunksize in [1, 2 ** 22]:
+            with MonteCarlo(samples=500, rng=2304, chunksize=chunksize):
+                ua = upy2.usin(self.ux) * self.uy
+            results.append(ua)
+        self.assertTrue(numpy.allclose(results[0].samples,
+            results[1].samples))
+        self.assertTrue(numpy.allclose(results[0].stack.derivatives,
+            results[1].stack.derivatives))
+
+    def test_complex(self):
+        uz = undarray(nominal=[1 + 1j], stddev=[1.0], dtype=complex)
+        with MonteCarlo(samples=10):
+            with self.assertRaises(ValueError):
+                uz * 2
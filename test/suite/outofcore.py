@@ -0,0 +1,86 @@
+# Developed since: Oct 2026
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+import upy2
+from upy2 import undarray, OutOfCore
+from upy2.outofcore import MappedDependencyStack
+
+
+class Test_OutOfCore(unittest.TestCase):
+
+    def assertEquivalent(self, ua, ub):
+        self.assertEqual(ua.shape, ub.shape)
+        self.assertEqual(ua.dtype, ub.dtype)
+        self.assertTrue(numpy.allclose(ua.nominal, ub.nominal))
+        self.assertTrue(numpy.allclose(ua.variance, ub.variance))
+        self.assertTrue(numpy.allclose((ua - ub).stddev, 0))
+
+    def setUp(self):
+        rng = numpy.random.default_rng(1801)
+        self.ua = undarray(nominal=rng.random((50, 3)) + 1,
+                stddev=rng.random((50, 3)))
+        self.ub = undarray(nominal=rng.random(3) + 1,
+                stddev=rng.random(3))
+        self.c = rng.random((50, 1))
+        self.directory = tempfile.mkdtemp()
+        self.outofcore = OutOfCore(self.directory, chunksize=20)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def formula(self, ua, ub):
+        ux = upy2.ulog(ua * ub + self.c) / (ua + 2.5)
+        return [ux, ux.sum(axis=0), ux.sum(axis=1),
+                ux.sum(axis=(0, 1), keepdims=True), ux[::-1] - ua,
+                upy2.usqrt(ub)]
+
+    def test_equivalence(self):
+        expected = self.formula(self.ua, self.ub)
+        with self.outofcore:
+            results = self.formula(self.ua, self.ub)
+        for (result, reference) in zip(results, expected):
+            self.assertEquivalent(result, reference)
+        self.assertIsInstance(results[0].stack, MappedDependencyStack)
+        self.assertIsInstance(results[1].stack, MappedDependencyStack)
+        # The partial sums of the chunks are merged:
+        self.assertEqual(len(results[1].stack), len(expected[1].stack))
+        self.assertEqual(len(results[3].stack), len(expected[3].stack))
+
+        # The files are removed with the undarrays:
+        self.assertNotEqual(os.listdir(self.directory), [])
+        del results, result
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_storage(self):
+        with self.outofcore:
+            ua = undarray(nominal=self.ua.nominal,
+                    stddev=self.ua.stddev)
+        self.assertIsInstance(ua.stack, MappedDependencyStack)
+        self.assertIsInstance(ua.stack._derivatives, numpy.memmap)
+        self.assertTrue(numpy.allclose(ua.stddev, self.ua.stddev))
+
+        # Growing the stack maps new files:
+        ua += self.ua
+        self.assertEqual(len(ua.stack), 2)
+        self.assertIsInstance(ua.stack._names, numpy.memmap)
+        self.assertTrue(numpy.allclose(ua.variance, 2 * self.ua.variance))
+
+        # The buffers of chunks are held in memory:
+        with self.outofcore:
+            self.outofcore.streaming = True
+            ub = undarray(nominal=self.ua.nominal,
+                    stddev=self.ua.stddev)
+            self.outofcore.streaming = False
+        self.assertNotIsInstance(ub.stack, MappedDependencyStack)
+
+    def test_precision(self):
+        with upy2.Precision(), self.outofcore:
+            result = self.ua * self.ub
+        self.assertEqual(result.stack.dtype, numpy.float32)
+        self.assertEqual(result.stack.names.dtype, numpy.int32)
+        self.assertTrue(numpy.allclose(result.stddev,
+            (self.ua * self.ub).stddev))
@@ -0,0 +1,59 @@
+# Developed since: Oct 2026
+
+import os
+import unittest
+import multiprocessing
+import numpy
+import upy2
+from upy2 import undarray, Parallel
+
+
+class Test_Parallel(unittest.TestCase):
+
+    def assertEquivalent(self, ua, ub):
+        self.assertEqual(ua.shape, ub.shape)
+        self.assertEqual(ua.dtype, ub.dtype)
+        self.assertTrue(numpy.allclose(ua.nominal, ub.nominal))
+        self.assertTrue(numpy.allclose(ua.variance, ub.variance))
+        self.assertTrue(numpy.allclose((ua - ub).stddev, 0))
+
+    def setUp(self):
+        rng = numpy.random.default_rng(1601)
+        self.ua = undarray(nominal=rng.random((50, 3)) + 1,
+                stddev=rng.random((50, 3)))
+        self.ub = undarray(nominal=rng.random(3) + 1,
+                stddev=rng.random(3))
+        self.c = rng.random((50, 1))
+        self.parallel = Parallel(processes=2, chunks=3, threshold=10,
+                mp_context=multiprocessing.get_context('fork'))
+
+    def formula(self, ua, ub):
+        ux = upy2.ulog(ua * ub + self.c) / (ua + 2.5)
+        return [ux, ux.sum(axis=0), ux.sum(axis=1),
+                ux.mean(axis=(0, 1), keepdims=True), ux[::-1] - ua,
+                upy2.usqrt(ub)]
+
+    def test_equivalence(self):
+        expected = self.formula(self.ua, self.ub)
+        with self.parallel:
+            results = self.formula(self.ua, self.ub)
+        self.assertIsNone(self.parallel.executor)
+        for (result, reference) in zip(results, expected):
+            self.assertEquivalent(result, reference)
+
+        # Results reside in shared memory:
+        nominal = results[0].nominal
+        while not isinstance(nominal, numpy.memmap):
+            nominal = nominal.base
+        filename = nominal.filename
+        self.assertTrue(os.path.exists(filename))
+        del results, result, nominal
+        self.assertFalse(os.path.exists(filename))
+
+    def test_precision(self):
+        with upy2.Precision(), self.parallel:
+            result = self.ua * self.ub
+        self.assertEqual(result.stack.dtype, numpy.float32)
+        self.assertEqual(result.stack.names.dtype, numpy.int32)
+        self.assertTrue(numpy.allclose(result.stddev,
+            (self.ua * self.ub).stddev))
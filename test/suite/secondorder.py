@@ -0,0 +1,182 @@
+# Developed since: Oct 2026
+
+import unittest
+import numpy
+import upy2
+from upy2 import undarray, SecondOrder, MonteCarlo, curvedundarray
+
+
+class Test_SecondOrder(unittest.TestCase):
+
+    def setUp(self):
+        self.ux = undarray(nominal=[1.0, 2.0, 3.0], stddev=[0.1, 0.2, 0.3])
+        self.uy = undarray(nominal=2.0, stddev=0.05)
+
+    def test_second_derivatives(self):
+        # The second derivatives agree with finite differences of the
+        # ufuncs:
+        y = numpy.asarray([0.3, 0.6])
+        step = 1e-4
+        for uufunc in [upy2.upositive, upy2.unegative, upy2.usqrt,
+                upy2.usquare, upy2.usin, upy2.ucos, upy2.utan,
+                upy2.uarcsin, upy2.uarccos, upy2.uarctan, upy2.usinh,
+                upy2.ucosh, upy2.utanh, upy2.uarcsinh, upy2.uarctanh,
+                upy2.uexp, upy2.uexp2, upy2.ulog, upy2.ulog2,
+                upy2.ulog10]:
+            f = uufunc.ufunc
+            expected = (f(y + step) - 2 * f(y) + f(y - step)) / step ** 2
+            self.assertTrue(numpy.allclose(
+                uufunc._second_derivative(y, f(y)), expected,
+                rtol=1e-4, atol=1e-6), uufunc)
+
+        y = 1.5 + y
+        self.assertTrue(numpy.allclose(
+            upy2.uarccosh._second_derivative(y, numpy.arccosh(y)),
+            (numpy.arccosh(y + step) - 2 * numpy.arccosh(y) +
+                numpy.arccosh(y - step)) / step ** 2, rtol=1e-4))
+
+        (y1, y2) = (numpy.asarray([0.5, 1.5]), numpy.asarray([2.0, 0.7]))
+        for uufunc in [upy2.uadd, upy2.usubtract, upy2.umultiply,
+                upy2.udivide, upy2.upower, upy2.uarctan2]:
+            f = uufunc.ufunc
+            expected = (
+                (f(y1 + step, y2) - 2 * f(y1, y2) + f(y1 - step, y2)) /
+                    step ** 2,
+                (f(y1 + step, y2 + step) - f(y1 + step, y2 - step) -
+                    f(y1 - step, y2 + step) + f(y1 - step, y2 - step)) /
+                    (4 * step ** 2),
+                (f(y1, y2 + step) - 2 * f(y1, y2) + f(y1, y2 - step)) /
+                    step ** 2)
+            actual = uufunc._second_derivatives(y1, y2, f(y1, y2))
+            for (derivative, reference) in zip(actual, expected):
+                self.assertTrue(numpy.allclose(derivative, reference,
+                    rtol=1e-4, atol=1e-6), uufunc)
+            separate = (
+                uufunc._second_derivative1(y1, y2, f(y1, y2)),
+                uufunc._mixed_derivative(y1, y2, f(y1, y2)),
+                uufunc._second_derivative2(y1, y2, f(y1, y2)))
+            for (derivative, reference) in zip(actual, separate):
+                self.assertTrue(numpy.allclose(derivative, reference))
+
+    def test_unary(self):
+        with SecondOrder():
+            ua = upy2.ulog(self.ux)
+        self.assertIsInstance(ua, curvedundarray)
+
+        # E[ln x] = ln x0 - sigma^2 / (2 x0^2),
+        # Var[ln x] = sigma^2 / x0^2 + sigma^4 / (2 x0^4):
+        (nominal, variance) = (self.ux.nominal, self.ux.variance)
+        self.assertTrue(numpy.allclose(ua.nominal, numpy.log(nominal)))
+        self.assertTrue(numpy.allclose(ua.bias,
+            -variance / (2 * nominal ** 2)))
+        self.assertTrue(numpy.allclose(ua.expectation,
+            numpy.log(nominal) - variance / (2 * nominal ** 2)))
+        self.assertTrue(numpy.allclose(ua.variance,
+            variance / nominal ** 2 + variance ** 2 / (2 * nominal ** 4)))
+
+        # The first-order part is unchanged:
+        linear = upy2.ulog(self.ux)
+        self.assertTrue(numpy.array_equal(ua.stack.names,
+            linear.stack.names))
+        self.assertTrue(numpy.allclose(ua.stack.derivatives,
+            linear.stack.derivatives))
+
+    def test_composition(self):
+        # The square of a square is exact to second order in the
+        # curvatures: y = (x0 + s z)^4.
+        ux = undarray(nominal=2.0, stddev=0.1)
+        with SecondOrder():
+            ua = upy2.usquare(upy2.usquare(ux))
+            ub = ux ** 4
+        # d^2/dz^2 (x0 + s z)^4 = 12 x0^2 s^2:
+        self.assertAlmostEqual(ua.bias, 6 * 4.0 * 0.01)
+        self.assertAlmostEqual(ub.bias, 6 * 4.0 * 0.01)
+        self.assertAlmostEqual(ua.variance, ub.variance)
+
+    def test_binary(self):
+        ux = undarray(nominal=2.0, stddev=0.3)
+        uy = undarray(nominal=3.0, stddev=0.2)
+        with SecondOrder():
+            square = ux * ux
+            product = ux * uy
+            quotient = ux / uy
+            scaled = 2.0 / ux
+        # Products of correlated operands are curved:
+        self.assertAlmostEqual(square.bias, 0.09)
+        self.assertAlmostEqual(square.variance, 4 * 4 * 0.09 +
+                2 * 0.09 ** 2)
+        # The curvature of products of independent operands is
+        # neglected, since it is off-diagonal:
+        self.assertAlmostEqual(product.bias, 0)
+        self.assertAlmostEqual(product.variance, (ux.nominal * uy).variance
+                + (ux * uy.nominal).variance)
+        # E[x / y] = x0 / y0 (1 + sigma_y^2 / y0^2):
+        self.assertAlmostEqual(quotient.bias, 2.0 / 3.0 * 0.04 / 9.0)
+        self.assertAlmostEqual(scaled.bias, 2.0 / 2.0 * 0.09 / 4.0)
+
+    def test_reductions(self):
+        with SecondOrder():
+            ua = upy2.usquare(self.ux)
+            total = ua.sum()
+            mean = ua.mean()
+            item = ua[1:]
+            scaled = ua.scaled(2.0)
+        for result in (total, mean, item, scaled):
+            self.assertIsInstance(result, curvedundarray)
+        self.assertTrue(numpy.allclose(ua.bias, self.ux.variance))
+        self.assertAlmostEqual(total.bias, self.ux.variance.sum())
+        self.assertAlmostEqual(mean.bias, self.ux.variance.mean())
+        self.assertTrue(numpy.allclose(item.bias, self.ux.variance[1:]))
+        self.assertTrue(numpy.allclose(scaled.bias, 2 * ua.bias))
+
+    def test_montecarlo(self):
+        ux = undarray(nominal=[2.0, 5.0], stddev=[0.3, 0.5])
+        with SecondOrder():
+            ua = ux * self.uy / (self.uy + 1.0) + upy2.uexp(ux / 4)
+        with MonteCarlo(samples=200000, rng=2501):
+            ub = ux * self.uy / (self.uy + 1.0) + upy2.uexp(ux / 4)
+        self.assertTrue(numpy.allclose(ua.expectation, ub.nominal,
+            rtol=0, atol=0.005))
+        self.assertTrue(numpy.allclose(ua.stddev, ub.stddev, rtol=0.02))
+
+    def test_composed(self):
+        # Curvatures of curved operands are propagated with the signed
+        # first derivatives:
+        ux = undarray(nominal=1.0, stddev=0.05)
+        uy = undarray(nominal=2.0, stddev=0.05)
+        uz = undarray(nominal=0.5, stddev=0.05)
+
+        def expressions(ux, uy, uz):
+            return [
+                upy2.ucosh(ux * ux),
+                upy2.ucosh(ux) - ux,
+                upy2.uarccosh(uy * uy) - uy,
+                upy2.uarctan2(uz * uz, uy) + uz,
+                upy2.uarctan2(uy, ux * ux) - upy2.uarccosh(uy)]
+
+        with SecondOrder():
+            curved = expressions(ux, uy, uz)
+        with MonteCarlo(samples=400000, rng=2502):
+            sampled = expressions(ux, uy, uz)
+        for (ua, ub) in zip(curved, sampled):
+            self.assertAlmostEqual(ua.expectation, ub.nominal, delta=5e-4)
+            # The variance misses terms of third order, e.g. the
+            # covariance of the linear and the cubic term:
+            self.assertAlmostEqual(ua.stddev, ub.stddev,
+                    delta=0.03 * ub.stddev)
+
+        # d_x (cosh(x^2)) = 2 x sinh(x^2), d_x d_x = 2 sinh + 4 x^2 cosh:
+        self.assertAlmostEqual(curved[0].bias, 0.5 * 0.05 ** 2 *
+                (2 * numpy.sinh(1.0) + 4 * numpy.cosh(1.0)))
+        self.assertAlmostEqual(curved[1].linear.stddev,
+                (numpy.sinh(1.0) - 1) * 0.05)
+
+    def test_unsupported(self):
+        with SecondOrder():
+            with self.assertRaises(ValueError):
+                upy2.uabsolute(self.ux)
+            with self.assertRaises(ValueError):
+                upy2.usquare(undarray(nominal=1j, stddev=0.1))
+            # Operations without undarrays are left alone:
+            self.assertIsInstance(upy2.usquare(2.0), undarray)
+            self.assertNotIsInstance(upy2.usquare(2.0), curvedundarray)
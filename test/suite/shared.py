@@ -0,0 +1,65 @@
+# Developed since: Oct 2026
+
+import gc
+import pickle
+import unittest
+import multiprocessing
+import multiprocessing.shared_memory
+import numpy
+import upy2
+from upy2 import undarray
+
+
+def moments(handle):
+    ua = upy2.shared_undarray(handle)
+    return (ua.nominal.sum(), ua.variance.sum(),
+            ua.stack.names.__array_interface__['data'][0] % 64)
+
+
+class Test_Shared(unittest.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.default_rng(2201)
+        ua = undarray(nominal=rng.random((5, 4)), stddev=rng.random((5, 4)))
+        self.ua = ua * ua[0] + 1
+
+    def test_handle(self):
+        with self.ua.to_shared() as handle:
+            copy = pickle.loads(pickle.dumps(handle))
+            self.assertIsNone(copy.memory)
+            self.assertLess(len(pickle.dumps(handle)), 512)
+
+            ub = upy2.shared_undarray(copy)
+            self.assertTrue(numpy.array_equal(ub.nominal, self.ua.nominal))
+            self.assertTrue(numpy.array_equal(ub.stack.names,
+                self.ua.stack.names))
+            self.assertTrue(numpy.allclose((ub - self.ua).stddev, 0))
+
+            # Undarrays attached share the block:
+            uc = handle.attach()
+            uc.nominal[0, 0] = 42
+            self.assertEqual(ub.nominal[0, 0], 42)
+            self.assertNotEqual(self.ua.nominal[0, 0], 42)
+            name = handle.name
+
+        # The block is removed, but the undarrays attached remain valid:
+        with self.assertRaises(FileNotFoundError):
+            multiprocessing.shared_memory.SharedMemory(name)
+        self.assertEqual(uc.nominal[0, 0], 42)
+        del ub, uc
+        gc.collect()
+
+    def test_processes(self):
+        handle = self.ua.to_shared()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(2) as pool:
+            results = pool.map(moments, [handle] * 3)
+        for (nominal, variance, alignment) in results:
+            self.assertAlmostEqual(nominal, self.ua.nominal.sum())
+            self.assertAlmostEqual(variance, self.ua.variance.sum())
+            self.assertEqual(alignment, 0)
+
+        name = handle.name
+        del handle
+        with self.assertRaises(FileNotFoundError):
+            multiprocessing.shared_memory.SharedMemory(name)
@@ -0,0 +1,128 @@
+# Developed since: Oct 2026
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import numpy
+import upy2
+from upy2 import undarray
+
+
+class Test_Storage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'ua.upy2')
+        rng = numpy.random.default_rng(1901)
+        ua = undarray(nominal=rng.random((4, 5)) + 1,
+                stddev=rng.random((4, 5)))
+        ub = undarray(nominal=rng.random(5), stddev=rng.random(5))
+        self.ua = ua * ub + ua
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertIdentical(self, ua, ub):
+        self.assertEqual(ua.shape, ub.shape)
+        self.assertTrue(numpy.array_equal(ua.nominal, ub.nominal))
+        self.assertTrue(numpy.array_equal(ua.stack.names,
+            ub.stack.names))
+        self.assertTrue(numpy.array_equal(ua.stack.derivatives,
+            ub.stack.derivatives))
+
+    def test_roundtrip(self):
+        upy2.save(self.path, self.ua)
+
+        loaded = upy2.load(self.path)
+        self.assertIdentical(loaded, self.ua)
+        self.assertTrue(numpy.allclose((loaded - self.ua).stddev, 0))
+        for array in (loaded.nominal, loaded.stack.names,
+                loaded.stack.derivatives):
+            base = array
+            while base is not None and not isinstance(base, numpy.memmap):
+                base = base.base
+            self.assertIsInstance(base, numpy.memmap)
+            self.assertEqual(array.__array_interface__['data'][0] %
+                    upy2.storage.ALIGNMENT, 0)
+        with self.assertRaises(ValueError):
+            loaded.nominal[0, 0] = 0
+
+        self.assertIdentical(upy2.load(self.path, mmap_mode=None),
+                self.ua)
+
+    def test_modes(self):
+        upy2.save(self.path, self.ua)
+        loaded = upy2.load(self.path, mmap_mode='r+')
+        loaded.nominal[0, 0] = 42
+        del loaded
+        self.assertEqual(upy2.load(self.path).nominal[0, 0], 42)
+
+        with self.assertRaises(ValueError):
+            upy2.load(self.path, mmap_mode='w+')
+        with open(self.path, 'wb') as stream:
+            stream.write(b'\x93NUMPY')
+        with self.assertRaises(ValueError):
+            upy2.load(self.path)
+
+    def test_special(self):
+        # Scalars without Dependencies:
+        upy2.save(self.path, undarray(nominal=2.5))
+        loaded = upy2.load(self.path)
+        self.assertEqual(loaded.shape, ())
+        self.assertEqual(loaded.nominal, 2.5)
+        self.assertEqual(len(loaded.stack), 0)
+
+        # Reduced precision is retained:
+        with upy2.Precision():
+            ua = undarray(nominal=[1.0, 2.0], stddev=[0.5, 0.25])
+        upy2.save(self.path, ua)
+        loaded = upy2.load(self.path)
+        self.assertEqual(loaded.stack.dtype, numpy.float32)
+        self.assertEqual(loaded.stack.names_dtype, numpy.int32)
+        self.assertIdentical(loaded, ua)
+
+    def test_archive(self):
+        rng = numpy.random.default_rng(2001)
+        parameters = undarray(nominal=rng.random(6),
+                stddev=rng.random(6))
+        derived = upy2.uexp(parameters) * 2
+        total = derived.sum()
+        upy2.savez(self.path, parameters, derived=derived, total=total)
+
+        loaded = upy2.loadz(self.path)
+        self.assertEqual(list(loaded), ['arr_0', 'derived', 'total'])
+        for (ua, reference) in zip(loaded.values(),
+                [parameters, derived, total]):
+            self.assertTrue(numpy.array_equal(ua.nominal,
+                reference.nominal))
+            self.assertTrue(numpy.allclose(ua.variance,
+                reference.variance))
+
+        # Names are remapped consistently:
+        names = loaded['arr_0'].stack.names
+        self.assertEqual(numpy.intersect1d(names,
+            parameters.stack.names).size, 0)
+        self.assertTrue(numpy.array_equal(names,
+            loaded['derived'].stack.names))
+        self.assertFalse(numpy.shares_memory(names,
+            loaded['derived'].stack.names))
+        self.assertTrue(numpy.allclose(
+            (loaded['derived'].sum() - loaded['total']).stddev, 0))
+        self.assertTrue(numpy.allclose(
+            (loaded['derived'] - 2 * upy2.uexp(loaded['arr_0'])).stddev,
+            0))
+
+        # Identical names arrays are stored once:
+        with zipfile.ZipFile(self.path) as archive:
+            members = archive.namelist()
+        self.assertEqual(len([member for member in members
+            if member.startswith('names_')]), 2)
+
+        unmapped = upy2.loadz(self.path, remap=False)
+        self.assertTrue(numpy.array_equal(unmapped['total'].stack.names,
+            total.stack.names))
+
+        with self.assertRaises(ValueError):
+            upy2.savez(self.path, parameters, arr_0=derived)
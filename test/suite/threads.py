@@ -0,0 +1,60 @@
+# Developed since: Oct 2026
+
+import unittest
+import numpy
+import upy2
+from upy2 import undarray, Threads
+from upy2.dependency import DependencyStack
+
+
+class Test_Threads(unittest.TestCase):
+
+    def test_split(self):
+        threads = Threads(workers=3, grain=10)
+        self.assertEqual(threads.split(5), [slice(0, 5)])
+        self.assertEqual(threads.split(5, 4), [slice(0, 2), slice(2, 5)])
+        self.assertEqual(threads.split(100),
+                [slice(0, 33), slice(33, 66), slice(66, 100)])
+
+        self.assertEqual(upy2.threads.split(100), [slice(0, 100)])
+        with threads:
+            self.assertEqual(len(upy2.threads.split(100)), 3)
+        self.assertIsNone(threads.executor)
+
+    def test_equivalence(self):
+        rng = numpy.random.default_rng(1701)
+        ua = undarray(nominal=rng.random((30, 4)) + 1,
+                stddev=rng.random((30, 4)))
+        ub = undarray(nominal=rng.random((30, 4)) + 1,
+                stddev=rng.random((30, 4)))
+
+        def formula():
+            ux = upy2.ulog(ua * ub + 1) / (ua + 2.5)
+            return [ux, ux.sum(axis=0), ux[::-1] - ua]
+
+        expected = formula()
+        with Threads(workers=3, grain=1):
+            results = formula()
+            variances = [result.variance for result in results]
+
+        for (result, reference, variance) in \
+                zip(results, expected, variances):
+            self.assertTrue(numpy.allclose(result.nominal,
+                reference.nominal))
+            self.assertTrue(numpy.all(result.stack.names ==
+                reference.stack.names))
+            self.assertTrue(numpy.allclose(result.stack.derivatives,
+                reference.stack.derivatives))
+            self.assertTrue(numpy.allclose(variance, reference.variance))
+
+    def test_repack(self):
+        stack = DependencyStack(shape=(3,))
+        names = numpy.asarray([[1, 2, 1], [0, 0, 0], [3, 0, 4]])
+        derivatives = numpy.asarray([[1.0, 2.0, 3.0], [1.0, 1.0, 1.0],
+            [5.0, 6.0, 7.0]])
+        with Threads(workers=3, grain=1):
+            (packed_names, packed_derivatives) = \
+                    stack.repack(names, derivatives)
+        self.assertEqual(packed_names.tolist(), [[1, 2], [0, 0], [3, 4]])
+        self.assertEqual(packed_derivatives.tolist(),
+                [[4.0, 2.0], [0.0, 0.0], [5.0, 7.0]])
@@ -0,0 +1,95 @@
+# Developed since: Oct 2026
+
+import unittest
+import numpy
+import upy2
+from upy2 import undarray, Plan
+
+
+class Test_Plan(unittest.TestCase):
+
+    def assertClose(self, a, b):
+        if not numpy.allclose(a, b):
+            raise AssertionError('{} not close to {}'.format(a, b))
+
+    def setUp(self):
+        self.ua = undarray(nominal=2.0, stddev=0.1)
+        self.ub = undarray(nominal=1.0, stddev=0.2)
+        self.uc = undarray(nominal=[3.0, 4.0], stddev=[0.1, 0.2])
+
+    def calibrate(self, ux):
+        return (self.ua * ux + self.ub) / upy2.ulog(self.uc)
+
+    def batch(self, seed):
+        rng = numpy.random.default_rng(seed)
+        return undarray(nominal=rng.random((5, 2)),
+                stddev=rng.random((5, 2)))
+
+    def test_batches(self):
+        plan = upy2.compile(self.calibrate)
+        self.assertIsInstance(plan, Plan)
+
+        results = []
+        for seed in range(4):
+            ux = self.batch(seed)
+            results.append((plan(ux), self.calibrate(ux)))
+
+        # Results are not overwritten by subsequent batches:
+        for (planned, eager) in results:
+            self.assertClose(planned.nominal, eager.nominal)
+            self.assertClose(planned.stddev, eager.stddev)
+            self.assertClose((planned - eager).stddev, 0)
+
+        # A change of shape is admissible:
+        ux = undarray(nominal=[1.0, 2.0], stddev=[0.1, 0.1])
+        self.assertClose(plan(ux).stddev, self.calibrate(ux).stddev)
+
+        # Plain data can be passed as well:
+        self.assertClose(plan(numpy.ones(2)).stddev,
+                self.calibrate(numpy.ones(2)).stddev)
+
+    def test_multiple_outputs(self):
+        plan = upy2.compile(lambda ux, y: (ux * y, ux + 1, ux))
+        ux = self.batch(0)
+        (uprod, usum, uident) = plan(ux, 2.0)
+        self.assertClose(uprod.stddev, 2 * ux.stddev)
+        self.assertClose(usum.nominal, ux.nominal + 1)
+        self.assertIs(uident, ux)
+
+        (uprod, usum, uident) = plan(ux, numpy.asarray(3.0))
+        self.assertClose(uprod.nominal, 3 * ux.nominal)
+
+    def test_errors(self):
+        plan = upy2.compile(lambda ux: ux[0] * 2)
+        with self.assertRaises(ValueError):
+            plan(self.batch(0))
+
+        plan = upy2.compile(self.calibrate)
+        plan(self.batch(0))
+        with self.assertRaises(ValueError):
+            plan(self.batch(0), self.batch(1))
+
+    def test_correlated_arguments(self):
+        # Arguments might share names with the undarrays used besides:
+        plan = upy2.compile(lambda ux: ux * self.ua)
+        ux = self.ua * 2
+        self.assertClose(plan(ux).stddev, (ux * self.ua).stddev)
+        self.assertClose(plan(self.ua).stddev, (self.ua * self.ua).stddev)
+
+    def test_plain_arguments(self):
+        # Plain arguments are traced as well:
+        plan = upy2.compile(lambda x: self.uc * numpy.sin(x))
+        for x in ([0.0, 1.0], [2.0, 3.0]):
+            planned = plan(numpy.asarray(x))
+            self.assertClose(planned.nominal, self.uc.nominal * numpy.sin(x))
+            self.assertClose(planned.stddev, self.uc.stddev *
+                    numpy.abs(numpy.sin(x)))
+
+        # Operations other than uufuncs are refused for plain arguments
+        # too, instead of fixing their results:
+        plan = upy2.compile(lambda x: self.uc * x[::-1])
+        with self.assertRaises(ValueError):
+            plan(numpy.asarray([0.0, 1.0]))
+        plan = upy2.compile(lambda x: (x * 2)[0] * self.uc)
+        with self.assertRaises(ValueError):
+            plan(self.batch(0))